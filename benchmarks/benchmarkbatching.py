@@ -0,0 +1,89 @@
+from river import compose, datasets, feature_extraction, linear_model, optim, preprocessing, stats
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+from rivermultiproccesing.river_queue import RiverModelManager
+import itertools
+import time
+
+
+def get_model():
+    model = preprocessing.StandardScaler()
+    model |= linear_model.LinearRegression(optimizer=optim.SGD(0.001))
+    return model
+
+
+def get_hour(x):
+    x['hour'] = x['moment'].hour
+    return x
+
+
+def get_bikes_model():
+    """The Bikes pipeline of testgenerator.py."""
+    model = compose.Select('clouds', 'humidity', 'pressure', 'temperature', 'wind')
+    model += (
+            get_hour |
+            feature_extraction.TargetAgg(by=['station', 'hour'], how=stats.Mean())
+    )
+    model |= preprocessing.StandardScaler()
+    model |= linear_model.LinearRegression(optimizer=optim.SGD(0.001))
+    return model
+
+
+def learn_only(model, samples):
+    for x, y in samples:
+        model.learn_one(x, y)
+    # One prediction to make sure every learn has been applied
+    model.predict_one(samples[0][0])
+
+
+def prequential(model, samples):
+    for x, y in samples:
+        model.predict_one(x)
+        model.learn_one(x, y)
+
+
+def pipelined(model, samples):
+    """prequential without waiting for each prediction (predict_async when available)."""
+    if not hasattr(model, "predict_async"):
+        return prequential(model, samples)
+    futures = []
+    for x, y in samples:
+        futures.append(model.predict_async(x))
+        model.learn_one(x, y)
+    for future in futures:
+        future.result()
+
+
+def fused(model, samples):
+    """prequential with one predict_learn_one command per sample (when available)."""
+    if not hasattr(model, "predict_learn_one"):
+        return prequential(model, samples)
+    for x, y in samples:
+        model.predict_learn_one(x, y)
+
+
+def fused_pipelined(model, samples):
+    """fused without waiting for each prediction."""
+    if not hasattr(model, "predict_learn_async"):
+        return prequential(model, samples)
+    futures = [model.predict_learn_async(x, y) for x, y in samples]
+    for future in futures:
+        future.result()
+
+
+if __name__ == "__main__":
+    n_instances = 20000
+    samples = list(itertools.islice(datasets.Bikes(), n_instances))
+    configurations = [("in-process", None, {})]
+    for manager_cls in [RiverModelManager, RiverModelManagerPipe]:
+        configurations.append((manager_cls.__name__, manager_cls, {}))
+        configurations.append((f"{manager_cls.__name__} batch=256", manager_cls, {"batch_size": 256, "max_delay_us": 1000}))
+
+    for label, manager_cls, kwargs in configurations:
+        for loop in [learn_only, prequential, pipelined, fused, fused_pipelined]:
+            model = get_bikes_model() if manager_cls is None else manager_cls(model=get_bikes_model(), **kwargs)
+            start_time = time.time()
+            loop(model, samples)
+            elapsed_time = time.time() - start_time
+            if manager_cls is not None:
+                model.stop()
+            print(f"{label:>36} {loop.__name__:>15}: {n_instances / elapsed_time:10.0f} msg/s")
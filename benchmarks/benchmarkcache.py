@@ -0,0 +1,37 @@
+from generator.columnar_cache import ColumnarCache
+from generator.river_dataset_generator import RiverDatasetGenerator
+from river import datasets
+import shutil
+import sys
+import tempfile
+import time
+
+
+def replay(label, **kwargs):
+    start_time = time.time()
+    generator = RiverDatasetGenerator(**kwargs)
+    for x, y in generator:
+        pass
+    elapsed_time = time.time() - start_time
+    print(f"{label:>22}: {elapsed_time:7.3f}s  {generator.get_count() / elapsed_time:10.0f} msg/s")
+
+
+if __name__ == "__main__":
+    # python benchmarkcache.py [dataset name] [n_instances], e.g. Bikes 182470
+    dataset = getattr(datasets, sys.argv[1] if len(sys.argv) > 1 else "Bikes")()
+    n_instances = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    cache_dir = tempfile.mkdtemp()
+    try:
+        replay("cold parse", dataset=dataset, n_instances=n_instances)
+        start_time = time.time()
+        ColumnarCache(cache_dir).build(dataset, n_instances)
+        print(f"{'cache build':>22}: {time.time() - start_time:7.3f}s")
+        replay("warm mmap", dataset=dataset, n_instances=n_instances, cache_dir=cache_dir)
+
+        stream = ColumnarCache(cache_dir).get(dataset, n_instances)
+        start_time = time.time()
+        n_rows = sum(len(next(iter(columns.values()))) for columns in stream.iter_columns())
+        elapsed_time = time.time() - start_time
+        print(f"{'warm raw column slices':>22}: {elapsed_time:7.3f}s  {n_rows / elapsed_time:10.0f} msg/s")
+    finally:
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,62 @@
+from river.datasets import synth
+from rivermultiproccesing.codec import TupleCodec
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+from rivermultiproccesing.river_queue import RiverModelManager
+from benchmarks.benchmarkbatching import get_model, learn_only, prequential, pipelined
+import itertools
+import pickle
+import time
+
+
+def measure_encoding(samples, batch_size):
+    """Bytes per message and encode+decode time per message, pickle against the compact codec."""
+    commands = []
+    for i, (x, y) in enumerate(samples):
+        commands.append(("predict", x, i))
+        commands.append(("train", x, y))
+    frames = [commands[i:i + batch_size] for i in range(0, len(commands), batch_size)]
+
+    start_time = time.perf_counter()
+    size = 0
+    for frame in frames:
+        data = pickle.dumps(("batch", frame), protocol=pickle.HIGHEST_PROTOCOL)
+        size += len(data)
+        pickle.loads(data)
+    pickle_time = time.perf_counter() - start_time
+    pickle_size = size
+
+    sender, receiver = TupleCodec(), TupleCodec()
+    start_time = time.perf_counter()
+    size = 0
+    for frame in frames:
+        data = sender.encode(frame)
+        size += len(data)
+        receiver.decode(data)
+    compact_time = time.perf_counter() - start_time
+
+    n = len(commands)
+    print(f"batch={batch_size:>4}  pickle: {pickle_size / n:6.1f} B/msg {pickle_time / n * 1e6:6.2f} us/msg"
+          f"  compact: {size / n:6.1f} B/msg {compact_time / n * 1e6:6.2f} us/msg")
+
+
+if __name__ == "__main__":
+    n_instances = 20000
+    # Named features, like Bikes' clouds/humidity/pressure/temperature/wind
+    samples = [
+        ({f"feature_{k}": v for k, v in x.items()}, y)
+        for x, y in itertools.islice(synth.Friedman(seed=42), n_instances)
+    ]
+    for batch_size in [1, 256]:
+        measure_encoding(samples, batch_size)
+
+    for manager_cls in [RiverModelManager, RiverModelManagerPipe]:
+        for codec in ["pickle", "compact"]:
+            for kwargs in [{}, {"batch_size": 256, "max_delay_us": 1000}]:
+                label = f"{manager_cls.__name__} {codec}" + (" batch=256" if kwargs else "")
+                for loop in [learn_only, prequential, pipelined]:
+                    manager = manager_cls(model=get_model(), codec=codec, **kwargs)
+                    start_time = time.time()
+                    loop(manager, samples)
+                    elapsed_time = time.time() - start_time
+                    manager.stop()
+                    print(f"{label:>44} {loop.__name__:>12}: {n_instances / elapsed_time:10.0f} msg/s")
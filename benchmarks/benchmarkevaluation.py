@@ -0,0 +1,49 @@
+from benchmarks.benchmarkbatching import get_model
+from river import metrics
+from river.datasets import synth
+from rivermultiproccesing.evaluation import GeneratorSpec
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+from rivermultiproccesing.river_queue import RiverModelManager
+import functools
+import time
+
+
+def client_side(model, spec):
+    """Pulls the stream in the client and sends every sample to the model (predict, then learn)."""
+    metric = metrics.MAE()
+    for x, y in spec.build():
+        metric.update(y, model.predict_one(x))
+        model.learn_one(x, y)
+    return metric
+
+
+def client_side_fused(model, spec):
+    """client_side with one predict_learn_one round trip per sample."""
+    metric = metrics.MAE()
+    for x, y in spec.build():
+        metric.update(y, model.predict_learn_one(x, y))
+    return metric
+
+
+def server_side(manager, spec):
+    """Sends the spec once; the server pulls the stream and runs the loop itself."""
+    return list(manager.evaluate(spec, metrics.MAE(), checkpoint_every=5000))[-1]["metric"]
+
+
+if __name__ == "__main__":
+    n_instances = 20000
+    spec = GeneratorSpec(functools.partial(synth.Friedman, seed=42), n_instances=n_instances)
+
+    start_time = time.perf_counter()
+    metric = client_side(get_model(), spec)
+    elapsed_time = time.perf_counter() - start_time
+    print(f"{'in-process':>22} {'':>18}: {n_instances / elapsed_time:8.0f} samples/s  {metric}")
+
+    for manager_cls in [RiverModelManager, RiverModelManagerPipe]:
+        for loop in [client_side, client_side_fused, server_side]:
+            manager = manager_cls(model=get_model())
+            start_time = time.perf_counter()
+            metric = loop(manager, spec)
+            elapsed_time = time.perf_counter() - start_time
+            manager.stop()
+            print(f"{manager_cls.__name__:>22} {loop.__name__:>18}: {n_instances / elapsed_time:8.0f} samples/s  {metric}")
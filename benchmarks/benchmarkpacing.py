@@ -0,0 +1,18 @@
+from generator.list_generator import ListDatasetGenerator
+import time
+
+
+if __name__ == "__main__":
+    duration = 1.0
+    print(f"{'target (msg/s)':>14} {'period (ms)':>12} {'burst':>6} {'achieved (msg/s)':>17} {'error':>7} {'lag (ms)':>9}")
+    for target, burst in [(1000, 1), (10000, 1), (50000, 1), (100000, 1), (100000, 10), (500000, 100)]:
+        stream_period = burst / target * 1000
+        n_messages = int(target * duration)
+        generator = ListDatasetGenerator(dataset=range(n_messages + 1), stream_period=stream_period, burst=burst)
+        next(generator)
+        start_time = time.perf_counter()
+        for _ in generator:
+            pass
+        achieved = n_messages / (time.perf_counter() - start_time)
+        error = (achieved - target) / target * 100
+        print(f"{target:>14} {stream_period:>12.4f} {burst:>6} {achieved:>17.0f} {error:>6.2f}% {generator.get_lag():>9.3f}")
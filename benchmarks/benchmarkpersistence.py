@@ -0,0 +1,72 @@
+from benchmarks.benchmarksnapshots import get_big_model
+from rivermultiproccesing.persistence import load_model, save_model
+from rivermultiproccesing.snapshots import write_bytes
+import numpy as np
+import pickle
+import tempfile
+import os
+import time
+
+
+class ArrayModel:
+    """Stands for a model holding its state in arrays (e.g. a neural network's weights)."""
+
+    def __init__(self, n_layers, width):
+        rng = np.random.default_rng(42)
+        self.layers = [rng.standard_normal((width, width)).astype(np.float32) for _ in range(n_layers)]
+
+
+def time_it(f, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = f()
+        best = min(best, time.perf_counter() - start_time)
+    return best, result
+
+
+def save_pickle(model, path):
+    """The previous format: a plain pickle, written atomically like save_model."""
+    write_bytes(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL), path)
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def touch(model):
+    """Reads the whole state, so that lazily mapped pages are counted in the load time."""
+    if isinstance(model, ArrayModel):
+        return sum(float(layer.sum()) for layer in model.layers)
+    return None
+
+
+if __name__ == "__main__":
+    models = {
+        "TargetAgg 200k keys": get_big_model(200_000),
+        "arrays 8 x 1024^2 f32": ArrayModel(8, 1024),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.pkl")
+        for name, model in models.items():
+            print(name)
+            formats = {
+                "pickle": (lambda: save_pickle(model, path), lambda: load_pickle(path)),
+                **{
+                    f"rvmp {compression}": (
+                        lambda compression=compression: save_model(model, path, compression),
+                        lambda: load_model(path)
+                    )
+                    for compression in [None, "zlib", "lzma"]
+                }
+            }
+            for label, (save, load) in formats.items():
+                save_time, _ = time_it(save, repeat=1 if "lzma" in label else 3)
+                size = os.path.getsize(path)
+                load_time, _ = time_it(load)
+                read_time, _ = time_it(lambda: touch(load()))
+                print(
+                    f"  {label:<12} save {save_time * 1e3:8.1f} ms  load {load_time * 1e3:8.1f} ms  "
+                    f"load + read {read_time * 1e3:8.1f} ms  size {size / 1e6:7.2f} MB"
+                )
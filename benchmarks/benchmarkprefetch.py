@@ -0,0 +1,37 @@
+from generator.river_dataset_generator import RiverDatasetGenerator
+from river import datasets, optim, metrics, compose, linear_model, preprocessing
+import sys
+import time
+
+
+def get_model():
+    model = compose.SelectType(float, int)
+    model |= preprocessing.StandardScaler()
+    model |= linear_model.LinearRegression(optimizer=optim.SGD(0.001))
+    return model
+
+
+def run(dataset, n_instances, **kwargs):
+    model = get_model()
+    metric = metrics.MAE()
+    start_time = time.time()
+    generator = RiverDatasetGenerator(dataset=dataset, n_instances=n_instances, **kwargs)
+    for x, y in generator:
+        y_pred = model.predict_one(x)
+        model.learn_one(x, y)
+        metric.update(y, y_pred)
+    elapsed_time = time.time() - start_time
+    return generator.get_count() / elapsed_time, metric
+
+
+if __name__ == "__main__":
+    # python benchmarkprefetch.py [dataset name] [n_instances], e.g. Bikes 100000
+    dataset = getattr(datasets, sys.argv[1] if len(sys.argv) > 1 else "Bikes")()
+    n_instances = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    for label, kwargs in [
+        ("no prefetch", {}),
+        ("thread prefetch", {"prefetch": 4096, "prefetch_mode": "thread"}),
+        ("process prefetch", {"prefetch": 4096, "prefetch_mode": "process"}),
+    ]:
+        rate, metric = run(dataset, n_instances, **kwargs)
+        print(f"{label:>16}: {rate:10.0f} msg/s  {metric}")
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+from river.datasets import synth
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+from rivermultiproccesing.river_replicas import RiverReplicaManager
+from benchmarks.benchmarkbatching import get_model
+import itertools
+import os
+import time
+
+
+def read_heavy(manager, samples, n_callers=8, reads_per_learn=10):
+    """n_callers threads sending pipelined predictions, with one learn every reads_per_learn predictions."""
+    def caller(chunk):
+        futures = []
+        for i, (x, y) in enumerate(chunk):
+            futures.append(manager.predict_async(x))
+            if i % reads_per_learn == 0:
+                manager.learn_one(x, y)
+        for future in futures:
+            future.result()
+
+    chunks = [samples[i::n_callers] for i in range(n_callers)]
+    with ThreadPoolExecutor(max_workers=n_callers) as pool:
+        list(pool.map(caller, chunks))
+
+
+if __name__ == "__main__":
+    n_instances = 20000
+    samples = list(itertools.islice(synth.Friedman(seed=42), n_instances))
+    print(f"{os.cpu_count()} CPUs")
+    configurations = [("RiverModelManagerPipe", lambda: RiverModelManagerPipe(model=get_model(), batch_size=64, max_delay_us=500))]
+    for n_replicas in [1, 2, 4]:
+        for dispatch in ["round_robin", "least_loaded"]:
+            configurations.append((
+                f"RiverReplicaManager n={n_replicas} {dispatch}",
+                lambda n=n_replicas, d=dispatch: RiverReplicaManager(
+                    model=get_model(), n_replicas=n, snapshot_every=500, snapshot_interval=0.1,
+                    dispatch=d, batch_size=64, max_delay_us=500
+                )
+            ))
+
+    for label, make_manager in configurations:
+        manager = make_manager()
+        start_time = time.time()
+        read_heavy(manager, samples)
+        elapsed_time = time.time() - start_time
+        manager.stop()
+        print(f"{label:>44}: {n_instances / elapsed_time:10.0f} predictions/s")
@@ -0,0 +1,50 @@
+from river import compose, feature_extraction, linear_model, optim, preprocessing, stats
+from river.datasets import synth
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+from rivermultiproccesing.river_sharded import ShardedModelManager
+import itertools
+import os
+import time
+
+
+def get_model():
+    model = compose.Select(*range(10))
+    model += feature_extraction.TargetAgg(by=["station"], how=stats.Mean())
+    model |= preprocessing.StandardScaler()
+    model |= linear_model.LinearRegression(optimizer=optim.SGD(0.001))
+    return model
+
+
+def learn_only(model, samples):
+    for x, y in samples:
+        model.learn_one(x, y)
+    # One prediction per shard to make sure every learn has been applied
+    if isinstance(model, ShardedModelManager):
+        model.predict_all(samples[0][0])
+    else:
+        model.predict_one(samples[0][0])
+
+
+if __name__ == "__main__":
+    n_instances = 20000
+    # Keyed workload: 50 stations
+    samples = [
+        ({**x, "station": f"station_{i % 50}"}, y)
+        for i, (x, y) in enumerate(itertools.islice(synth.Friedman(seed=42), n_instances))
+    ]
+    print(f"{os.cpu_count()} CPUs")
+    kwargs = {"batch_size": 256, "max_delay_us": 1000}
+    configurations = [("RiverModelManagerPipe", lambda: RiverModelManagerPipe(model=get_model(), **kwargs))]
+    for n_shards in [1, 2, 4, 8]:
+        configurations.append((
+            f"ShardedModelManager n={n_shards}",
+            lambda n=n_shards: ShardedModelManager(model=get_model(), keys=["station"], n_shards=n, **kwargs)
+        ))
+
+    for label, make_manager in configurations:
+        manager = make_manager()
+        start_time = time.time()
+        learn_only(manager, samples)
+        elapsed_time = time.time() - start_time
+        manager.stop()
+        print(f"{label:>36}: {n_instances / elapsed_time:10.0f} learns/s")
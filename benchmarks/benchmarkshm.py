@@ -0,0 +1,32 @@
+from river.datasets import synth
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+from rivermultiproccesing.river_queue import RiverModelManager
+from rivermultiproccesing.river_shm import RiverModelManagerShm
+from benchmarks.benchmarkbatching import get_model, learn_only, prequential, pipelined
+import itertools
+import time
+
+
+if __name__ == "__main__":
+    # Fixed schema of 10 float features, like Bikes' clouds/humidity/pressure/temperature/wind
+    n_instances = 20000
+    samples = list(itertools.islice(synth.Friedman(seed=42), n_instances))
+    features = list(samples[0][0])
+    configurations = [
+        ("RiverModelManager", RiverModelManager, {}),
+        ("RiverModelManagerPipe", RiverModelManagerPipe, {}),
+        ("RiverModelManagerShm", RiverModelManagerShm, {"features": features}),
+        ("RiverModelManager batch=256", RiverModelManager, {"batch_size": 256, "max_delay_us": 1000}),
+        ("RiverModelManagerPipe batch=256", RiverModelManagerPipe, {"batch_size": 256, "max_delay_us": 1000}),
+        ("RiverModelManagerShm batch=256", RiverModelManagerShm,
+         {"features": features, "batch_size": 256, "max_delay_us": 1000}),
+    ]
+
+    for label, manager_cls, kwargs in configurations:
+        for loop in [learn_only, prequential, pipelined]:
+            manager = manager_cls(model=get_model(), **kwargs)
+            start_time = time.time()
+            loop(manager, samples)
+            elapsed_time = time.time() - start_time
+            manager.stop()
+            print(f"{label:>36} {loop.__name__:>12}: {n_instances / elapsed_time:10.0f} msg/s")
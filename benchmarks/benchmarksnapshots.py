@@ -0,0 +1,36 @@
+from river import feature_extraction, stats
+from rivermultiproccesing.snapshots import SnapshotPolicy, Snapshotter, write_model
+import pickle
+import tempfile
+import os
+import time
+
+
+def get_big_model(n_keys):
+    """TargetAgg state grows with the number of keys, like per-station models."""
+    model = feature_extraction.TargetAgg(by=["station", "hour"], how=stats.Mean())
+    for i in range(n_keys):
+        model.learn_one({"station": f"station_{i}", "hour": i % 24}, float(i))
+    return model
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_keys in [10_000, 100_000, 500_000]:
+            model = get_big_model(n_keys)
+            size = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+            start_time = time.perf_counter()
+            write_model(model, os.path.join(tmp, "sync.pkl"))
+            sync_pause = time.perf_counter() - start_time
+
+            results = []
+            for mode in ["fork", "thread"]:
+                snapshots = Snapshotter(os.path.join(tmp, f"{mode}.pkl"), SnapshotPolicy(every=1, mode=mode))
+                start_time = time.perf_counter()
+                snapshots.snapshot(model)
+                pause = time.perf_counter() - start_time
+                snapshots.close()
+                results.append(f"{mode}: pause {pause * 1e3:7.1f} ms, total {snapshots.last_duration * 1e3:7.1f} ms")
+
+            print(f"{n_keys:>7} keys ({size / 1e6:5.1f} MB)  blocking dump: {sync_pause * 1e3:7.1f} ms  " + "  ".join(results))
@@ -0,0 +1,27 @@
+from benchmarks.benchmarkbatching import get_model, learn_only, prequential
+from river.datasets import synth
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+from rivermultiproccesing.river_queue import RiverModelManager
+from rivermultiproccesing.telemetry import Telemetry
+import itertools
+import time
+
+
+if __name__ == "__main__":
+    n_samples = 20000
+    samples = list(itertools.islice(synth.Friedman(seed=42), n_samples))
+
+    for manager_cls in [RiverModelManager, RiverModelManagerPipe]:
+        for loop, batch_size in [(learn_only, 64), (prequential, 1)]:
+            for telemetry in [None, Telemetry()]:
+                manager = manager_cls(model=get_model(), batch_size=batch_size, telemetry=telemetry)
+                start_time = time.perf_counter()
+                loop(manager, samples)
+                elapsed_time = time.perf_counter() - start_time
+                stats = manager.stats()
+                manager.stop()
+                label = "telemetry" if telemetry is not None else "off"
+                print(f"{manager_cls.__name__:>22} {loop.__name__:>12} {label:>9}: {n_samples / elapsed_time:8.0f} msgs/s")
+                if stats is not None:
+                    print(f"{'':>46}time_s={ {part: round(t, 3) for part, t in stats['time_s'].items()} }")
+                    print(f"{'':>46}queue_wait p50={stats['queue_wait_s']['p50'] * 1e6:.0f}us p99={stats['queue_wait_s']['p99'] * 1e6:.0f}us")
@@ -0,0 +1,73 @@
+from generator.movingwindow_list_generator import MovingWindowListGenerator
+from generator.ring_buffer import RingBuffer
+import time
+
+
+def legacy_windows(data, past_history, forecasting_horizon, shift=1):
+    """The list based pop(0)/copy() windowing the generators used to do."""
+    x_window, y_window = [], []
+    for count, value in enumerate(data, start=1):
+        x_out, y_out = None, None
+        x_window.append(value)
+        if len(x_window) == past_history:
+            x_out = x_window.copy()
+            x_window.pop(0)
+        if count >= past_history + shift:
+            y_window.append(value)
+        if len(y_window) == forecasting_horizon:
+            y_out = y_window.copy()
+            y_window.pop(0)
+        if x_out is not None:
+            yield x_out, y_out
+
+
+def ring_windows(data, past_history, forecasting_horizon, shift=1):
+    """Same loop as legacy_windows, on top of RingBuffer."""
+    x_window, y_window = RingBuffer(past_history), RingBuffer(forecasting_horizon)
+    for count, value in enumerate(data, start=1):
+        x_out, y_out = None, None
+        x_window.append(value)
+        if x_window.is_full():
+            x_out = x_window.window()
+        if count >= past_history + shift:
+            y_window.append(value)
+            if y_window.is_full():
+                y_out = y_window.window()
+        if x_out is not None:
+            yield x_out, y_out
+
+
+def per_message_us(windows, n_messages):
+    start_time = time.perf_counter()
+    for _ in windows:
+        pass
+    return (time.perf_counter() - start_time) / n_messages * 1e6
+
+
+if __name__ == "__main__":
+    n_messages = 50000
+    forecasting_horizon = 10
+    print(f"{'past_history':>12} {'generator (us/msg)':>19} {'ring (us/msg)':>14} {'legacy (us/msg)':>16}")
+    for past_history in [10, 100, 1000, 3000, 10000]:
+        data = [float(i) for i in range(n_messages + past_history)]
+        generator = MovingWindowListGenerator(
+            data=data,
+            past_history=past_history,
+            forecasting_horizon=forecasting_horizon,
+        )
+        full = per_message_us(generator, n_messages)
+        ring = per_message_us(ring_windows(data, past_history, forecasting_horizon), n_messages)
+        legacy = per_message_us(legacy_windows(data, past_history, forecasting_horizon), n_messages)
+        print(f"{past_history:>12} {full:>19.3f} {ring:>14.3f} {legacy:>16.3f}")
+
+    n_points = 1000000
+    data = [[float(i), float(i % 7)] for i in range(n_points)]
+    generator = MovingWindowListGenerator(data=data, past_history=100, forecasting_horizon=10, input_idx=[0, 1], target_idx=0)
+    start_time = time.perf_counter()
+    for _ in generator:
+        pass
+    stream_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    X, y = generator.to_arrays()
+    batch_time = time.perf_counter() - start_time
+    print(f"{n_points} points: stream {stream_time:.2f}s, to_arrays {batch_time:.2f}s, X{X.shape} y{y.shape}")
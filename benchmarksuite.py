@@ -0,0 +1,428 @@
+from river import compose, feature_extraction, linear_model, optim, preprocessing, stats
+from rivermultiproccesing.river_pipe import RiverModelClientPipe, RiverModelManagerPipe
+from rivermultiproccesing.river_queue import RiverModelClient, RiverModelManager
+from rivermultiproccesing.river_replicas import RiverReplicaManager
+from rivermultiproccesing.river_sharded import ShardedModelManager
+from rivermultiproccesing.river_shm import RiverModelManagerShm
+from rivermultiproccesing.river_socket import RiverSocketClient
+from rivermultiproccesing.telemetry import LatencyHistogram
+import argparse
+import importlib.util
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import river
+
+# Every case is (transport, model, n_features, batch_size, n_clients)
+CASE_FIELDS = ("transport", "model", "n_features", "batch_size", "n_clients")
+
+N_STATIONS = 10
+
+# Seconds a case waits for each of its clients before giving up
+CLIENT_TIMEOUT = 600.0
+
+# Defaults of the command line, and with --quick
+FULL = {"models": ["trivial", "pipeline", "deep"], "features": [10, 100], "clients": [1, 4], "messages": 2000, "repeat": 3}
+QUICK = {"models": ["trivial", "pipeline"], "features": [10], "clients": [1, 2], "messages": 500, "repeat": 1}
+
+
+class Constant:
+    """Trivial model: the cost of a message is the transport alone."""
+
+    def predict_one(self, x):
+        return 0.0
+
+    def learn_one(self, x, y):
+        pass
+
+
+def pipeline_model(n_features):
+    """The pipeline of test.py, on numeric features (no timestamp, so no get_hour)."""
+    model = compose.Select(*range(n_features))
+    model += feature_extraction.TargetAgg(by=["station"], how=stats.Mean())
+    model |= preprocessing.StandardScaler()
+    model |= linear_model.LinearRegression(optimizer=optim.SGD(0.001))
+    return model
+
+
+def deep_model(n_features):
+    """The LSTM regressor of testdeep/main.py, on CPU (needs torch and deep_river)."""
+    from deep_river.regression import RollingRegressor
+    NewLstmModule = _load_module("lstm", os.path.join("testdeep", "lstm.py")).NewLstmModule
+    model = compose.Select(*range(n_features)) | preprocessing.StandardScaler()
+    model |= RollingRegressor(
+        module=NewLstmModule,
+        loss_fn="mse",
+        optimizer_fn="adam",
+        window_size=20,
+        lr=1e-2,
+        device="cpu",
+        hidden_size=16,
+        append_predict=False
+    )
+    return model
+
+
+def _load_module(name, path):
+    """Imports the module at path (relative to this file) under name, without changing sys.path."""
+    module = sys.modules.get(name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(os.path.dirname(os.path.abspath(__file__)), path))
+        module = importlib.util.module_from_spec(spec)
+        # Registered first, so that its classes can be pickled by reference
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+MODELS = {
+    "trivial": lambda n_features: Constant(),
+    "pipeline": pipeline_model,
+    "deep": deep_model,
+}
+
+
+class InProcess:
+    """A model shared by client threads, one call at a time (the baseline without IPC)."""
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+
+    def predict_one(self, x):
+        with self.lock:
+            return self.model.predict_one(x)
+
+    def learn_one(self, x, y):
+        with self.lock:
+            self.model.learn_one(x, y)
+
+    def stop(self):
+        pass
+
+
+class SocketServer:
+    """A RiverModelManager serving on a Unix domain socket, used through a RiverSocketClient."""
+
+    def __init__(self, model, batch_size):
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, "model.sock")
+        self.manager = RiverModelManager(model, socket_path=self.socket_path)
+        self.client = RiverSocketClient(self.socket_path, **_delay(batch_size))
+
+    def predict_one(self, x):
+        return self.client.predict_one(x)
+
+    def learn_one(self, x, y):
+        self.client.learn_one(x, y)
+
+    def flush(self):
+        self.client.flush()
+
+    def connect(self):
+        return self.socket_path
+
+    def stop(self):
+        self.client.close()
+        self.manager.stop()
+        os.rmdir(self.directory)
+
+
+def _delay(batch_size):
+    return {"batch_size": batch_size, "max_delay_us": 0 if batch_size == 1 else 1000}
+
+
+# transport -> (start(model, n_features, batch_size) -> server, client class for server.connect() or None)
+# Without connect(), the other clients are threads sharing the server's client
+TRANSPORTS = {
+    "inprocess": (lambda model, n_features, batch_size: InProcess(model), None),
+    "queue": (lambda model, n_features, batch_size: RiverModelManager(model, **_delay(batch_size)), RiverModelClient),
+    "pipe": (
+        lambda model, n_features, batch_size: RiverModelManagerPipe(model, **_delay(batch_size)),
+        RiverModelClientPipe
+    ),
+    "shm": (
+        lambda model, n_features, batch_size: RiverModelManagerShm(
+            model, features=[*range(n_features), "station"], **_delay(batch_size)
+        ),
+        RiverModelClientPipe
+    ),
+    "sharded": (
+        lambda model, n_features, batch_size: ShardedModelManager(
+            model, keys=["station"], n_shards=2, **_delay(batch_size)
+        ),
+        None
+    ),
+    "socket": (lambda model, n_features, batch_size: SocketServer(model, batch_size), RiverSocketClient),
+    "replicas": (
+        lambda model, n_features, batch_size: RiverReplicaManager(model, n_replicas=2, **_delay(batch_size)),
+        None
+    ),
+}
+
+
+def make_samples(n_features, n_samples, seed):
+    """Numeric features 0..n_features-1 and a station key, with a linear target."""
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(n_samples):
+        x = {i: rng.random() for i in range(n_features)}
+        x["station"] = float(rng.randrange(N_STATIONS))
+        y = sum(x[i] for i in range(min(n_features, 5))) + x["station"] + rng.gauss(0, 0.1)
+        samples.append((x, y))
+    return samples
+
+
+def run_client(model, samples, n_warmup, ready, go):
+    """
+    Prequential loop: a timed predict_one, then a learn_one, per sample; then waits for
+    the learns to be applied. Returns (start, end, latencies in ns).
+    """
+    for x, y in samples[:n_warmup]:
+        model.predict_one(x)
+        model.learn_one(x, y)
+    ready()
+    go.wait()
+    latencies = []
+    start = time.monotonic()
+    for x, y in samples[n_warmup:]:
+        sent = time.perf_counter_ns()
+        model.predict_one(x)
+        latencies.append(time.perf_counter_ns() - sent)
+        model.learn_one(x, y)
+    if hasattr(model, "flush"):
+        model.flush()
+    return start, time.monotonic(), latencies
+
+
+def _client_thread(model, samples, n_warmup, ready, go, results):
+    try:
+        results.put(run_client(model, samples, n_warmup, ready.release, go))
+    except Exception as e:
+        # The case fails with this error instead of waiting for the client
+        ready.release()
+        results.put(e)
+
+
+def _client_process(client_cls, conn, batch_size, samples, n_warmup, ready, go, results):
+    try:
+        client = client_cls(conn, **_delay(batch_size))
+    except Exception as e:
+        ready.release()
+        results.put(e)
+        return
+    try:
+        _client_thread(client, samples, n_warmup, ready, go, results)
+    finally:
+        client.close()
+
+
+def _result(results, timeout):
+    """The next run put by a client; re-raises the client's error, or TimeoutError."""
+    try:
+        run = results.get(timeout=timeout)
+    except queue.Empty:
+        raise TimeoutError(f"A client did not finish within {timeout} s") from None
+    if isinstance(run, BaseException):
+        raise run
+    return run
+
+
+def run_case(transport, model_name, n_features, batch_size, n_clients, n_messages, seed, timeout=CLIENT_TIMEOUT):
+    """
+    Runs one case: n_clients clients each send n_messages predict/learn pairs.
+    A client that fails makes the case raise its error, one that does not finish
+    within timeout seconds a TimeoutError.
+    :return: {"msgs_per_s", "latency_s": {"mean", "p50", "p99", "max"}}
+    """
+    start_server, client_cls = TRANSPORTS[transport]
+    n_warmup = min(100, n_messages)
+    data = [make_samples(n_features, n_warmup + n_messages, seed + client) for client in range(n_clients)]
+    ready = multiprocessing.Semaphore(0)
+    go = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = []
+    server = start_server(MODELS[model_name](n_features), n_features, batch_size)
+    try:
+        for client in range(n_clients):
+            if client > 0 and client_cls is not None:
+                worker = multiprocessing.Process(
+                    target=_client_process,
+                    args=(client_cls, server.connect(), batch_size, data[client], n_warmup, ready, go, results)
+                )
+            else:
+                worker = threading.Thread(
+                    target=_client_thread, args=(server, data[client], n_warmup, ready, go, results), daemon=True
+                )
+            worker.start()
+            workers.append(worker)
+        for _ in workers:
+            if not ready.acquire(timeout=timeout):
+                raise TimeoutError(f"A client did not warm up within {timeout} s")
+        go.set()
+        runs = [_result(results, timeout) for _ in workers]
+        for worker in workers:
+            worker.join()
+    finally:
+        go.set()
+        for worker in workers:
+            if isinstance(worker, multiprocessing.Process) and worker.is_alive():
+                worker.terminate()
+        server.stop()
+
+    histogram = LatencyHistogram()
+    for _, _, latencies in runs:
+        for latency in latencies:
+            histogram.record(latency)
+    elapsed = max(end for _, end, _ in runs) - min(start for start, _, _ in runs)
+    summary = histogram.summary()
+    return {
+        # A predict and a learn per sample
+        "msgs_per_s": 2 * n_messages * n_clients / elapsed,
+        "latency_s": {name: summary[name] for name in ("mean", "p50", "p99", "max")},
+    }
+
+
+def run_suite(transports, models, features, batch_sizes, clients, n_messages, repeat=1, seed=42):
+    """
+    Runs every combination; with repeat > 1, reports the run with the median throughput.
+    Cases whose model cannot be built here (e.g. deep without torch) are reported as skipped.
+    """
+    results = []
+    for model_name, n_features, batch_size, n_clients, transport in itertools.product(
+        models, features, batch_sizes, clients, transports
+    ):
+        case = dict(zip(CASE_FIELDS, (transport, model_name, n_features, batch_size, n_clients)))
+        try:
+            MODELS[model_name](n_features)
+        except ImportError as e:
+            results.append({**case, "skipped": f"{e}"})
+            continue
+        runs = [
+            run_case(transport, model_name, n_features, batch_size, n_clients, n_messages, seed)
+            for _ in range(repeat)
+        ]
+        median = statistics.median_low(run["msgs_per_s"] for run in runs)
+        result = next(run for run in runs if run["msgs_per_s"] == median)
+        results.append({**case, **result, "runs": [run["msgs_per_s"] for run in runs]})
+        print(_format(results[-1]), file=sys.stderr)
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "river": river.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compares results to a baseline (both lists of cases). A case regresses if its
+    throughput is below (1 - tolerance) times the baseline's, or its p99 latency above
+    (1 + tolerance) times it. Cases missing from either side are not compared.
+    :return: the list of {case fields, "msgs_per_s_ratio", "p99_ratio", "regression"}
+    """
+    base = {_key(result): result for result in baseline if "skipped" not in result}
+    comparison = []
+    for result in results:
+        old = base.get(_key(result))
+        if old is None or "skipped" in result:
+            continue
+        throughput_ratio = result["msgs_per_s"] / old["msgs_per_s"]
+        p99_ratio = result["latency_s"]["p99"] / old["latency_s"]["p99"] if old["latency_s"]["p99"] else 1.0
+        comparison.append({
+            **{field: result[field] for field in CASE_FIELDS},
+            "msgs_per_s_ratio": throughput_ratio,
+            "p99_ratio": p99_ratio,
+            "regression": throughput_ratio < 1 - tolerance or p99_ratio > 1 + tolerance,
+        })
+    return comparison
+
+
+def _key(result):
+    return tuple(result[field] for field in CASE_FIELDS)
+
+
+def _format(result):
+    case = " ".join(f"{result[field]!s:>9}" for field in CASE_FIELDS)
+    if "skipped" in result:
+        return f"{case}: skipped ({result['skipped']})"
+    latency = result["latency_s"]
+    return (
+        f"{case}: {result['msgs_per_s']:9.0f} msgs/s  "
+        f"p50 {latency['p50'] * 1e6:8.0f} us  p99 {latency['p99'] * 1e6:8.0f} us"
+    )
+
+
+def _list(cast):
+    return lambda text: [cast(item) for item in text.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Throughput and latency of every transport, over feature count, model cost, "
+                    "batch size and number of concurrent clients. Prints JSON."
+    )
+    parser.add_argument("--transports", type=_list(str), default=list(TRANSPORTS))
+    parser.add_argument("--models", type=_list(str))
+    parser.add_argument("--features", type=_list(int))
+    parser.add_argument("--batch-sizes", type=_list(int), default=[1, 64])
+    parser.add_argument("--clients", type=_list(int))
+    parser.add_argument("--messages", type=int, help="Samples per client (a predict and a learn each)")
+    parser.add_argument("--repeat", type=int, help="Runs per case; the median is reported")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--quick", action="store_true", help="Smaller defaults, for a smoke run")
+    parser.add_argument("--out", help="Also write the JSON to this file (e.g. to store a baseline)")
+    parser.add_argument("--baseline", help="JSON of an earlier run to compare against; exits with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change tolerated by --baseline")
+    args = parser.parse_args()
+    defaults = QUICK if args.quick else FULL
+    for name, value in defaults.items():
+        if getattr(args, name) is None:
+            setattr(args, name, value)
+    for name in args.transports:
+        if name not in TRANSPORTS:
+            parser.error(f"Unknown transport: {name}")
+    for name in args.models:
+        if name not in MODELS:
+            parser.error(f"Unknown model: {name}")
+
+    report = {
+        "environment": environment(),
+        "settings": {"messages": args.messages, "repeat": args.repeat, "seed": args.seed},
+        "results": run_suite(
+            args.transports, args.models, args.features, args.batch_sizes, args.clients,
+            args.messages, args.repeat, args.seed
+        ),
+    }
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report["results"], json.load(f)["results"], args.tolerance)
+        regressions = [entry for entry in report["comparison"] if entry["regression"]]
+        for entry in regressions:
+            case = " ".join(f"{entry[field]!s:>9}" for field in CASE_FIELDS)
+            print(
+                f"REGRESSION {case}: throughput x{entry['msgs_per_s_ratio']:.2f}, p99 x{entry['p99_ratio']:.2f}",
+                file=sys.stderr
+            )
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    sys.exit(1 if regressions else 0)
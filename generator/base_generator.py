@@ -1,30 +1,204 @@
+import asyncio
+import os
+import pickle
 import time
 from abc import ABC, abstractmethod
+
+from generator.pacer import Pacer
+
+
+_END_OF_STREAM = object()
+
+
+def _to_batch(xs, ys, output):
+    """Builds a batch from the collected messages in one go."""
+    if output == "list":
+        return xs, ys
+    if output == "pandas":
+        import pandas as pd
+
+        X = pd.DataFrame.from_records(xs) if isinstance(xs[0], dict) else pd.DataFrame(list(xs))
+        y = pd.DataFrame.from_records(ys) if isinstance(ys[0], dict) else pd.Series(ys)
+        return X, y
+
+    import numpy as np
+
+    if isinstance(xs[0], dict):
+        import pandas as pd
+
+        X = pd.DataFrame.from_records(xs).to_numpy()
+    else:
+        X = np.asarray(xs)
+    if any(y is None for y in ys):
+        y = np.empty(len(ys), dtype=object)
+        y[:] = ys
+    else:
+        y = np.asarray(ys)
+    return X, y
+
+
 class BaseGenerator(ABC):
-    def __init__(self, stream_period=0, timeout=30000):
-        self.stream_period = stream_period
+    # Set to True by generators whose get_message blocks (file reads, parsing), so that
+    # async iteration runs it in an executor instead of on the event loop.
+    blocking_reads = False
+
+    def __init__(self, stream_period=0, timeout=30000, burst=1):
+        """
+        Args:
+            stream_period (float): Delay between two consecutive ticks, in ms. Fractions
+                are allowed for sub-millisecond periods (0.01 is 10 microseconds).
+            timeout (int): (Optional) Not used, kept for completeness.
+            burst (int): Number of messages released on each tick.
+        """
+        self._pacer = Pacer(period_ms=stream_period, burst=burst)
         self.timeout = timeout
         self.last_message_time = time.time()
         self._count = 0
+
+    @property
+    def stream_period(self):
+        return self._pacer.period_ms
+
+    @stream_period.setter
+    def stream_period(self, value):
+        self._pacer.period_ms = value
+
+    @property
+    def burst(self):
+        return self._pacer.burst
+
+    def get_lag(self):
+        """How far behind the schedule the last message was released, in ms."""
+        return self._pacer.lag_ms
+
+    def next_release_ns(self):
+        """perf_counter_ns() time at which the next message is due, or None if it is due right away."""
+        return self._pacer.next_release_ns()
+
     def __iter__(self):
         return self
 
     def __next__(self): # Python 2: def next(self)
+        self._pacer.wait()
+        self.last_message_time = time.time()
+        return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """
+        Async counterpart of __next__: waits for the schedule with asyncio.sleep, so
+        many paced streams can share one event loop, then fetches the next message.
+        """
         if self.stream_period > 0:
-            if time.time() - self.last_message_time < self.stream_period / 1000:
-                time.sleep(
-                    self.stream_period / 1000
-                    - (
-                            (time.time() - self.last_message_time)
-                            % (self.stream_period / 1000)
-                    )
-                )
-        start_time = time.time()
-        self.last_message_time = start_time
+            delay = (self._pacer.schedule() - time.perf_counter_ns()) / 1e9
+            if delay > 0:
+                await asyncio.sleep(delay)
+        self.last_message_time = time.time()
+
+        if self.blocking_reads:
+            loop = asyncio.get_running_loop()
+            message = await loop.run_in_executor(None, self._message_or_end)
+        else:
+            message = self._message_or_end()
+        if message is _END_OF_STREAM:
+            raise StopAsyncIteration
+        return message
+
+    def _message_or_end(self):
+        # StopIteration can not travel through a Future, so it is turned into a sentinel
         try:
-            return None
-        except Exception as e:
-            raise StopIteration
+            return self.get_message()
+        except StopIteration:
+            return _END_OF_STREAM
+
+    def batches(self, size: int, max_wait_ms: float = None, output: str = "pandas"):
+        """
+        Groups the stream into mini-batches for learn_many/predict_many style consumers.
+
+        Messages are still read one by one through __next__, so stream_period pacing
+        applies to each message. A batch is emitted once it holds `size` messages, once
+        `max_wait_ms` have passed since its first message (or the next message is not
+        due before then), and at the end of the stream. Messages whose x is None (moving
+        window warm-up) are skipped.
+
+        Args:
+            size (int): Maximum number of messages per batch.
+            max_wait_ms (float): Maximum time a partial batch is held, in ms. None waits
+                until the batch is full.
+            output (str): "pandas" (DataFrame of x, Series of y), "numpy" (arrays) or
+                "list" (lists of x and y).
+
+        Yields:
+            Tuple: (X, y) for each batch.
+        """
+        if size < 1:
+            raise ValueError("size must be a positive integer")
+        if output not in ("pandas", "numpy", "list"):
+            raise ValueError(f"Unknown batch output: {output}")
+        xs, ys = [], []
+        deadline = None
+        while True:
+            if xs and deadline is not None:
+                next_release = self._pacer.next_release_ns()
+                if next_release is not None and next_release > deadline:
+                    yield _to_batch(xs, ys, output)
+                    xs, ys = [], []
+            try:
+                x, y = next(self)
+            except StopIteration:
+                break
+            if x is None:
+                continue
+            if not xs and max_wait_ms is not None:
+                deadline = time.perf_counter_ns() + int(max_wait_ms * 1e6)
+            xs.append(x)
+            ys.append(y)
+            if len(xs) == size or (deadline is not None and time.perf_counter_ns() >= deadline):
+                yield _to_batch(xs, ys, output)
+                xs, ys = [], []
+        if xs:
+            yield _to_batch(xs, ys, output)
+
+    def checkpoint(self):
+        """
+        Captures the stream position (and any window state) so it can be resumed later.
+
+        Returns:
+            dict: A picklable state to pass to restore().
+        """
+        return {"generator": type(self).__name__, "count": self._count}
+
+    def restore(self, state):
+        """
+        Moves the stream to the position captured by checkpoint(). It is meant to be
+        called on a generator built with the same arguments as the checkpointed one.
+        """
+        if state["generator"] != type(self).__name__:
+            raise ValueError(f"Checkpoint of a {state['generator']} can not restore a {type(self).__name__}")
+        self._seek(state["count"])
+        self._count = state["count"]
+
+    def save_checkpoint(self, path):
+        """Writes checkpoint() to path atomically (temporary file + rename)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.checkpoint(), f)
+        os.replace(tmp_path, path)
+
+    def load_checkpoint(self, path):
+        with open(path, "rb") as f:
+            self.restore(pickle.load(f))
+
+    def _seek(self, count):
+        """
+        Positions the source so that the next message is message number `count`.
+        Generators override it with a cheaper seek; this fallback reads and drops
+        the messages in between.
+        """
+        for _ in range(count - self._count):
+            self.get_message()
 
     def stop(self):
         """Function to be called when stream is finished."""
@@ -47,4 +221,4 @@ class BaseGenerator(ABC):
 
     @abstractmethod
     def get_count(self):
-        raise NotImplementedError("Abstract method")
\ No newline at end of file
+        raise NotImplementedError("Abstract method")
@@ -0,0 +1,265 @@
+"""On-disk columnar cache to replay river datasets without parsing them again."""
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _column_kind(values):
+    """Picks the storage kind of a column from its (non missing) values."""
+    kinds = {type(v) for v in values}
+    if not kinds:
+        return "object"
+    if kinds == {bool}:
+        return "bool"
+    if kinds == {int}:
+        return "int"
+    if kinds <= {int, float}:
+        return "float"
+    if kinds == {str}:
+        return "str"
+    if kinds == {datetime.datetime} and all(v.tzinfo is None for v in values):
+        return "datetime"
+    return "object"
+
+
+class _ColumnWriter:
+    """Encodes one column (a feature, or the target) and writes it as .npy files."""
+
+    def __init__(self, name, values, present):
+        self.name = name
+        self.kind = _column_kind([v for v, p in zip(values, present) if p])
+        self.values = values
+        self.present = present
+
+    def write(self, path, index):
+        meta = {"name": self.name, "kind": self.kind, "file": f"{index}.npy"}
+        values = self.values
+        if not all(self.present):
+            meta["mask"] = f"{index}.mask.npy"
+            np.save(os.path.join(path, meta["mask"]), np.asarray(self.present, dtype=bool))
+            # Missing slots are filled with a neutral value of the column type
+            fill = {"bool": False, "int": 0, "float": 0.0, "str": "", "datetime": _EPOCH}.get(self.kind)
+            values = [v if p else fill for v, p in zip(values, self.present)]
+
+        if self.kind == "bool":
+            array = np.asarray(values, dtype=bool)
+        elif self.kind == "int":
+            array = np.asarray(values, dtype=np.int64)
+        elif self.kind == "float":
+            array = np.asarray(values, dtype=np.float64)
+        elif self.kind == "str":
+            # Dictionary encoding: codes point into a vocabulary stored in the metadata
+            vocabulary = {}
+            codes = [vocabulary.setdefault(v, len(vocabulary)) for v in values]
+            array = np.asarray(codes, dtype=np.int32)
+            meta["vocabulary"] = list(vocabulary)
+        elif self.kind == "datetime":
+            # Epoch encoding, in microseconds
+            array = np.asarray(values, dtype="datetime64[us]").astype(np.int64)
+        else:
+            array = np.empty(len(values), dtype=object)
+            array[:] = values
+        np.save(os.path.join(path, meta["file"]), array, allow_pickle=True)
+        return meta
+
+
+class CachedStream:
+    """
+    Replays a dataset from the memory-mapped columns of a ColumnarCache entry.
+
+    Iterating yields the same (x, y) pairs as the original dataset. take() makes it
+    usable wherever a river dataset is expected (e.g. RiverDatasetGenerator).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.n_rows = self.meta["n_rows"]
+        self.y_kind = self.meta["y_kind"]
+        self.columns = {}
+        self.masks = {}
+        self._vocabularies = {}
+        for column in self.meta["columns"]:
+            name = column["name"] = tuple(column["name"])
+            mmap_mode = None if column["kind"] == "object" else "r"
+            self.columns[name] = np.load(os.path.join(path, column["file"]), mmap_mode=mmap_mode, allow_pickle=True)
+            if "mask" in column:
+                self.masks[name] = np.load(os.path.join(path, column["mask"]), mmap_mode="r")
+            if "vocabulary" in column:
+                self._vocabularies[name] = np.asarray(column["vocabulary"], dtype=object)
+        self._kinds = {column["name"]: column["kind"] for column in self.meta["columns"]}
+        self._x_names = [name for name in self.columns if name[0] == "x"]
+        self._y_names = [name for name in self.columns if name[0] == "y"]
+
+    def __len__(self):
+        return self.n_rows
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def take(self, k):
+        return self.iter_from(0, min(k, self.n_rows))
+
+    def column_slice(self, name, start=0, stop=None):
+        """
+        Returns the raw, still encoded, values of a column (a view of the mapped file).
+        Feature columns are named ("x", feature name) and the target ("y",) or
+        ("y", output name); the codes of dictionary-encoded strings index vocabulary(name).
+        """
+        return self.columns[name][start:stop]
+
+    def vocabulary(self, name):
+        return self._vocabularies[name]
+
+    def iter_columns(self, chunk_size=4096, start=0):
+        """Yields the raw columns in chunks, as {name: array}."""
+        for chunk_start in range(start, self.n_rows, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, self.n_rows)
+            yield {name: column[chunk_start:chunk_stop] for name, column in self.columns.items()}
+
+    def iter_from(self, start, stop=None, chunk_size=4096):
+        """Yields (x, y) pairs from row `start` (a direct seek, nothing before it is decoded)."""
+        stop = self.n_rows if stop is None else min(stop, self.n_rows)
+        for chunk_start in range(start, stop, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            xs = self._decode_dicts(self._x_names, chunk_start, chunk_stop)
+            if self.y_kind == "dict":
+                ys = self._decode_dicts(self._y_names, chunk_start, chunk_stop)
+            elif self.y_kind == "none":
+                ys = [None] * (chunk_stop - chunk_start)
+            else:
+                ys = self._decode(("y",), chunk_start, chunk_stop)
+            yield from zip(xs, ys)
+
+    def _decode(self, name, start, stop):
+        kind = self._kinds[name]
+        raw = self.columns[name][start:stop]
+        if kind == "str":
+            values = self._vocabularies[name][raw].tolist()
+        elif kind == "datetime":
+            values = raw.astype("datetime64[us]").astype(object).tolist()
+        else:
+            values = raw.tolist()
+        if name in self.masks:
+            values = [v if p else None for v, p in zip(values, self.masks[name][start:stop].tolist())]
+        return values
+
+    def _decode_dicts(self, names, start, stop):
+        keys = [name[1] for name in names]
+        columns = [self._decode(name, start, stop) for name in names]
+        if not columns:
+            return [{} for _ in range(start, stop)]
+        if not any(name in self.masks for name in names):
+            return [dict(zip(keys, row)) for row in zip(*columns)]
+        masks = [self.masks[name][start:stop].tolist() if name in self.masks else None for name in names]
+        rows = []
+        for i, row in enumerate(zip(*columns)):
+            rows.append({k: v for k, v, m in zip(keys, row, masks) if m is None or m[i]})
+        return rows
+
+
+class ColumnarCache:
+    """
+    Cache of datasets converted to typed column arrays.
+
+    The first request for a (dataset, n_instances) pair streams the dataset once and
+    writes every feature as a .npy column: numbers as int64/float64, strings
+    dictionary-encoded and naive datetimes as epoch microseconds. Other values are
+    kept in a pickled object column. Later requests map the files in memory.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def key(dataset, n_instances):
+        """
+        Identifies a dataset by its class, its parameters and the number of messages.
+        The parameters are those of _get_params() (e.g. the seed of a synthetic stream);
+        a dataset without it (e.g. a river file dataset) is identified by its class. Its
+        repr is not used: a remote dataset's includes the download state, which changes
+        the first time it is read.
+        """
+        n_samples = getattr(dataset, "n_samples", None)
+        if n_samples is not None:
+            n_instances = min(n_instances, n_samples)
+        cls = type(dataset)
+        get_params = getattr(dataset, "_get_params", None)
+        params = json.dumps(get_params() if get_params is not None else {}, sort_keys=True, default=repr)
+        identity = f"{FORMAT_VERSION}|{cls.__module__}.{cls.__qualname__}|{params}|{n_instances}"
+        return hashlib.sha1(identity.encode()).hexdigest()
+
+    def path(self, dataset, n_instances):
+        return os.path.join(self.cache_dir, self.key(dataset, n_instances))
+
+    def get(self, dataset, n_instances):
+        """
+        Returns:
+            CachedStream: The cached stream, built first if it does not exist yet.
+        """
+        path = self.path(dataset, n_instances)
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            self.build(dataset, n_instances, path)
+        return CachedStream(path)
+
+    def build(self, dataset, n_instances, path=None):
+        """Writes the cache entry of dataset, to path if given (else its key's path), and returns its path."""
+        if path is None:
+            # Keyed before the dataset is read
+            path = self.path(dataset, n_instances)
+        xs, ys = [], []
+        for x, y in dataset.take(n_instances):
+            xs.append(x)
+            ys.append(y)
+
+        columns = []
+        feature_names = list(dict.fromkeys(k for x in xs for k in x))
+        for name in feature_names:
+            values = [x.get(name) for x in xs]
+            present = [name in x for x in xs]
+            columns.append(_ColumnWriter(("x", name), values, present))
+
+        if all(y is None for y in ys):
+            y_kind = "none"
+        elif all(isinstance(y, dict) for y in ys):
+            y_kind = "dict"
+            for name in dict.fromkeys(k for y in ys for k in y):
+                values = [y.get(name) for y in ys]
+                present = [name in y for y in ys]
+                columns.append(_ColumnWriter(("y", name), values, present))
+        else:
+            y_kind = "value"
+            columns.append(_ColumnWriter(("y",), ys, [y is not None for y in ys]))
+
+        # Written in a temporary directory first, so a cache entry is either complete or absent
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_path)
+        try:
+            meta = {
+                "format_version": FORMAT_VERSION,
+                "dataset": repr(dataset),
+                "n_rows": len(xs),
+                "y_kind": y_kind,
+                "columns": [column.write(tmp_path, i) for i, column in enumerate(columns)],
+            }
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another process may have built the same entry in the meantime
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                raise
+        return path
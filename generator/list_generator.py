@@ -1,18 +1,23 @@
 """Implements a wraper for river datasets."""
 
+import itertools
+from collections.abc import Sequence
+
 from generator.base_generator import BaseGenerator
 
 
 class ListDatasetGenerator(BaseGenerator):
 
-    def __init__(self, dataset, stream_period=0, timeout=30000,  n_instances=1000, **kwargs):
+    def __init__(self, dataset, stream_period=0, timeout=30000,  n_instances=1000, burst=1, **kwargs):
         """
         Args:
-            stream_period (int): Delay between two consecutive messages, in ms.
+            stream_period (float): Delay between two consecutive messages, in ms.
             timeout (int): (Optional) Not used in this example, but included for completeness.
+            burst (int): Number of messages released every stream_period.
         """
-        super().__init__(stream_period=stream_period, timeout=timeout)
+        super().__init__(stream_period=stream_period, timeout=timeout, burst=burst)
         self.n_instances = n_instances
+        self._dataset = dataset
         self._iterator = iter(dataset)
 
     def __next__(self):
@@ -47,5 +52,16 @@ class ListDatasetGenerator(BaseGenerator):
             self.stop()     # Optionally perform any cleanup here
             raise
 
+    def _seek(self, count):
+        # Indexable sources (lists, arrays, ...) are resumed with a direct offset,
+        # anything else is skipped forward without converting the skipped items.
+        if isinstance(self._dataset, Sequence) or hasattr(self._dataset, "__array__"):
+            self._iterator = map(self._dataset.__getitem__, range(count, len(self._dataset)))
+            return
+        skip = count - self._count
+        if skip < 0:
+            raise ValueError("Can not seek backwards in a one-shot iterator")
+        next(itertools.islice(self._iterator, skip, skip), None)
+
     def get_count(self):
         return self._count
\ No newline at end of file
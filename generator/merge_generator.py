@@ -0,0 +1,106 @@
+"""Merges several streams into one, in event-time order."""
+
+import heapq
+
+from generator.base_generator import BaseGenerator
+from generator.river_dataset_generator import RiverDatasetGenerator
+
+
+class MergeGenerator(BaseGenerator):
+    """
+    K-way merge of several streams by a timestamp field.
+
+    Each source keeps a single message of lookahead in a heap, so memory is O(N)
+    and each message costs O(log N) for N sources. If every source is sorted by
+    its timestamp, the merged stream is globally sorted; messages with the same
+    timestamp come out in source order.
+    """
+
+    def __init__(
+        self,
+        sources,
+        timestamp_key="moment",
+        stream_period=0,
+        timeout=30000,
+        n_instances=1000,
+        burst=1,
+    ):
+        """
+        Args:
+            sources (list): BaseGenerator instances or river datasets (wrapped in a
+                RiverDatasetGenerator of n_instances messages).
+            timestamp_key (str or Callable): Key of x holding the event time, or a
+                function (x, y) -> sortable value.
+            stream_period (float): Delay between two consecutive merged messages, in ms.
+            timeout (int): (Optional) Not used, kept for completeness.
+            n_instances (int): Number of messages taken from each river dataset.
+            burst (int): Number of messages released every stream_period.
+        """
+        super().__init__(stream_period=stream_period, timeout=timeout, burst=burst)
+        self.sources = [
+            source if isinstance(source, BaseGenerator) else RiverDatasetGenerator(dataset=source, n_instances=n_instances)
+            for source in sources
+        ]
+        if callable(timestamp_key):
+            self._get_timestamp = timestamp_key
+        else:
+            self._get_timestamp = lambda x, y: x[timestamp_key]
+        self.timestamp_key = timestamp_key
+        # Index of the source the last message came from
+        self.last_source = None
+        self._heap = None
+
+    def _fill(self):
+        self._heap = []
+        for i, source in enumerate(self.sources):
+            entry = self._pull(i, source)
+            if entry is not None:
+                self._heap.append(entry)
+        heapq.heapify(self._heap)
+
+    def _pull(self, i, source):
+        try:
+            x, y = next(source)
+        except StopIteration:
+            return None
+        return self._get_timestamp(x, y), i, x, y
+
+    def __next__(self):
+        super().__next__()
+        return self.get_message()
+
+    def get_message(self):
+        if self._heap is None:
+            self._fill()
+        if not self._heap:
+            self.stop()
+            raise StopIteration
+        _, i, x, y = self._heap[0]
+        entry = self._pull(i, self.sources[i])
+        if entry is None:
+            heapq.heappop(self._heap)
+        else:
+            heapq.heapreplace(self._heap, entry)
+        self.last_source = i
+        self._count += 1
+        return x, y
+
+    def checkpoint(self):
+        """Adds the position of every source and the messages held in the lookahead heap."""
+        state = super().checkpoint()
+        state["sources"] = [source.checkpoint() for source in self.sources]
+        state["heap"] = None if self._heap is None else list(self._heap)
+        return state
+
+    def restore(self, state):
+        super().restore(state)
+        for source, source_state in zip(self.sources, state["sources"]):
+            source.restore(source_state)
+        self._heap = None if state["heap"] is None else list(state["heap"])
+
+    def _seek(self, count):
+        # Positions live in the sources, restore() takes care of them
+        pass
+
+    def get_count(self):
+        return self._count
@@ -1,4 +1,8 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
 from generator.base_generator import BaseGenerator
+from generator.ring_buffer import RingBuffer
 
 
 class MovingWindowListGenerator(BaseGenerator):
@@ -9,6 +13,12 @@ class MovingWindowListGenerator(BaseGenerator):
       - Single-feature data is flattened (e.g., [1,2,3,4]).
       - Multi-feature data remains nested (e.g., [[1],[2],[3],[4]] or [[1,2],[2,3],...]).
       - Uses >= condition so the Y-window includes the first possible target.
+
+    Windows are kept in RingBuffer objects and emitted as WindowView objects,
+    so producing a window costs O(1) no matter how large past_history is.
+
+    For offline work, to_arrays() and iter_arrays() build every aligned (X, y)
+    pair at once as NumPy arrays instead of walking the data one element at a time.
     """
 
     def __init__(
@@ -20,7 +30,8 @@ class MovingWindowListGenerator(BaseGenerator):
         input_idx=None,
         target_idx=None,
         stream_period=0,
-        timeout=30000
+        timeout=30000,
+        burst=1
     ):
         """
         Args:
@@ -32,8 +43,10 @@ class MovingWindowListGenerator(BaseGenerator):
             shift: Gap between X-window end and Y-window start.
             input_idx: Which features to use for X (None => all, int => 1 column, list => multiple columns).
             target_idx: Which features to use for Y (None => all, int => 1 column, list => multiple columns).
+            stream_period: Delay between two consecutive messages, in ms (fractions allowed).
+            burst: Number of messages released every stream_period.
         """
-        super().__init__(stream_period=stream_period, timeout=timeout)
+        super().__init__(stream_period=stream_period, timeout=timeout, burst=burst)
         self.data = data
         self.past_history = past_history
         self.forecasting_horizon = forecasting_horizon
@@ -44,11 +57,11 @@ class MovingWindowListGenerator(BaseGenerator):
         # Keep track of whether data is single-feature or multi-feature
         # If the first item is a list, we assume multi-feature. If it's int/float => single-feature.
         # (Assumes data is not empty.)
-        self._is_multi_feature = isinstance(self.data[0], list)
+        self._is_multi_feature = isinstance(self.data[0], (list, np.ndarray))
 
         # Sliding windows
-        self.x_window = []
-        self.y_window = []
+        self.x_window = RingBuffer(past_history)
+        self.y_window = RingBuffer(forecasting_horizon)
 
         # Read index
         self._count = 0
@@ -83,36 +96,50 @@ class MovingWindowListGenerator(BaseGenerator):
             if not self._is_multi_feature:
                 raw_val = [raw_val]
 
-            # Select features for X
+            # Select features for X.
+            # If the dataset is truly single-feature, flatten each step.
+            # e.g. [[1],[2],[3],[4]] -> [1,2,3,4]
             x_features = self._select_features(raw_val, self.input_idx)
+            if not self._is_multi_feature:
+                x_features = x_features[0]
             self.x_window.append(x_features)
 
-            # Once x_window hits past_history, produce x_out and slide
-            if len(self.x_window) == self.past_history:
-                x_out = self.x_window.copy()
-                self.x_window.pop(0)  # remove oldest to keep sliding
-
-                # If the dataset is truly single-feature, flatten each step.
-                # e.g. [[1],[2],[3],[4]] -> [1,2,3,4]
-                if not self._is_multi_feature:
-                    x_out = [x_[0] for x_ in x_out]  # each x_ is [value], so take x_[0]
+            # Once x_window hits past_history, produce x_out (the buffer slides by itself)
+            if self.x_window.is_full():
+                x_out = self.x_window.window()
 
             # Start populating y_window once we've read at least (past_history + shift) data points
             if self._count >= (self.past_history + self.shift):
                 y_features = self._select_features(raw_val, self.target_idx)
-                self.y_window.append(y_features)
-
-            # If y_window hits forecasting_horizon, produce y_out and slide
-            if len(self.y_window) == self.forecasting_horizon:
-                y_out = self.y_window.copy()
-                self.y_window.pop(0)
-
                 # If single-feature => flatten each step
                 if not self._is_multi_feature:
-                    y_out = [y_[0] for y_ in y_out]
+                    y_features = y_features[0]
+                self.y_window.append(y_features)
+
+                # If y_window hits forecasting_horizon, produce y_out
+                if self.y_window.is_full():
+                    y_out = self.y_window.window()
 
         return x_out, y_out
 
+    def checkpoint(self):
+        """Adds the content of the moving windows to the stream position."""
+        state = super().checkpoint()
+        state["x_window"] = self.x_window.tolist()
+        state["y_window"] = self.y_window.tolist()
+        return state
+
+    def restore(self, state):
+        super().restore(state)
+        self.x_window.clear()
+        self.x_window.extend(state["x_window"])
+        self.y_window.clear()
+        self.y_window.extend(state["y_window"])
+
+    def _seek(self, count):
+        # The data is indexed by the read position, nothing to skip
+        pass
+
     def _select_features(self, data_list, idx):
         """
         data_list is a list of features, e.g. [value] or [value1, value2,...].
@@ -125,4 +152,72 @@ class MovingWindowListGenerator(BaseGenerator):
         if isinstance(idx, list):
             return [data_list[i] for i in idx]
         # fallback
-        return data_list
\ No newline at end of file
+        return data_list
+
+    def to_arrays(self):
+        """
+        Builds every supervised window pair in a single vectorized pass.
+
+        X[i] holds the past_history steps starting at data[i] and y[i] holds the
+        forecasting_horizon steps that start shift steps after the end of X[i].
+        These are the same windows the stream emits, but aligned: the stream hands
+        out y[i] together with a later X window, once the target is known.
+        X windows whose target runs past the end of the data are left out.
+
+        The windows are strided views over the column array, so no window is
+        copied. Selecting several columns with a list copies those columns once.
+        This does not move the streaming position.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: X of shape (n_windows, past_history, n_features)
+            and y of shape (n_windows, forecasting_horizon, n_targets).
+        """
+        data = np.asarray(self.data)
+        if data.ndim == 1:
+            data = data[:, None]
+        x_columns = self._select_columns(data, self.input_idx)
+        y_columns = self._select_columns(data, self.target_idx)
+
+        y_start = self.past_history + self.shift - 1
+        n_windows = max(len(data) - y_start - self.forecasting_horizon + 1, 0)
+        if n_windows == 0:
+            return (
+                np.empty((0, self.past_history, x_columns.shape[1]), dtype=data.dtype),
+                np.empty((0, self.forecasting_horizon, y_columns.shape[1]), dtype=data.dtype),
+            )
+
+        # sliding_window_view puts the window axis last: (n, n_features, steps)
+        X = sliding_window_view(x_columns, self.past_history, axis=0)[:n_windows]
+        y = sliding_window_view(y_columns[y_start:], self.forecasting_horizon, axis=0)[:n_windows]
+        return X.transpose(0, 2, 1), y.transpose(0, 2, 1)
+
+    def iter_arrays(self, chunk_size: int):
+        """
+        Iterates over the output of to_arrays() in chunks of chunk_size windows.
+
+        Args:
+            chunk_size (int): Number of windows per chunk (the last one may be shorter).
+
+        Yields:
+            Tuple[np.ndarray, np.ndarray]: Views over consecutive windows of X and y.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a positive integer")
+        X, y = self.to_arrays()
+        for start in range(0, len(X), chunk_size):
+            yield X[start:start + chunk_size], y[start:start + chunk_size]
+
+    def _select_columns(self, data, idx):
+        """
+        Column counterpart of _select_features for a 2D array.
+        An int or a list of consecutive indices is sliced (a view); any other list is gathered.
+        """
+        if not isinstance(idx, (int, list)):
+            return data
+        n_columns = data.shape[1]
+        if isinstance(idx, int):
+            idx = [idx]
+        idx = [i + n_columns if i < 0 else i for i in idx]
+        if idx and idx == list(range(idx[0], idx[0] + len(idx))):
+            return data[:, idx[0]:idx[0] + len(idx)]
+        return data[:, idx]
@@ -1,5 +1,6 @@
-from generator.list_generator import ListDatasetGenerator
+from generator.base_generator import BaseGenerator
 from generator.river_dataset_generator import RiverDatasetGenerator
+from generator.ring_buffer import RingBuffer
 
 
 class MovingWindowRiverGenerator(RiverDatasetGenerator):
@@ -10,6 +11,9 @@ class MovingWindowRiverGenerator(RiverDatasetGenerator):
     preprocessing method for time series forecasting. It assumes that each
     message produced by the base generator is a tuple (x, y) and uses the first
     element (x) as the raw time series message.
+
+    The windows are backed by RingBuffer objects, so each message costs O(1)
+    regardless of past_history. Emitted windows are WindowView objects.
     """
 
     def __init__(
@@ -20,9 +24,10 @@ class MovingWindowRiverGenerator(RiverDatasetGenerator):
             shift: int = 1,
             input_idx=None,
             target_idx=None,
-            stream_period: int = 0,
+            stream_period: float = 0,
             timeout: int = 30000,
             n_instances: int = 1000,
+            burst: int = 1,
             **kwargs
     ):
         """
@@ -35,11 +40,12 @@ class MovingWindowRiverGenerator(RiverDatasetGenerator):
                 If None, all features are used.
             target_idx (int or list, optional): Index/indices to select from the message for target.
                 If None, all features are used.
-            stream_period (int): Delay between two consecutive messages (ms).
+            stream_period (float): Delay between two consecutive messages (ms, fractions allowed).
             timeout (int): Timeout (kept for consistency with the base generator).
             n_instances (int): Maximum number of messages to stream.
+            burst (int): Number of messages released every stream_period.
         """
-        super().__init__(dataset=dataset, stream_period=stream_period, timeout=timeout, n_instances=n_instances, **kwargs)
+        super().__init__(dataset=dataset, stream_period=stream_period, timeout=timeout, n_instances=n_instances, burst=burst, **kwargs)
         self.past_history = past_history
         self.forecasting_horizon = forecasting_horizon
         self.shift = shift
@@ -47,12 +53,26 @@ class MovingWindowRiverGenerator(RiverDatasetGenerator):
         self.target_idx = target_idx
 
         # Internal buffers for moving window
-        self.x_window = []
-        self.y_window = []
+        self.x_window = RingBuffer(past_history)
+        self.y_window = RingBuffer(forecasting_horizon)
 
         # Ensure the counter is initialized (if not already by the base class)
         self._count = 0
 
+    def checkpoint(self):
+        """Adds the content of the moving windows to the stream position."""
+        state = super().checkpoint()
+        state["x_window"] = self.x_window.tolist()
+        state["y_window"] = self.y_window.tolist()
+        return state
+
+    def restore(self, state):
+        super().restore(state)
+        self.x_window.clear()
+        self.x_window.extend(state["x_window"])
+        self.y_window.clear()
+        self.y_window.extend(state["y_window"])
+
     def _select_features(self, message, idx):
         """
         Select features from the message based on the provided index or indices.
@@ -100,15 +120,12 @@ class MovingWindowRiverGenerator(RiverDatasetGenerator):
         if self._count >= self.past_history + self.shift:
             self.y_window.append(self._get_y(y))
 
-        # When x_window is full, create a copy for output and remove the oldest entry
-        if len(self.x_window) == self.past_history:
-            x_out = self.x_window.copy()
-            self.x_window.pop(0)
+        # When a window is full, emit a view of it; the buffer drops the oldest entry on the next append
+        if self.x_window.is_full():
+            x_out = self.x_window.window()
 
-        # When y_window is full, create a copy for output and remove the oldest entry
-        if len(self.y_window) == self.forecasting_horizon:
-            y_out = self.y_window.copy()
-            self.y_window.pop(0)
+        if self.y_window.is_full():
+            y_out = self.y_window.window()
         return x_out, y_out
 
     def __next__(self):
@@ -117,9 +134,9 @@ class MovingWindowRiverGenerator(RiverDatasetGenerator):
           1. Respects the timing logic from the BaseGenerator (sleep if necessary).
           2. Calls get_message to fetch the next data point.
         """
-        # Step 1: respect timing logic from the base class
-        super().__next__()
-
+        # Step 1: respect timing logic from the base class. RiverDatasetGenerator.__next__
+        # would already fetch a message, so go straight to BaseGenerator for the pacing.
+        BaseGenerator.__next__(self)
 
         return self.get_message()
 
@@ -135,9 +152,8 @@ class MovingWindowRiverGenerator(RiverDatasetGenerator):
         try:
             # Get the raw message from the parent generator.
             # The parent returns a tuple (x, y) but we use x as the raw time series message.
+            # It also increments the message count.
             raw_x, raw_y = super().get_message()
-            # The base generator already increments the message count, but we also ensure it here.
-            self._count += 1
 
             return self._preprocess(raw_x,raw_y)
         except StopIteration:
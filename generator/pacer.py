@@ -0,0 +1,98 @@
+"""Drift-free pacing for the stream generators."""
+
+import time
+
+
+class Pacer:
+    """
+    Releases messages following an absolute schedule on the monotonic clock.
+
+    Tick k is due at start + k * period, and each tick releases `burst`
+    messages, so the target rate is burst / period. Since deadlines are not
+    computed from the previous message, jitter and slow consumers do not add
+    up: a late message is released immediately and the stream catches up.
+
+    Waiting is hybrid: time.sleep() covers the bulk of the wait and the last
+    `spin_threshold_us` microseconds are spent spinning on the clock, which
+    is what makes sub-millisecond periods accurate.
+    """
+
+    spin_threshold_us = 200
+
+    def __init__(self, period_ms: float = 0, burst: int = 1):
+        """
+        Args:
+            period_ms (float): Time between two ticks, in ms. Fractions are allowed
+                (0.01 is 10 microseconds). 0 disables pacing.
+            burst (int): Number of messages released on each tick.
+        """
+        if burst < 1:
+            raise ValueError("burst must be a positive integer")
+        self.period_ms = period_ms
+        self.burst = burst
+        self.reset()
+
+    @property
+    def period_ms(self):
+        return self._period_ns / 1e6
+
+    @period_ms.setter
+    def period_ms(self, value):
+        if value < 0:
+            raise ValueError("period_ms can not be negative")
+        self._period_ns = int(round(value * 1e6))
+        self.reset()
+
+    def reset(self):
+        """Starts a new schedule at the next call to wait()."""
+        self._next_tick = None
+        self._released = 0
+        self._lag_ns = 0
+
+    @property
+    def lag_ms(self):
+        """How late the last message was released with respect to the schedule, in ms."""
+        return self._lag_ns / 1e6
+
+    def next_release_ns(self):
+        """
+        Returns:
+            int: perf_counter_ns() time at which the next message is due, or None if
+            it is due right away.
+        """
+        if self._period_ns <= 0 or self._next_tick is None:
+            return None
+        if self._released < self.burst:
+            return self._next_tick
+        return self._next_tick + self._period_ns
+
+    def schedule(self):
+        """
+        Books the next slot of the schedule without waiting for it.
+
+        Returns:
+            int: perf_counter_ns() time at which the booked message is due.
+        """
+        now = time.perf_counter_ns()
+        if self._next_tick is None:
+            self._next_tick = now
+        elif self._released >= self.burst:
+            self._next_tick += self._period_ns
+            self._released = 0
+        self._released += 1
+        self._lag_ns = max(now - self._next_tick, 0)
+        return self._next_tick
+
+    def wait(self):
+        """Blocks until the next message is due."""
+        if self._period_ns <= 0:
+            return
+        self.sleep_until(self.schedule())
+
+    def sleep_until(self, deadline_ns):
+        spin_ns = self.spin_threshold_us * 1000
+        remaining = deadline_ns - time.perf_counter_ns()
+        if remaining > spin_ns:
+            time.sleep((remaining - spin_ns) / 1e9)
+        while time.perf_counter_ns() < deadline_ns:
+            pass
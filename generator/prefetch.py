@@ -0,0 +1,160 @@
+"""Read-ahead of dataset messages in a background thread or process."""
+
+import multiprocessing
+import pickle
+import queue
+import threading
+
+_END = "end"
+_ERROR = "error"
+_CHUNK = "chunk"
+
+
+def _produce(make_iterator, chunk_size, put, stopped):
+    """Fills the buffer with (kind, payload) frames until the source is exhausted."""
+    chunk = []
+    try:
+        for item in make_iterator():
+            chunk.append(item)
+            if len(chunk) == chunk_size:
+                if not put((_CHUNK, chunk)):
+                    return
+                chunk = []
+            if stopped():
+                return
+        last_frame = (_END, None)
+    except BaseException as e:
+        last_frame = (_ERROR, e)
+    # Messages read before the end (or the error) are delivered first
+    if chunk and not put((_CHUNK, chunk)):
+        return
+    put(last_frame)
+
+
+def _process_main(make_iterator, chunk_size, buffer, stop_event):
+    def put(frame):
+        while not stop_event.is_set():
+            try:
+                buffer.put(frame, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def put_error(frame):
+        # Exceptions that can not be pickled are sent as their repr
+        kind, payload = frame
+        if kind == _ERROR:
+            try:
+                pickle.dumps(payload)
+            except Exception:
+                frame = (_ERROR, RuntimeError(repr(payload)))
+        return put(frame)
+
+    _produce(make_iterator, chunk_size, put_error, stop_event.is_set)
+    if stop_event.is_set():
+        # Nobody will read what is left in the pipe, do not wait for it to be flushed
+        buffer.cancel_join_thread()
+    buffer.close()
+
+
+class PrefetchIterator:
+    """
+    Iterator that reads ahead from a source while the consumer does other work.
+
+    A background thread (or process) pulls messages from `make_iterator()` and
+    keeps up to `buffer_size` of them in a bounded buffer, handed over in chunks
+    to keep the per-message synchronization cost low. Messages come out in the
+    source order, StopIteration is raised once the source is exhausted and any
+    exception raised by the source is re-raised in the consumer.
+
+    A thread is enough when the source releases the GIL (I/O, C parsers). For
+    pure Python decoding, a process moves the work to another core; the source
+    must then be picklable when the start method is not fork.
+    """
+
+    def __init__(self, make_iterator, buffer_size: int = 1024, mode: str = "thread", chunk_size: int = 64):
+        """
+        Args:
+            make_iterator (Callable[[], Iterator]): Builds the source iterator. It is
+                called in the background thread or process.
+            buffer_size (int): Maximum number of messages read ahead.
+            mode (str): "thread" or "process".
+            chunk_size (int): Maximum number of messages per hand-over.
+        """
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be a positive integer")
+        chunk_size = max(min(chunk_size, buffer_size), 1)
+        max_chunks = max(buffer_size // chunk_size, 1)
+        self.mode = mode
+        self._chunk = iter(())
+        self._done = False
+
+        if mode == "thread":
+            self._buffer = queue.Queue(maxsize=max_chunks)
+            self._stop_flag = threading.Event()
+            self._worker = threading.Thread(
+                target=_produce,
+                args=(make_iterator, chunk_size, self._thread_put, self._stop_flag.is_set),
+                daemon=True,
+            )
+        elif mode == "process":
+            self._buffer = multiprocessing.Queue(maxsize=max_chunks)
+            self._stop_flag = multiprocessing.Event()
+            self._worker = multiprocessing.Process(
+                target=_process_main,
+                args=(make_iterator, chunk_size, self._buffer, self._stop_flag),
+                daemon=True,
+            )
+        else:
+            raise ValueError(f"Unknown prefetch mode: {mode}")
+        self._worker.start()
+
+    def _thread_put(self, frame):
+        while not self._stop_flag.is_set():
+            try:
+                self._buffer.put(frame, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        for item in self._chunk:
+            return item
+        if self._done:
+            raise StopIteration
+        kind, payload = self._get_frame()
+        if kind == _CHUNK:
+            self._chunk = iter(payload)
+            return next(self._chunk)
+        self._done = True
+        self.close()
+        if kind == _ERROR:
+            raise payload
+        raise StopIteration
+
+    def _get_frame(self):
+        while True:
+            try:
+                return self._buffer.get(timeout=0.5)
+            except queue.Empty:
+                if not self._worker.is_alive():
+                    # The worker may have put its last frame right before exiting
+                    try:
+                        return self._buffer.get(timeout=0.5)
+                    except queue.Empty:
+                        return _ERROR, RuntimeError("The prefetch worker exited unexpectedly.")
+
+    def close(self):
+        """Stops the background worker. Messages still buffered are discarded."""
+        self._done = True
+        self._chunk = iter(())
+        self._stop_flag.set()
+        if self.mode == "process" and self._worker.is_alive():
+            self._worker.join(timeout=1)
+            if self._worker.is_alive():
+                self._worker.terminate()
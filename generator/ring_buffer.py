@@ -0,0 +1,126 @@
+"""Fixed-capacity ring buffer used by the moving window generators."""
+
+from collections.abc import Sequence
+
+
+class WindowView(Sequence):
+    """
+    Read-only view over a contiguous slice of a RingBuffer block.
+
+    A view never copies the window it represents, so emitting one is O(1)
+    regardless of the window size. The slots it covers are never written
+    again by the buffer, which means a view stays valid after the buffer
+    has moved on (it behaves like a snapshot of the window).
+    """
+
+    __slots__ = ("_data", "_start", "_stop")
+
+    def __init__(self, data, start, stop):
+        self._data = data
+        self._start = start
+        self._stop = stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.tolist()[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("window index out of range")
+        return self._data[self._start + index]
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, WindowView):
+            return self.tolist() == other.tolist()
+        if isinstance(other, (list, tuple)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def tolist(self):
+        """Materializes the window as a new list."""
+        return self._data[self._start:self._stop]
+
+    def copy(self):
+        """Alias of tolist(), kept for code written against list windows."""
+        return self.tolist()
+
+
+class RingBuffer:
+    """
+    Preallocated sliding buffer holding the last `capacity` items.
+
+    Items are written into a block of `capacity * (spare + 1)` slots. Once the
+    block is exhausted, the live items are moved to a freshly allocated block
+    instead of being overwritten in place, so the WindowView objects already
+    handed out keep pointing at unchanged data. Moving the live items costs
+    O(capacity) but only happens every `capacity * spare` appends, so appending
+    and emitting a window are O(1) amortized.
+    """
+
+    def __init__(self, capacity: int, spare: int = 1):
+        """
+        Args:
+            capacity (int): Number of items kept in the window.
+            spare (int): Extra block space, as a multiple of capacity.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be a positive integer")
+        if spare < 1:
+            raise ValueError("spare must be a positive integer")
+        self.capacity = capacity
+        self._size = capacity * (spare + 1)
+        self._data = [None] * self._size
+        self._start = 0
+        self._stop = 0
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def is_full(self):
+        return self._stop - self._start == self.capacity
+
+    def append(self, item):
+        """Adds an item, dropping the oldest one if the buffer is full."""
+        if self._stop == self._size:
+            self._rebase()
+        self._data[self._stop] = item
+        self._stop += 1
+        if self._stop - self._start > self.capacity:
+            self._start += 1
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def window(self):
+        """
+        Returns:
+            WindowView: The items currently held, oldest first.
+        """
+        return WindowView(self._data, self._start, self._stop)
+
+    def tolist(self):
+        return self._data[self._start:self._stop]
+
+    def clear(self):
+        self._data = [None] * self._size
+        self._start = 0
+        self._stop = 0
+
+    def _rebase(self):
+        live = self._data[self._start:self._stop]
+        self._data = [None] * self._size
+        self._data[:len(live)] = live
+        self._start = 0
+        self._stop = len(live)
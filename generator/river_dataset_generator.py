@@ -1,19 +1,56 @@
 """Implements a wraper for river datasets."""
 
+import functools
+import itertools
+
 from generator.base_generator import BaseGenerator
+from generator.columnar_cache import CachedStream, ColumnarCache
+from generator.prefetch import PrefetchIterator
+
+
+def _take_from(dataset, n_instances, start):
+    """dataset.take(n_instances) without its first `start` messages."""
+    return itertools.islice(dataset.take(n_instances), start, None)
 
 
 class RiverDatasetGenerator(BaseGenerator):
+    # River datasets read and parse files while iterating
+    blocking_reads = True
 
-    def __init__(self,dataset, stream_period=0, timeout=30000,  n_instances=1000, **kwargs):
+    def __init__(self,dataset, stream_period=0, timeout=30000,  n_instances=1000, burst=1,
+                 prefetch=0, prefetch_mode="thread", cache_dir=None, **kwargs):
         """
         Args:
-            stream_period (int): Delay between two consecutive messages, in ms.
+            stream_period (float): Delay between two consecutive messages, in ms.
             timeout (int): (Optional) Not used in this example, but included for completeness.
+            burst (int): Number of messages released every stream_period.
+            prefetch (int): Number of messages to read ahead in the background. 0 reads
+                each message when it is requested.
+            prefetch_mode (str): "thread" or "process", where the read-ahead runs.
+            cache_dir (str): If given, the dataset is replayed from a ColumnarCache in this
+                directory (converted on the first run) instead of being parsed again.
         """
-        super().__init__(stream_period=stream_period, timeout=timeout)
+        super().__init__(stream_period=stream_period, timeout=timeout, burst=burst)
         self.n_instances = n_instances
-        self._iterator = iter(dataset.take(n_instances))
+        if cache_dir is not None:
+            dataset = ColumnarCache(cache_dir).get(dataset, n_instances)
+        self._dataset = dataset
+        self._prefetch = prefetch
+        self._prefetch_mode = prefetch_mode
+        self._iterator = self._open(0)
+
+    def _open(self, start):
+        """Builds the message iterator, starting at message number `start`."""
+        if isinstance(self._dataset, CachedStream):
+            # Cached datasets seek directly to the offset
+            make_iterator = functools.partial(self._dataset.iter_from, start, self.n_instances)
+        elif start > 0:
+            make_iterator = functools.partial(_take_from, self._dataset, self.n_instances, start)
+        else:
+            make_iterator = functools.partial(self._dataset.take, self.n_instances)
+        if self._prefetch > 0:
+            return PrefetchIterator(make_iterator, buffer_size=self._prefetch, mode=self._prefetch_mode)
+        return iter(make_iterator())
 
     def __next__(self):
         """
@@ -42,5 +79,15 @@ class RiverDatasetGenerator(BaseGenerator):
             self.stop()     # Optionally perform any cleanup here
             raise
 
+    def _seek(self, count):
+        self.stop()
+        self._iterator = self._open(count)
+
+    def stop(self):
+        """Releases the dataset iterator (and the prefetch worker, if any)."""
+        close = getattr(self._iterator, "close", None)
+        if close is not None:
+            close()
+
     def get_count(self):
         return self._count
\ No newline at end of file
@@ -0,0 +1,227 @@
+import collections
+import random
+import threading
+
+
+class BackpressurePolicy:
+    """
+    Bounds the learn commands a client has in flight (sent to the server and not
+    applied yet), and says what happens to a learn_one beyond the bound.
+
+    :param max_in_flight: Maximum number of learns in flight
+    :param overload:      "block": learn_one waits until the server has caught up.
+                          "drop_oldest": learn_one never waits; learns beyond the bound
+                          wait in a backlog of max_backlog learns on the client, sent as
+                          the server catches up, and the oldest one is shed when it is full.
+                          A learn within the bound is sent right away, so it keeps its place
+                          before the commands sent after it; a learn that went to the backlog
+                          may be overtaken by them (e.g. a predict does not see it).
+                          "sample": learn_one never waits; above watermark * max_in_flight
+                          learns are kept with a probability going down linearly to 0 at
+                          max_in_flight, the others are shed.
+    :param watermark:     Fraction of max_in_flight where "sample" starts shedding
+    :param max_backlog:   Size of the "drop_oldest" backlog (default max_in_flight)
+    :param seed:          Seed of the "sample" random draws
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 10_000,
+        overload: str = "block",
+        watermark: float = 0.5,
+        max_backlog: int = None,
+        seed: int = None
+    ):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be a positive integer")
+        if overload not in ("block", "drop_oldest", "sample"):
+            raise ValueError(f"Unknown overload policy: {overload}")
+        if not 0 <= watermark < 1:
+            raise ValueError("watermark must be in [0, 1)")
+        self.max_in_flight = max_in_flight
+        self.overload = overload
+        self.watermark = watermark
+        self.max_backlog = max_in_flight if max_backlog is None else max_backlog
+        self.seed = seed
+
+
+class LearnFlow:
+    """
+    Sends the learns of a client and keeps track of how many the server has applied.
+
+    The server applies the commands of a connection in order, so a "sync" command
+    sent after the n-th learn is answered once the first n learns are applied. With a
+    policy, a sync follows every max_in_flight // 4 learns, which bounds the learns in
+    flight at the cost of one small round trip per window; flush() sends one right away
+    and waits for it. Without a policy learns are sent as they come, as before.
+
+    Every learn is sent from the calling thread, in order with its other commands,
+    except the "drop_oldest" learns that find the bound reached (or a backlog already
+    waiting): those are sent later by the pump thread.
+    """
+
+    def __init__(self, send_learn, send_sync, flush_frames, policy: BackpressurePolicy = None):
+        """
+        :param send_learn:   Callable (x_dict, y_label) queuing a learn command
+        :param send_sync:    Callable (flush) queuing a sync command and returning its Future
+        :param flush_frames: Callable sending the commands waiting in the client's batch
+        """
+        self.policy = policy
+        self._send_learn = send_learn
+        self._send_sync = send_sync
+        self._flush_frames = flush_frames
+        # Serializes the sends, so that a sync counts exactly the learns sent before it
+        self._send_lock = threading.Lock()
+        # Guards the counters; never held while sending (a blocked send would stall the responses)
+        self._cond = threading.Condition()
+        self.sent = 0
+        self.applied = 0
+        self.shed = 0
+        self._synced = 0
+        self._broken = None
+        self._backlog = collections.deque()
+        self._pumping = 0
+        self._closing = False
+        self._pump = None
+        if policy is not None:
+            self._sync_every = max(1, policy.max_in_flight // 4)
+            self._random = random.Random(policy.seed)
+            if policy.overload == "drop_oldest":
+                self._pump = threading.Thread(target=self._pump_backlog, daemon=True)
+                self._pump.start()
+
+    @property
+    def in_flight(self):
+        """Learns sent and not known to be applied yet."""
+        return self.sent - self.applied
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "sent": self.sent,
+                "applied": self.applied,
+                "in_flight": self.in_flight,
+                "backlog": len(self._backlog) + self._pumping,
+                "shed": self.shed,
+            }
+
+    def learn(self, x_dict, y_label):
+        policy = self.policy
+        if policy is None:
+            self._send(x_dict, y_label)
+        elif policy.overload == "block":
+            self._wait_for_room()
+            self._send(x_dict, y_label)
+        elif policy.overload == "drop_oldest":
+            with self._cond:
+                # Within the bound and with nothing queued before it, the learn goes out now
+                direct = (
+                    not self._backlog and not self._pumping and self._broken is None
+                    and self.in_flight < policy.max_in_flight
+                )
+                if not direct:
+                    self._backlog.append((x_dict, y_label))
+                    if len(self._backlog) > policy.max_backlog:
+                        self._backlog.popleft()
+                        self.shed += 1
+                    self._cond.notify_all()
+            if direct:
+                self._send(x_dict, y_label)
+        else:
+            if self._keep():
+                self._send(x_dict, y_label)
+            else:
+                with self._cond:
+                    self.shed += 1
+
+    def flush(self, timeout: float = None):
+        """Waits until every learn sent before has been applied by the server."""
+        if self._pump is not None:
+            with self._cond:
+                if not self._cond.wait_for(lambda: not self._backlog and not self._pumping, timeout):
+                    raise TimeoutError("The backlog was not sent in time")
+        with self._send_lock:
+            future = self._sync(flush=True)
+        future.result(timeout)
+
+    def close(self):
+        """Sends the backlog, if any (called before the client closes)."""
+        if self._pump is not None:
+            with self._cond:
+                self._closing = True
+                self._cond.notify_all()
+            self._pump.join()
+
+    def _send(self, x_dict, y_label):
+        with self._send_lock:
+            self._send_learn(x_dict, y_label)
+            with self._cond:
+                self.sent += 1
+                sync = self.policy is not None and self.sent - self._synced >= self._sync_every
+            if sync:
+                self._sync(flush=False)
+
+    def _sync(self, flush):
+        """Queues a sync covering every learn sent so far (called with _send_lock held)."""
+        with self._cond:
+            self._synced = covered = self.sent
+        future = self._send_sync(flush)
+        future.add_done_callback(lambda f: self._on_synced(f, covered))
+        return future
+
+    def _on_synced(self, future, covered):
+        # Runs on the client's demultiplexer thread
+        with self._cond:
+            if future.exception() is not None:
+                self._broken = future.exception()
+            self.applied = max(self.applied, covered)
+            self._cond.notify_all()
+
+    def _has_room(self):
+        return self.in_flight < self.policy.max_in_flight or self._broken is not None
+
+    def _wait_for_room(self):
+        with self._cond:
+            if self._has_room():
+                return
+        # The syncs covering the learns in flight may still wait in the client's batch
+        self._flush_frames()
+        with self._cond:
+            self._cond.wait_for(self._has_room)
+
+    def _keep(self):
+        """Random draw of the "sample" policy."""
+        with self._cond:
+            in_flight = self.in_flight
+        high = self.policy.max_in_flight
+        low = self.policy.watermark * high
+        if in_flight < low:
+            return True
+        # Overloaded: make sure the pending syncs are on their way, so that in_flight can go down
+        self._flush_frames()
+        return self._random.random() < (high - in_flight) / (high - low)
+
+    def _pump_backlog(self):
+        """Sends the "drop_oldest" backlog as the server catches up."""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._backlog or self._closing)
+                if not self._backlog:
+                    return
+                if self._broken is not None:
+                    # The connection is gone: nothing will be sent any more
+                    self.shed += len(self._backlog)
+                    self._backlog.clear()
+                    self._cond.notify_all()
+                    continue
+                room = self.policy.max_in_flight - self.in_flight
+                batch = [self._backlog.popleft() for _ in range(min(room, len(self._backlog)))]
+                self._pumping = len(batch)
+            if not batch:
+                self._wait_for_room()
+                continue
+            for x_dict, y_label in batch:
+                self._send(x_dict, y_label)
+            with self._cond:
+                self._pumping = 0
+                self._cond.notify_all()
@@ -0,0 +1,80 @@
+import threading
+import time
+
+
+class CommandBatcher:
+    """
+    Coalesces the commands sent by a manager into frames, so that many
+    learn/predict commands share a single pickle and IPC call.
+
+    A frame is sent as soon as it holds `max_batch` commands, when a caller
+    asks for it (e.g. a predict that has to be answered now) or, if
+    `max_delay_us` is set, when its oldest command has waited that long.
+    With max_batch=1 every command is sent on its own, as before.
+    """
+
+    def __init__(self, send_frame, max_batch: int = 1, max_delay_us: int = 0):
+        """
+        :param send_frame:   Callable receiving the list of commands of a frame
+        :param max_batch:    Maximum number of commands per frame
+        :param max_delay_us: Maximum time a command waits for its frame to fill up (0 = no limit)
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be a positive integer")
+        self._send_frame = send_frame
+        self.max_batch = max_batch
+        self.max_delay_us = max_delay_us
+        self._pending = []
+        self._deadline = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._flusher = None
+        if max_batch > 1 and max_delay_us > 0:
+            self._flusher = threading.Thread(target=self._flush_on_deadline, daemon=True)
+            self._flusher.start()
+
+    def add(self, command, flush: bool = False):
+        """Queues a command, sending the frame if it is full or if flush is True."""
+        with self._cond:
+            self._pending.append(command)
+            if len(self._pending) >= self.max_batch or flush:
+                self._flush_locked()
+            elif len(self._pending) == 1 and self._flusher is not None:
+                self._deadline = time.monotonic() + self.max_delay_us / 1e6
+                self._cond.notify()
+
+    def add_soon(self, command):
+        """
+        Queues a command that has to reach the server in bounded time: it waits at most
+        max_delay_us for its frame to fill up, or is sent right away if there is no delay.
+        """
+        self.add(command, flush=self._flusher is None)
+
+    def flush(self):
+        """Sends the pending commands right away."""
+        with self._cond:
+            self._flush_locked()
+
+    def close(self):
+        with self._cond:
+            self._flush_locked()
+            self._closed = True
+            self._cond.notify()
+
+    def _flush_locked(self):
+        if self._pending:
+            frame, self._pending = self._pending, []
+            self._deadline = None
+            self._send_frame(frame)
+
+    def _flush_on_deadline(self):
+        with self._cond:
+            while not self._closed:
+                if self._deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining <= 0:
+                    self._flush_locked()
+                else:
+                    self._cond.wait(remaining)
@@ -0,0 +1,343 @@
+import itertools
+import operator
+import pickle
+import struct
+
+# Record kinds
+_BLOCK = 1
+# Anything else, pickled as is; the count field holds the payload length
+_PICKLED = 2
+# Defines a schema: the schema id field holds its id, the count field the payload length
+_SCHEMA = 3
+# The client's send time of the frame (time.monotonic()), for the server's telemetry
+_SENT_AT = 4
+
+# Message opcodes, one per message of a block
+_LEARN = 0
+_PREDICT = 1
+_PREDICTION = 2
+_PREDICT_LEARN = 3
+
+# record kind, schema id, number of messages (or payload length)
+_HEADER = struct.Struct("<BII")
+_STAMP = struct.Struct("<d")
+
+_CODES = {float: "d", int: "q", bool: "?"}
+
+# Marks the target of a predict, which has none
+_NO_Y = object()
+
+_opcode = operator.itemgetter(0)
+_request_id = operator.itemgetter(1)
+_x_dict = operator.itemgetter(2)
+
+
+def _value_types(entry):
+    """Types of the values of a (fields, message) pair."""
+    return tuple(map(type, entry[0][2].values()))
+
+
+class Codec:
+    """
+    Compact wire format for the manager <-> server messages.
+
+    Consecutive learn/predict/prediction messages whose x_dict has the same keys form a
+    block: a 9-byte header (kind, schema id, count), then its columns, each packed by a
+    single struct call: the opcodes, the request ids, the feature values (row by row)
+    and the targets of the messages that have one. A schema is the key set of x_dict
+    and the types of the values (float, int or bool, plus the targets'). The first time
+    a schema is used it gets the next integer id and its definition is sent once, in the
+    same stream, just before the block; the other side learns it on the fly. Messages
+    that do not fit (other value types, other commands) are pickled as is.
+
+    The codec saves bytes, not CPU: the keys are not written at all, so a batched
+    message takes about 60% of its pickle's size. Encoding and decoding run in Python
+    around one struct call per block, and stay slower than the C pickler: about twice
+    its time, for a batch of same-schema messages as for a frame of a single message.
+    Use it where the bytes matter (a loaded pipe or socket, a slow network hop), not
+    to save the server's time.
+
+    The encoder and decoder states are independent: one Codec encodes what an endpoint
+    sends and decodes what it receives on the same ordered stream.
+    """
+
+    def __init__(self):
+        # (keys, types, target type) -> (schema id, value format, target format) of the schemas sent so far
+        self._sent = {}
+        # schema id -> (keys, value format, target format) of the schemas received so far
+        self._received = []
+        # Structs of the blocks seen so far, by (value format, target format, count, number of targets)
+        self._formats = {}
+
+    def __getstate__(self):
+        # A codec only makes sense with the stream it was used on
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def encode(self, messages, sent_at: float = None) -> bytes:
+        """Encodes a list of messages (stamped with sent_at, if given) into a single frame."""
+        frame = bytearray()
+        if sent_at is not None:
+            frame += _HEADER.pack(_SENT_AT, 0, 0)
+            frame += _STAMP.pack(sent_at)
+        # The block being built: the keys of its messages, and their (fields, message)
+        block_keys = None
+        block = []
+        for message in messages:
+            fields = self._fields(message)
+            if fields is None:
+                if block:
+                    self._encode_block(frame, block)
+                    block = []
+                self._encode_pickled(frame, message)
+                continue
+            keys = tuple(fields[2])
+            if keys != block_keys and block:
+                self._encode_block(frame, block)
+                block = []
+            block_keys = keys
+            block.append((fields, message))
+        if block:
+            self._encode_block(frame, block)
+        return bytes(frame)
+
+    def _encode_pickled(self, frame, message):
+        payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+        frame += _HEADER.pack(_PICKLED, 0, len(payload))
+        frame += payload
+
+    def _encode_block(self, frame, block):
+        """Packs (fields, message) pairs with the same keys, as one block per run of messages with the same types."""
+        if len(block) == 1:
+            # A message alone: its own types are its schema's
+            fields = block[0][0]
+            opcode, request_id, x_dict, y = fields
+            values = x_dict.values()
+            ys = () if y is _NO_Y else (y,)
+            signature = (tuple(x_dict), tuple(map(type, values)), None if y is _NO_Y else type(y))
+            self._pack_block(frame, block, signature, (opcode, request_id, *values, *ys), len(ys))
+            return
+        fields = [entry[0] for entry in block]
+        x_dict = fields[0][2]
+        values = list(itertools.chain.from_iterable(map(dict.values, map(_x_dict, fields))))
+        ys = [entry[3] for entry in fields if entry[3] is not _NO_Y]
+        value_types = set(map(type, values))
+        target_types = set(map(type, ys))
+        if len(value_types) == 1 and len(target_types) <= 1:
+            # The common case: all the values (and all the targets) have one type
+            signature = (tuple(x_dict), tuple(value_types) * len(x_dict), target_types.pop() if target_types else None)
+            columns = (*map(_opcode, fields), *map(_request_id, fields), *values, *ys)
+            self._pack_block(frame, block, signature, columns, len(ys))
+            return
+        # Else one block per run of messages with the same types (e.g. around an int among floats)
+        for _, run in itertools.groupby(block, _value_types):
+            run = list(run)
+            fields = [entry[0] for entry in run]
+            ys = [entry[3] for entry in fields if entry[3] is not _NO_Y]
+            if len(run) == 1 or len(set(map(type, ys))) > 1:
+                for entry in run:
+                    self._encode_block(frame, [entry])
+                continue
+            values = list(itertools.chain.from_iterable(map(dict.values, map(_x_dict, fields))))
+            x_dict, y = fields[0][2], next(iter(ys), _NO_Y)
+            signature = (tuple(x_dict), tuple(map(type, x_dict.values())), None if y is _NO_Y else type(y))
+            columns = (*map(_opcode, fields), *map(_request_id, fields), *values, *ys)
+            self._pack_block(frame, run, signature, columns, len(ys))
+
+    def _pack_block(self, frame, block, signature, columns, n_targets):
+        schema = self._sent.get(signature)
+        if schema is None:
+            schema = self._define(frame, signature)
+        try:
+            if schema is None:
+                raise struct.error("unsupported type")
+            frame += self._block_format(schema, len(block), n_targets).pack(_BLOCK, schema[0], len(block), *columns)
+        except struct.error:
+            # e.g. a string, or an int beyond 64 bits
+            for _, message in block:
+                self._encode_pickled(frame, message)
+
+    def _block_format(self, schema, count, n_targets):
+        """Struct of a whole block (header and columns) of count messages, n_targets of them with a target."""
+        _, fmt, y_code = schema
+        key = (fmt, y_code, count, n_targets)
+        block_format = self._formats.get(key)
+        if block_format is None:
+            targets = f"{n_targets}{y_code}" if n_targets else ""
+            block_format = struct.Struct(f"{_HEADER.format}{count}B{count}q{fmt * count}{targets}")
+            if len(self._formats) >= 1024:
+                self._formats.clear()
+            self._formats[key] = block_format
+        return block_format
+
+    def _define(self, frame, signature):
+        codes = [_CODES.get(t) for t in signature[1]]
+        y_code = None if signature[2] is None else _CODES.get(signature[2])
+        if None in codes or (signature[2] is not None and y_code is None):
+            return None
+        schema = self._sent[signature] = (len(self._sent), "".join(codes), y_code)
+        definition = pickle.dumps((signature[0], schema[1], y_code), protocol=pickle.HIGHEST_PROTOCOL)
+        frame += _HEADER.pack(_SCHEMA, schema[0], len(definition))
+        frame += definition
+        return schema
+
+    def decode(self, frame) -> list:
+        """Decodes a frame into its list of messages."""
+        return self.decode_frame(frame)[0]
+
+    def decode_frame(self, frame):
+        """
+        Decodes a frame.
+        :return: (list of messages, the frame's send time or None if it is not stamped)
+        """
+        messages = []
+        sent_at = None
+        offset = 0
+        while offset < len(frame):
+            kind, schema_id, count = _HEADER.unpack_from(frame, offset)
+            offset += _HEADER.size
+            if kind == _BLOCK:
+                offset = self._decode_block(frame, offset, schema_id, count, messages)
+            elif kind == _SCHEMA:
+                keys, fmt, y_code = pickle.loads(frame[offset:offset + count])
+                if schema_id != len(self._received):
+                    raise ValueError(f"Schema {schema_id} defined out of order")
+                self._received.append((keys, fmt, y_code))
+                offset += count
+            elif kind == _PICKLED:
+                messages.append(pickle.loads(frame[offset:offset + count]))
+                offset += count
+            elif kind == _SENT_AT:
+                (sent_at,) = _STAMP.unpack_from(frame, offset)
+                offset += _STAMP.size
+            else:
+                raise ValueError(f"Unknown record kind {kind}")
+        return messages, sent_at
+
+    def _decode_block(self, frame, offset, schema_id, count, messages):
+        """Appends the messages of the block at offset to messages; returns the offset after it."""
+        if schema_id >= len(self._received):
+            raise ValueError(f"Unknown schema {schema_id}")
+        schema = self._received[schema_id]
+        keys = schema[0]
+        opcodes = frame[offset:offset + count]
+        n_targets = count - opcodes.count(_PREDICT)
+        block_format = self._block_format(schema, count, n_targets)
+        columns = block_format.unpack_from(frame, offset - _HEADER.size)
+        offset += block_format.size - _HEADER.size
+        request_ids = columns[3 + count:3 + 2 * count]
+        values = columns[3 + 2 * count:len(columns) - n_targets]
+        ys = iter(columns[len(columns) - n_targets:])
+        if keys:
+            # One row of values per message
+            rows = zip(*[iter(values)] * len(keys))
+            x_dicts = map(dict, map(zip, itertools.repeat(keys), rows))
+        else:
+            x_dicts = (dict() for _ in range(count))
+        message = self._message
+        messages += [
+            message(opcode, request_id, x_dict, _NO_Y if opcode == _PREDICT else next(ys))
+            for opcode, request_id, x_dict in zip(opcodes, request_ids, x_dicts)
+        ]
+        return offset
+
+    def _fields(self, message):
+        """:return: (opcode, request id, x_dict, y) of a message, or None to pickle it."""
+        raise NotImplementedError("Abstract method")
+
+    def _message(self, opcode, request_id, x_dict, y):
+        """Builds a message back from its fields."""
+        raise NotImplementedError("Abstract method")
+
+
+class DictCodec(Codec):
+    """Codec of the Pipe protocol ({"command": ...} / {"type": ...} dicts)."""
+
+    def _fields(self, message):
+        command = message.get("command")
+        if command == "train":
+            return _LEARN, 0, message["x_dict"], message["y_label"]
+        if command == "predict":
+            return _PREDICT, message["request_id"], message["x_dict"], _NO_Y
+        if command == "predict_learn":
+            return _PREDICT_LEARN, message["request_id"], message["x_dict"], message["y_label"]
+        if message.get("type") == "prediction":
+            return _PREDICTION, message["request_id"], {}, message["y_pred"]
+        return None
+
+    def _message(self, opcode, request_id, x_dict, y):
+        if opcode == _LEARN:
+            return {"command": "train", "x_dict": x_dict, "y_label": y}
+        if opcode == _PREDICT:
+            return {"command": "predict", "x_dict": x_dict, "request_id": request_id}
+        if opcode == _PREDICT_LEARN:
+            return {"command": "predict_learn", "x_dict": x_dict, "y_label": y, "request_id": request_id}
+        return {"type": "prediction", "request_id": request_id, "y_pred": y}
+
+
+class TupleCodec(Codec):
+    """Codec of the Queue protocol (("predict", x, id), ("train", x, y), ("predict_learn", x, y, id), ("prediction", id, y))."""
+
+    def _fields(self, message):
+        command = message[0]
+        if command == "train":
+            return _LEARN, 0, message[1], message[2]
+        if command == "predict":
+            return _PREDICT, message[2], message[1], _NO_Y
+        if command == "predict_learn":
+            return _PREDICT_LEARN, message[3], message[1], message[2]
+        if command == "prediction":
+            return _PREDICTION, message[1], {}, message[2]
+        return None
+
+    def _message(self, opcode, request_id, x_dict, y):
+        if opcode == _LEARN:
+            return ("train", x_dict, y)
+        if opcode == _PREDICT:
+            return ("predict", x_dict, request_id)
+        if opcode == _PREDICT_LEARN:
+            return ("predict_learn", x_dict, y, request_id)
+        return ("prediction", request_id, y)
+
+
+class CodecConnection:
+    """
+    Wraps a multiprocessing Connection speaking the Pipe protocol so that every message
+    (or batch of messages) travels as one compact DictCodec frame instead of a pickle.
+    It can be handed over to the model process like the Connection itself. A batch
+    stamped with "sent_at" (for the server's telemetry) keeps its stamp.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.codec = DictCodec()
+
+    def fileno(self):
+        return self.conn.fileno()
+
+    def poll(self, timeout=0.0):
+        return self.conn.poll(timeout)
+
+    def send(self, message):
+        if message.get("command") == "batch":
+            messages = message["messages"]
+        elif message.get("type") == "batch":
+            messages = message["responses"]
+        else:
+            messages = [message]
+        self.conn.send_bytes(self.codec.encode(messages, message.get("sent_at")))
+
+    def recv(self):
+        messages, sent_at = self.codec.decode_frame(self.conn.recv_bytes())
+        if sent_at is not None:
+            return {"command": "batch", "messages": messages, "sent_at": sent_at}
+        if len(messages) == 1:
+            return messages[0]
+        if "command" in messages[0]:
+            return {"command": "batch", "messages": messages}
+        return {"type": "batch", "responses": messages}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,40 @@
+import multiprocessing
+import threading
+
+
+def queue_reader(q: multiprocessing.Queue):
+    """
+    Returns the Connection a multiprocessing.Queue is read from, to wait on the queue
+    together with other connections in multiprocessing.connection.wait().
+
+    The queue has no public way to do that, so this is the one place that reaches into
+    its private _reader attribute. Only wait on it: the messages are still read with the
+    queue's get methods, which hold the queue's read lock.
+    """
+    return q._reader
+
+
+class ControlChannel:
+    """
+    One-way channel from the parent process to a model server process, carrying
+    stop requests and new client connections.
+
+    The server waits on its reader end together with the client connections
+    (multiprocessing.connection.wait), so it sleeps until there is work to do
+    and reacts to a stop request immediately, without a polling interval.
+    """
+
+    def __init__(self):
+        self.reader, self._writer = multiprocessing.Pipe(duplex=False)
+        self._lock = threading.Lock()
+
+    def request_stop(self):
+        self._send(("stop",))
+
+    def add_client(self, conn):
+        """Hands a new client connection over to the server process."""
+        self._send(("connect", conn))
+
+    def _send(self, msg):
+        with self._lock:
+            self._writer.send(msg)
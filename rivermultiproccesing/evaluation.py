@@ -0,0 +1,190 @@
+import functools
+import time
+
+from generator.movingwindow_river_generator import MovingWindowRiverGenerator
+from generator.river_dataset_generator import RiverDatasetGenerator
+
+
+class GeneratorSpec:
+    """
+    Description of a stream, sent to a model server once so that it builds the
+    generator and pulls the samples itself (see PrequentialRun).
+
+    The arguments are those of RiverDatasetGenerator, or of MovingWindowRiverGenerator
+    when past_history is given.
+
+    :param dataset: A river dataset, the name of one in river.datasets (e.g. "Bikes",
+                    "synth.Friedman"), or a function returning one (e.g.
+                    functools.partial(synth.Friedman, seed=42)). It is resolved in the server.
+    """
+
+    def __init__(
+        self,
+        dataset,
+        n_instances: int = 1000,
+        stream_period: float = 0,
+        burst: int = 1,
+        past_history: int = None,
+        forecasting_horizon: int = None,
+        shift: int = 1,
+        input_idx=None,
+        target_idx=None,
+        **generator_kwargs
+    ):
+        if past_history is not None and forecasting_horizon is None:
+            raise ValueError("A moving window needs a forecasting_horizon")
+        self.dataset = dataset
+        self.n_instances = n_instances
+        self.stream_period = stream_period
+        self.burst = burst
+        self.past_history = past_history
+        self.forecasting_horizon = forecasting_horizon
+        self.shift = shift
+        self.input_idx = input_idx
+        self.target_idx = target_idx
+        self.generator_kwargs = generator_kwargs
+
+    def make_dataset(self):
+        if isinstance(self.dataset, str):
+            from river import datasets
+            return functools.reduce(getattr, self.dataset.split("."), datasets)()
+        if isinstance(self.dataset, type) or (callable(self.dataset) and not hasattr(self.dataset, "take")):
+            return self.dataset()
+        return self.dataset
+
+    def build(self):
+        """Returns the generator described by the spec."""
+        kwargs = dict(
+            dataset=self.make_dataset(),
+            n_instances=self.n_instances,
+            stream_period=self.stream_period,
+            burst=self.burst,
+            **self.generator_kwargs
+        )
+        if self.past_history is None:
+            return RiverDatasetGenerator(**kwargs)
+        return MovingWindowRiverGenerator(
+            past_history=self.past_history,
+            forecasting_horizon=self.forecasting_horizon,
+            shift=self.shift,
+            input_idx=self.input_idx,
+            target_idx=self.target_idx,
+            **kwargs
+        )
+
+
+class PrequentialRun:
+    """
+    Test-then-train evaluation of a server's model over a GeneratorSpec, run inside
+    the server process: each sample is predicted, scored with the metric, then learnt.
+
+    The server advances the run between two reads of its connections, for at most
+    time_slice seconds at a time, so the other clients and a stop request are still
+    served while it runs. A paced stream (stream_period > 0) is never waited for: a
+    step only pulls the samples already due, and timeout() tells the server how long
+    it may sleep until the next one. Every checkpoint_every samples (and at the end) step()
+    returns a checkpoint:
+
+        {"n", "score", "elapsed_s", "throughput", "recent_throughput", "lag_ms", "done"}
+
+    with throughputs in samples per second; the last one also holds the metric object.
+    Samples without x or y (moving windows not full yet) are skipped.
+    """
+
+    # Longest time a run holds the serve loop, in seconds
+    time_slice = 0.01
+
+    def __init__(self, spec: GeneratorSpec, metric, checkpoint_every: int = 1000, learn: bool = True):
+        if checkpoint_every < 1:
+            raise ValueError("checkpoint_every must be a positive integer")
+        self.spec = spec
+        self.metric = metric
+        self.checkpoint_every = checkpoint_every
+        self.learn = learn
+        self.n = 0
+        self.done = False
+        self._generator = None
+        self._start = None
+        self._last = None
+
+    def step(self, predict_one, learn_one):
+        """
+        Runs the evaluation for one time slice.
+        :return: the list of checkpoints reached (often empty)
+        """
+        checkpoints = []
+        try:
+            if self._generator is None:
+                self._generator = self.spec.build()
+                self._start = self._last = (time.perf_counter(), 0)
+            deadline = time.perf_counter() + self.time_slice
+            while True:
+                if self.timeout() > 0:
+                    # The next sample is not due yet
+                    return checkpoints
+                try:
+                    x, y = next(self._generator)
+                except StopIteration:
+                    break
+                if x is None or y is None:
+                    continue
+                # Sent once the stream goes on, so that the end of the stream has a single (final) checkpoint
+                if self.n % self.checkpoint_every == 0 and self.n > self._last[1]:
+                    checkpoints.append(self._checkpoint())
+                y_pred = predict_one(x)
+                self.metric.update(y, y_pred)
+                if self.learn:
+                    learn_one(x, y)
+                self.n += 1
+                if time.perf_counter() >= deadline:
+                    return checkpoints
+            self.done = True
+            checkpoints.append(self._checkpoint())
+        except Exception as e:
+            self.done = True
+            checkpoints.append({"n": self.n, "done": True, "error": repr(e)})
+        return checkpoints
+
+    def timeout(self):
+        """Time until the next sample is due, in seconds (0 = right away)."""
+        if self._generator is None:
+            return 0
+        release = self._generator.next_release_ns()
+        if release is None:
+            return 0
+        return max(release - time.perf_counter_ns(), 0) / 1e9
+
+    def _checkpoint(self):
+        now = time.perf_counter()
+        elapsed = now - self._start[0]
+        recent = now - self._last[0]
+        checkpoint = {
+            "n": self.n,
+            "score": self.metric.get(),
+            "elapsed_s": elapsed,
+            "throughput": self.n / elapsed if elapsed > 0 else None,
+            "recent_throughput": (self.n - self._last[1]) / recent if recent > 0 else None,
+            "lag_ms": self._generator.get_lag(),
+            "done": self.done,
+        }
+        if self.done:
+            checkpoint["metric"] = self.metric
+        self._last = (now, self.n)
+        return checkpoint
+
+    def close(self):
+        if self._generator is not None:
+            self._generator.stop()
+
+
+def iter_checkpoints(stream):
+    """Yields the checkpoints a server streams back for an evaluation, until the last one."""
+    while True:
+        checkpoint = stream.get()
+        if isinstance(checkpoint, Exception):
+            raise checkpoint
+        if "error" in checkpoint:
+            raise RuntimeError(f"The evaluation failed after {checkpoint['n']} samples: {checkpoint['error']}")
+        yield checkpoint
+        if checkpoint["done"]:
+            return
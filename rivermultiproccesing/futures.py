@@ -0,0 +1,76 @@
+import itertools
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class ResponseRouter:
+    """
+    Hands out integer request ids and the Future that will receive each answer.
+    The manager's demultiplexer thread resolves the futures as responses come in,
+    in whatever order and from whichever frame they arrive.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count()
+        self._pending = {}
+        # Requests answered many times (e.g. evaluation checkpoints): request_id -> queue
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def register(self):
+        """
+        :return: (request_id, future) for a new request
+        """
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+        return request_id, future
+
+    def resolve(self, request_id, value):
+        """
+        :return: False if nobody was waiting for this request id
+        """
+        with self._lock:
+            future = self._pending.pop(request_id, None)
+        if future is None:
+            return False
+        future.set_result(value)
+        return True
+
+    def register_stream(self):
+        """
+        :return: (request_id, queue) for a request answered many times; every answer
+                 (or the exception of fail_all) is put in the queue
+        """
+        stream = queue.SimpleQueue()
+        with self._lock:
+            request_id = next(self._ids)
+            self._streams[request_id] = stream
+        return request_id, stream
+
+    def push(self, request_id, value, last: bool = False):
+        """
+        Hands one answer of a streamed request over (the last one closes the stream).
+        :return: False if nobody was waiting for this request id
+        """
+        with self._lock:
+            stream = self._streams.pop(request_id, None) if last else self._streams.get(request_id)
+        if stream is None:
+            return False
+        stream.put(value)
+        return True
+
+    def fail_all(self, exception):
+        """Fails every request still waiting for an answer (e.g. the server stopped)."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            streams, self._streams = self._streams, {}
+        for future in pending.values():
+            future.set_exception(exception)
+        for stream in streams.values():
+            stream.put(exception)
+
+    def __len__(self):
+        return len(self._pending) + len(self._streams)
@@ -0,0 +1,209 @@
+"""
+File format of the saved models.
+
+    header   magic "RVMP", format version, compression, number of sections
+    table    offset, stored size, raw size and CRC32 of every section
+    crc32    of the header and the table
+    sections the pickle stream (protocol 5), then its out-of-band buffers
+
+Large contiguous buffers (NumPy arrays, CPU torch tensors) are taken out of the
+pickle stream as out-of-band buffers, aligned to 64 bytes. Uncompressed files are
+memory-mapped when loaded, so arrays are paged in lazily and never copied; with
+zlib or lzma every section is compressed on its own and decompressed in chunks
+into a buffer of its final size. Files saved with plain pickle still load.
+"""
+
+import io
+import lzma
+import mmap
+import os
+import pickle
+import struct
+import sys
+import zlib
+
+MAGIC = b"RVMP"
+FORMAT_VERSION = 1
+
+_COMPRESSIONS = {None: 0, "zlib": 1, "lzma": 2}
+
+_HEADER = struct.Struct("<4sHBxI")
+_SECTION = struct.Struct("<QQQI4x")
+_CRC = struct.Struct("<I")
+_ALIGNMENT = 64
+_CHUNK_SIZE = 1 << 20
+
+
+class CorruptModelFile(ValueError):
+    """The file is truncated, altered or not a model file."""
+
+
+def _rebuild_tensor(array, parameter, requires_grad):
+    import torch
+    tensor = torch.from_numpy(array)
+    if parameter:
+        return torch.nn.Parameter(tensor, requires_grad=requires_grad)
+    return tensor.requires_grad_(requires_grad)
+
+
+class _TensorPickler(pickle.Pickler):
+    """Pickles whole CPU torch tensors through NumPy, so that their data goes out-of-band."""
+
+    def reducer_override(self, obj):
+        torch = sys.modules["torch"]
+        if type(obj) in (torch.Tensor, torch.nn.Parameter) and obj.device.type == "cpu" and obj.layout == torch.strided:
+            # Views share their storage with other tensors: keep torch's own reduction for them
+            whole = obj.storage_offset() == 0 and obj.untyped_storage().nbytes() == obj.numel() * obj.element_size()
+            if whole and obj.is_contiguous():
+                return _rebuild_tensor, (obj.detach().numpy(), type(obj) is torch.nn.Parameter, obj.requires_grad)
+        return NotImplemented
+
+
+def dumps(model, compression: str = None, level: int = None) -> bytes:
+    """Serializes a model to the bytes of a model file."""
+    f = io.BytesIO()
+    dump(model, f, compression, level)
+    return f.getvalue()
+
+
+def dump(model, f, compression: str = None, level: int = None):
+    """
+    Writes a model to a binary file object.
+    :param compression: None, "zlib" or "lzma"
+    :param level:       Compression level (default of the module if None)
+    """
+    if compression not in _COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    buffers = []
+    stream = io.BytesIO()
+    # The override costs a Python call per object: only pay it when torch is in use
+    pickler_cls = _TensorPickler if "torch" in sys.modules else pickle.Pickler
+    pickler_cls(stream, protocol=5, buffer_callback=buffers.append).dump(model)
+    sections = [stream.getbuffer()]
+    for buffer in buffers:
+        raw = buffer.raw()
+        if not raw.contiguous:
+            # Let pickle keep it in-band instead
+            return _dump_in_band(model, f, compression, level)
+        sections.append(raw)
+
+    stored = [_compress(section, compression, level) for section in sections]
+    table_size = _HEADER.size + _SECTION.size * len(stored) + _CRC.size
+    offset = _align(table_size)
+    table = bytearray(_HEADER.pack(MAGIC, FORMAT_VERSION, _COMPRESSIONS[compression], len(stored)))
+    for section, data in zip(sections, stored):
+        table += _SECTION.pack(offset, data.nbytes, section.nbytes, zlib.crc32(data))
+        offset = _align(offset + data.nbytes)
+    table += _CRC.pack(zlib.crc32(table))
+
+    f.write(table)
+    position = len(table)
+    for data in stored:
+        padding = _align(position) - position
+        f.write(b"\0" * padding)
+        f.write(data)
+        position += padding + data.nbytes
+
+
+def _dump_in_band(model, f, compression, level):
+    data = memoryview(pickle.dumps(model, protocol=5))
+    stored = _compress(data, compression, level)
+    table = bytearray(_HEADER.pack(MAGIC, FORMAT_VERSION, _COMPRESSIONS[compression], 1))
+    table += _SECTION.pack(_align(len(table) + _SECTION.size + _CRC.size), stored.nbytes, data.nbytes, zlib.crc32(stored))
+    table += _CRC.pack(zlib.crc32(table))
+    f.write(table)
+    f.write(b"\0" * (_align(len(table)) - len(table)))
+    f.write(stored)
+
+
+def save_model(model, path: str, compression: str = None, level: int = None):
+    """
+    Saves a model to path atomically: it is written to a temporary file, which replaces
+    path only once it is complete and on disk.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            dump(model, f, compression, level)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_model(path: str, verify: bool = True):
+    """
+    Loads a model saved by save_model (or with plain pickle).
+    :param verify: Check the CRC32 of every section
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            f.seek(0)
+            return pickle.load(f)
+        # Private copy-on-write mapping: arrays built on it stay writable, the file untouched
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    return loads(data, verify)
+
+
+def loads(data, verify: bool = True):
+    """Loads a model from the bytes (or any buffer) of a model file."""
+    view = memoryview(data)
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        return pickle.loads(view)
+    try:
+        _, version, compression, n_sections = _HEADER.unpack_from(view)
+        table_size = _HEADER.size + _SECTION.size * n_sections
+        crc, = _CRC.unpack_from(view, table_size)
+    except struct.error:
+        raise CorruptModelFile("Truncated header")
+    if version > FORMAT_VERSION:
+        raise CorruptModelFile(f"Format version {version} is newer than this reader ({FORMAT_VERSION})")
+    if zlib.crc32(view[:table_size]) != crc:
+        raise CorruptModelFile("Header checksum mismatch")
+
+    sections = []
+    for i in range(n_sections):
+        offset, stored_size, raw_size, crc = _SECTION.unpack_from(view, _HEADER.size + _SECTION.size * i)
+        stored = view[offset:offset + stored_size]
+        if len(stored) != stored_size:
+            raise CorruptModelFile(f"Section {i} is truncated")
+        if verify and zlib.crc32(stored) != crc:
+            raise CorruptModelFile(f"Section {i} checksum mismatch")
+        sections.append(_decompress(stored, compression, raw_size))
+    return pickle.loads(sections[0], buffers=sections[1:])
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _compress(section, compression, level):
+    if compression is None:
+        return section
+    section = section.cast("B")
+    if compression == "zlib":
+        return memoryview(zlib.compress(section, -1 if level is None else level))
+    return memoryview(lzma.compress(section, preset=level))
+
+
+def _decompress(stored, compression, raw_size):
+    if compression == 0:
+        return stored
+    # Streamed into a buffer of the final size: no intermediate copies of the whole section
+    decompressor = zlib.decompressobj() if compression == 1 else lzma.LZMADecompressor()
+    out = bytearray(raw_size)
+    position = 0
+    for start in range(0, len(stored), _CHUNK_SIZE):
+        chunk = decompressor.decompress(stored[start:start + _CHUNK_SIZE])
+        out[position:position + len(chunk)] = chunk
+        position += len(chunk)
+    if compression == 1:
+        chunk = decompressor.flush()
+        out[position:position + len(chunk)] = chunk
+        position += len(chunk)
+    if position != raw_size:
+        raise CorruptModelFile("Decompressed size mismatch")
+    return out
@@ -0,0 +1,340 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import pickle
+import queue
+import threading
+from abc import ABC, abstractmethod
+
+from river import base  # For type annotation
+
+from rivermultiproccesing.control import queue_reader
+from rivermultiproccesing.river_pipe import RiverModelProcess
+from rivermultiproccesing.river_queue import RiverModelServer
+
+logger = logging.getLogger(__name__)
+
+
+class _ConnectionIO:
+    """
+    Drives a multiprocessing Connection from the event loop through its public API:
+    the loop reads it when its fileno() is readable (poll() then recv(), for every
+    message already there), and a writer thread sends the pickled messages, so that
+    a full pipe never blocks the loop. recv() only waits for the rest of a frame whose
+    start has arrived, which the server is writing.
+    """
+
+    def __init__(self, loop, conn, on_message, on_eof):
+        self._loop = loop
+        self._conn = conn
+        self._on_message = on_message
+        self._on_eof = on_eof
+        # Bytes handed to the writer thread and not written yet (only touched by the loop)
+        self.buffered = 0
+        self._drained = None
+        self._closed = False
+        self._outbox = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+        loop.add_reader(conn.fileno(), self._on_readable)
+
+    def send(self, obj):
+        payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        self.buffered += len(payload)
+        self._outbox.put(payload)
+
+    async def drain(self):
+        """Waits until everything sent has been handed to the OS."""
+        if self.buffered:
+            if self._drained is None:
+                self._drained = self._loop.create_future()
+            await asyncio.shield(self._drained)
+
+    def _write(self):
+        # None is the sentinel put by close()
+        for payload in iter(self._outbox.get, None):
+            try:
+                self._conn.send_bytes(payload)
+            except OSError:
+                self._loop.call_soon_threadsafe(self._on_broken)
+                return
+            self._loop.call_soon_threadsafe(self._written, len(payload))
+
+    def _written(self, size):
+        self.buffered -= size
+        if not self.buffered and self._drained is not None:
+            self._drained.set_result(None)
+            self._drained = None
+
+    def _on_broken(self):
+        if self._drained is not None:
+            self._drained.set_exception(ConnectionError("The connection to the model server was closed."))
+            self._drained = None
+        self._on_eof()
+
+    def _on_readable(self):
+        try:
+            while not self._closed and self._conn.poll():
+                self._on_message(self._conn.recv())
+        except (EOFError, OSError):
+            self.close()
+            self._on_eof()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._loop.remove_reader(self._conn.fileno())
+        self._outbox.put(None)
+
+
+class _QueueReader:
+    """
+    Reads a multiprocessing.Queue from the event loop: the loop watches the queue's
+    pipe (see control.queue_reader) and, when it is readable, takes every message
+    already there with get_nowait(). Writing needs no help, put_nowait() never blocks
+    (the queue's feeder thread does the writing), so nothing is ever buffered.
+    """
+
+    buffered = 0
+
+    def __init__(self, loop, response_queue, on_message):
+        self._loop = loop
+        self._queue = response_queue
+        self._on_message = on_message
+        self._closed = False
+        self._fd = queue_reader(response_queue).fileno()
+        loop.add_reader(self._fd, self._on_readable)
+
+    def _on_readable(self):
+        while not self._closed:
+            try:
+                msg = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._on_message(msg)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._loop.remove_reader(self._fd)
+
+
+class _AsyncManager(ABC):
+    """
+    Shared logic of the asyncio managers: request ids, the futures waiting for
+    predictions and the bound on predictions in flight.
+    """
+
+    # Above this many unsent bytes, learn_one waits for the pipe to drain
+    high_water = 1 << 20
+
+    def __init__(self, max_in_flight: int = 1024):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.max_in_flight = max_in_flight
+        self._ids = itertools.count()
+        self._pending = {}
+        self._in_flight = None
+        self._io = None
+        self._loop = None
+
+    def _connect(self):
+        if self._io is None:
+            self._loop = asyncio.get_running_loop()
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+            self._io = self._open(self._loop)
+
+    @abstractmethod
+    def _open(self, loop):
+        """Starts reading the server's responses for the running loop; returns the IO object (see _ConnectionIO)."""
+        raise NotImplementedError("Abstract method")
+
+    @abstractmethod
+    def _send(self, msg):
+        """Sends a request to the server without blocking the loop."""
+        raise NotImplementedError("Abstract method")
+
+    @abstractmethod
+    def _on_message(self, msg):
+        """Routes a message of the server (a response or a batch of them) to the awaiting futures."""
+        raise NotImplementedError("Abstract method")
+
+    def _resolve(self, request_id, y_pred):
+        future = self._pending.pop(request_id, None)
+        if future is None:
+            self.logger.warning(f"Prediction for an unknown request: {request_id}")
+        elif not future.done():
+            future.set_result(y_pred)
+
+    def _on_eof(self):
+        self._fail_all(ConnectionError("The connection to the model server was closed."))
+
+    def _fail_all(self, exception):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exception)
+
+    async def _predict(self, make_msg):
+        self._connect()
+        async with self._in_flight:
+            request_id = next(self._ids)
+            future = self._loop.create_future()
+            self._pending[request_id] = future
+            self._send(make_msg(request_id))
+            try:
+                return await future
+            finally:
+                self._pending.pop(request_id, None)
+
+    async def _learn(self, msg):
+        self._connect()
+        self._send(msg)
+        if self._io.buffered > self.high_water:
+            await self._io.drain()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    @abstractmethod
+    async def stop(self):
+        """Stops the server without blocking the loop."""
+        raise NotImplementedError("Abstract method")
+
+
+class AsyncRiverModelManager(_AsyncManager):
+    """
+    asyncio client of a RiverModelServer (Queue-based server).
+
+    Requests go through multiprocessing.Queue.put_nowait (its feeder thread does the
+    writing) and responses are read from the response queue by the event loop when
+    its pipe is readable, so any number of coroutines can await predictions without
+    blocking the loop.
+    """
+
+    def __init__(self, model: 'base.Estimator', model_path: str = None, max_in_flight: int = 1024):
+        """
+        :param model:         A River model or pipeline
+        :param model_path:    File path for saving/loading the model
+        :param max_in_flight: Maximum number of predictions awaiting an answer
+        """
+        super().__init__(max_in_flight=max_in_flight)
+        self.request_queue = multiprocessing.Queue()
+        self.response_queue = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+        self.server = RiverModelServer(
+            model=model,
+            request_queue=self.request_queue,
+            response_queue=self.response_queue,
+            stop_event=self.stop_event,
+            model_path=model_path
+        )
+        self.server.start()
+
+    def _open(self, loop):
+        return _QueueReader(loop, self.response_queue, self._on_message)
+
+    def _send(self, msg):
+        self.request_queue.put_nowait(msg)
+
+    def _on_message(self, msg):
+        for response in (msg[1] if msg[0] == "batch" else [msg]):
+            if response[0] == "prediction":
+                _, request_id, y_pred = response
+                self._resolve(request_id, y_pred)
+            else:
+                self.logger.warning(f"Unexpected message in response queue: {response}")
+
+    async def predict_one(self, x_dict: dict):
+        return await self._predict(lambda request_id: ("predict", x_dict, request_id))
+
+    async def learn_one(self, x_dict: dict, y_label):
+        await self._learn(("train", x_dict, y_label))
+
+    async def predict_learn_one(self, x_dict: dict, y_label):
+        """Predicts x_dict, then learns (x_dict, y_label), in one round trip; returns the prediction."""
+        return await self._predict(lambda request_id: ("predict_learn", x_dict, y_label, request_id))
+
+    async def stop(self):
+        """Stops the server (saving the model if model_path was given) without blocking the loop."""
+        if self._io is not None:
+            self._io.close()
+        # Every request must be in the pipe before the stop request overtakes them
+        self.request_queue.close()
+        await asyncio.get_running_loop().run_in_executor(None, self.request_queue.join_thread)
+        self.stop_event.set()
+        self.server.request_stop()
+        await asyncio.get_running_loop().run_in_executor(None, self.server.join)
+        self._fail_all(RuntimeError("The model server has stopped."))
+
+
+class AsyncRiverModelManagerPipe(_AsyncManager):
+    """
+    asyncio client of a RiverModelProcess (Pipe-based server).
+
+    The event loop reads the pipe when it is readable and a thread writes to it (see
+    _ConnectionIO), and the responses are routed to the awaiting coroutines by
+    request id.
+    """
+
+    def __init__(self, model: 'base.Estimator', model_path: str = None, max_in_flight: int = 1024):
+        """
+        :param model:         A River model or pipeline
+        :param model_path:    File path for saving/loading the model
+        :param max_in_flight: Maximum number of predictions awaiting an answer
+        """
+        super().__init__(max_in_flight=max_in_flight)
+        self.parent_conn, child_conn = multiprocessing.Pipe(duplex=True)
+        self.stop_event = multiprocessing.Event()
+        self.proc = RiverModelProcess(
+            model=model,
+            pipe_conn=child_conn,
+            stop_event=self.stop_event,
+            model_path=model_path
+        )
+        self.proc.start()
+
+    def _open(self, loop):
+        return _ConnectionIO(loop, self.parent_conn, self._on_message, self._on_eof)
+
+    def _send(self, msg):
+        self._io.send(msg)
+
+    def _on_message(self, frame):
+        for response in (frame["responses"] if frame.get("type") == "batch" else [frame]):
+            if response.get("type") == "prediction":
+                self._resolve(response["request_id"], response["y_pred"])
+            else:
+                self.logger.warning(f"Unexpected response: {response}")
+
+    async def predict_one(self, x_dict: dict):
+        return await self._predict(
+            lambda request_id: {"command": "predict", "x_dict": x_dict, "request_id": request_id}
+        )
+
+    async def learn_one(self, x_dict: dict, y_label):
+        await self._learn({"command": "train", "x_dict": x_dict, "y_label": y_label})
+
+    async def predict_learn_one(self, x_dict: dict, y_label):
+        """Predicts x_dict, then learns (x_dict, y_label), in one round trip; returns the prediction."""
+        return await self._predict(
+            lambda request_id: {"command": "predict_learn", "x_dict": x_dict, "y_label": y_label, "request_id": request_id}
+        )
+
+    async def stop(self):
+        """Stops the process (saving the model if model_path was given) without blocking the loop."""
+        if self._io is not None:
+            await self._io.drain()
+            self._io.close()
+        self.stop_event.set()
+        self.proc.request_stop()
+        await asyncio.get_running_loop().run_in_executor(None, self.proc.join)
+        self._fail_all(RuntimeError("The model process has stopped."))
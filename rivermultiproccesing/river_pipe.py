@@ -1,17 +1,39 @@
 import multiprocessing
+import multiprocessing.connection
 import pickle
 import os
-import uuid
+import threading
+import time
 import logging
 from river import base  # For type annotation
 
+from rivermultiproccesing.backpressure import BackpressurePolicy, LearnFlow
+from rivermultiproccesing.batching import CommandBatcher
+from rivermultiproccesing.codec import CodecConnection
+from rivermultiproccesing.control import ControlChannel
+from rivermultiproccesing.evaluation import GeneratorSpec, PrequentialRun, iter_checkpoints
+from rivermultiproccesing.futures import ResponseRouter
+from rivermultiproccesing.persistence import load_model
+from rivermultiproccesing.snapshots import SnapshotPolicy, Snapshotter, write_model
+from rivermultiproccesing.telemetry import Telemetry
+
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+
+def _command_of(msg):
+    return msg.get("command") if isinstance(msg, dict) else None
+
+
 class RiverModelProcess(multiprocessing.Process):
     """
     A background process that holds a River model and listens for commands
     over a Pipe (instead of a multiprocessing.Queue).
+
+    The loop is event driven: it sleeps in multiprocessing.connection.wait() on
+    every client connection plus a control channel, so idle servers do not wake
+    up and a stop request is handled right away. More clients (e.g. other
+    producer processes) can be attached with add_client().
     """
 
     def __init__(
@@ -19,134 +41,547 @@ class RiverModelProcess(multiprocessing.Process):
         model: 'base.Estimator',
         pipe_conn,
         stop_event: multiprocessing.Event,
-        model_path: str = None
+        model_path: str = None,
+        snapshot_policy: SnapshotPolicy = None,
+        compression: str = None,
+        telemetry: Telemetry = None
     ):
+        """
+        snapshot_policy makes the process checkpoint its model to model_path while it
+        runs, without pausing the loop (see snapshots.Snapshotter). compression (None,
+        "zlib" or "lzma") applies to every saved file (see persistence). telemetry
+        records counts, latencies and time spent per part (see telemetry.Telemetry).
+        """
         super().__init__(daemon=True)
         self.pipe_conn = pipe_conn
         self.stop_event = stop_event
         self.model_path = model_path
+        self.compression = compression
+        self.control = ControlChannel()
+        self.snapshots = None if snapshot_policy is None else Snapshotter(model_path, snapshot_policy, compression)
+        self.telemetry = telemetry
 
         # Load the model from disk if it exists
         if model_path is not None and os.path.exists(model_path):
             logger.info(f"Loading existing model from {model_path}")
-            with open(model_path, "rb") as f:
-                self.model = pickle.load(f)
+            self.model = load_model(model_path)
             logger.info("Model loaded.")
         else:
             logger.info("No existing model found (or no path). Using the provided model.")
             self.model = model
 
+        # Version of the model snapshot being served (see load_snapshot) and its creation time
+        self.snapshot_version = 0
+        self.snapshot_created = time.time()
+
+        # (PrequentialRun, request id, connection) of the evaluations in progress
+        self._runs = []
+        # Connection of the message being handled
+        self._conn = None
+
+    def add_client(self, conn):
+        """Attaches another client connection (called from the parent process)."""
+        self.control.add_client(conn)
+
+    def request_stop(self):
+        """Asks the process to stop (called from the parent process)."""
+        self.control.request_stop()
+
     def run(self):
         logger.info("RiverModelProcess started.")
-        while not self.stop_event.is_set():
-            # Check if there's data from the pipe
-            if self.pipe_conn.poll(0.01):
-                # Use a tiny timeout to avoid blocking the shutdown
-                msg = self.pipe_conn.recv()  # Blocking read
-                if not isinstance(msg, dict):
-                    logger.warning(f"Unrecognized message format: {msg}")
-                    continue
-
-                command = msg.get("command")
-
-                if command == "predict":
-                    x_dict = msg["x_dict"]
-                    request_id = msg["request_id"]
-                    y_pred = self.model.predict_one(x_dict)
-                    # Send response back
-                    response = {
-                        "type": "prediction",
-                        "request_id": request_id,
-                        "y_pred": y_pred
-                    }
-                    self.pipe_conn.send(response)
-
-                elif command == "train":
-                    x_dict = msg["x_dict"]
-                    y_label = msg["y_label"]
-                    self.model.learn_one(x_dict, y_label)
-
+        if self.telemetry is not None:
+            self._handle = self.telemetry.timed(self._handle, _command_of)
+        clients = [self.pipe_conn]
+        stopping = False
+        while not stopping:
+            ready = multiprocessing.connection.wait([self.control.reader, *clients], self._wait_timeout())
+            if self.telemetry is not None:
+                self.telemetry.sample_backlog(conns=clients)
+            for conn in ready:
+                if conn is self.control.reader:
+                    msg = conn.recv()
+                    if msg[0] == "connect":
+                        clients.append(msg[1])
+                    elif msg[0] == "stop":
+                        stopping = True
                 else:
-                    logger.warning(f"Unknown command {command}")
-            # Loop again, checking stop_event
+                    self._serve(conn, clients)
+            self._tick()
+            stopping = stopping or self.stop_event.is_set()
+
+        # Answer what the clients sent before the stop request
+        for conn in list(clients):
+            while conn in clients and conn.poll():
+                self._serve(conn, clients)
 
         # Save the model on shutdown
+        if self.telemetry is not None:
+            self.telemetry.dump()
+        if self.snapshots is not None:
+            self.snapshots.close()
         if self.model_path:
             logger.info(f"Saving model to {self.model_path}")
-            with open(self.model_path, "wb") as f:
-                pickle.dump(self.model, f)
+            write_model(self.model, self.model_path, self.compression)
             logger.info("Model saved.")
         logger.info("RiverModelProcess stopped.")
 
+    def _wait_timeout(self):
+        """Longest time to sleep without messages, in seconds (None = until the next message)."""
+        timeouts = [
+            timeout for timeout in (
+                None if self.snapshots is None else self.snapshots.timeout(),
+                None if self.telemetry is None else self.telemetry.timeout()
+            ) if timeout is not None
+        ]
+        # Evaluations run between reads, when their next sample is due
+        timeouts += [entry[0].timeout() for entry in self._runs]
+        return min(timeouts) if timeouts else None
+
+    def _tick(self):
+        """Called after every wake-up, for time-based work."""
+        for entry in list(self._runs):
+            run, request_id, conn = entry
+            for checkpoint in run.step(self.model.predict_one, self._learn):
+                try:
+                    conn.send({"type": "checkpoint", "request_id": request_id, "checkpoint": checkpoint})
+                except OSError:
+                    # The client went away
+                    run.done = True
+            if run.done:
+                run.close()
+                self._runs.remove(entry)
+        if self.snapshots is not None:
+            self.snapshots.tick(self.model)
+        if self.telemetry is not None:
+            self.telemetry.tick()
+
+    def _serve(self, conn, clients):
+        """Reads one message from a client connection and answers it."""
+        telemetry = self.telemetry
+        try:
+            msg = conn.recv() if telemetry is None else telemetry.recv(conn)
+        except EOFError:
+            # The client went away
+            clients.remove(conn)
+            return
+        if telemetry is not None and isinstance(msg, dict) and "sent_at" in msg:
+            telemetry.frame_sent_at(msg["sent_at"])
+        # Where the evaluations started by this message stream their checkpoints
+        self._conn = conn
+        response = self._handle(msg)
+        if response is not None:
+            try:
+                if telemetry is None:
+                    conn.send(response)
+                else:
+                    telemetry.send(conn, response)
+            except OSError:
+                clients.remove(conn)
+
+    def _handle(self, msg):
+        """
+        Runs one command (or a batch of commands) on the model and returns the
+        response to send back, if any.
+        """
+        if not isinstance(msg, dict):
+            logger.warning(f"Unrecognized message format: {msg}")
+            return None
+
+        command = msg.get("command")
+
+        if command == "predict":
+            x_dict = msg["x_dict"]
+            request_id = msg["request_id"]
+            y_pred = self.model.predict_one(x_dict)
+            return {
+                "type": "prediction",
+                "request_id": request_id,
+                "y_pred": y_pred
+            }
+
+        elif command == "train":
+            self._learn(msg["x_dict"], msg["y_label"])
+
+        elif command == "predict_learn":
+            # Test-then-train in one round trip
+            x_dict = msg["x_dict"]
+            y_pred = self.model.predict_one(x_dict)
+            self._learn(x_dict, msg["y_label"])
+            return {
+                "type": "prediction",
+                "request_id": msg["request_id"],
+                "y_pred": y_pred
+            }
+
+        elif command == "load_snapshot":
+            # Swap in a model published by a trainer; the next command already uses it
+            self.model = pickle.loads(msg["model"])
+            self.snapshot_version = msg["version"]
+            self.snapshot_created = msg["created"]
+
+        elif command == "evaluate":
+            # Prequential evaluation over a generator built here, advanced by _tick()
+            run = PrequentialRun(msg["spec"], msg["metric"], msg["checkpoint_every"], msg["learn"])
+            self._runs.append((run, msg["request_id"], self._conn))
+
+        elif command == "stats":
+            return {
+                "type": "info",
+                "request_id": msg["request_id"],
+                "info": None if self.telemetry is None else self.telemetry.stats()
+            }
 
-class RiverModelManagerPipe:
+        elif command == "sync":
+            # Answered once every command sent before on this connection has run
+            return {"type": "synced", "request_id": msg["request_id"]}
+
+        elif command == "info":
+            return {
+                "type": "info",
+                "request_id": msg["request_id"],
+                "info": {
+                    "version": self.snapshot_version,
+                    "age": time.time() - self.snapshot_created,
+                    "snapshots": None if self.snapshots is None else self.snapshots.metrics()
+                }
+            }
+
+        elif command == "batch":
+            # Run the commands in order and answer with a single batch of responses
+            responses = [response for response in map(self._handle, msg["messages"]) if response is not None]
+            if responses:
+                return {
+                    "type": "batch",
+                    "responses": responses
+                }
+
+        else:
+            logger.warning(f"Unknown command {command}")
+        return None
+
+    def _learn(self, x_dict, y_label):
+        self.model.learn_one(x_dict, y_label)
+        if self.snapshots is not None:
+            self.snapshots.on_learn(self.model)
+
+
+class RiverModelClientPipe:
     """
-    Demonstrates a manager class that spawns a RiverModelProcess using a Pipe.
+    Client of a RiverModelProcess over one connection.
+
+    It is thread-safe: a background thread routes every prediction to the Future of
+    its request, so many callers and many requests can share the connection at once.
+    RiverModelManagerPipe is a client too; other processes get their own connection
+    from RiverModelManagerPipe.connect() and wrap it in a RiverModelClientPipe.
     """
 
-    def __init__(self, model: 'base.Estimator', model_path: str = None):
+    def __init__(
+        self,
+        conn,
+        batch_size: int = 1,
+        max_delay_us: int = 0,
+        backpressure: BackpressurePolicy = None,
+        stamp_frames: bool = False
+    ):
+        """
+        batch_size commands at most are coalesced into a single pipe message, and a
+        command waits at most max_delay_us for its batch to fill up (0 = no limit).
+        backpressure bounds the learns in flight (see backpressure.BackpressurePolicy).
+        stamp_frames adds its send time to every frame, so that a process with
+        telemetry measures how long frames wait before being read.
+        """
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.parent_conn = conn
+        self.stamp_frames = stamp_frames
+        self._batcher = CommandBatcher(self._send_frame, max_batch=batch_size, max_delay_us=max_delay_us)
+        self._learns = LearnFlow(self._send_learn, self._send_sync, self._batcher.flush, backpressure)
 
-        # Create a Pipe (two connection objects, one for parent, one for child)
-        parent_conn, child_conn = multiprocessing.Pipe(duplex=True)
+        # Responses are read by a single demultiplexer thread; _close_client() wakes it up through _wake_conn
+        self._router = ResponseRouter()
+        self._wake_listener, self._wake_conn = multiprocessing.Pipe(duplex=False)
+        self._demultiplexer = threading.Thread(target=self._demultiplex, daemon=True)
+        self._demultiplexer.start()
 
-        # Event for stopping the child process
-        stop_event = multiprocessing.Event()
+    def _send_frame(self, messages):
+        if self.stamp_frames:
+            self.parent_conn.send({"command": "batch", "messages": messages, "sent_at": time.monotonic()})
+        elif len(messages) == 1:
+            self.parent_conn.send(messages[0])
+        else:
+            self.parent_conn.send({"command": "batch", "messages": messages})
 
-        # Create and start the child process
-        self.proc = RiverModelProcess(
-            model=model,
-            pipe_conn=child_conn,
-            stop_event=stop_event,
-            model_path=model_path
-        )
-        self.proc.start()
+    def _demultiplex(self):
+        """Routes every response coming from the server to the Future waiting for it."""
+        while True:
+            ready = multiprocessing.connection.wait([self.parent_conn, self._wake_listener])
+            if self._wake_listener in ready:
+                break
+            try:
+                frame = self.parent_conn.recv()
+            except EOFError:
+                break
+            for response in (frame["responses"] if frame.get("type") == "batch" else [frame]):
+                if response.get("type") == "prediction":
+                    if not self._router.resolve(response["request_id"], response["y_pred"]):
+                        self.logger.warning(f"Prediction for an unknown request: {response}")
+                elif response.get("type") == "info":
+                    self._router.resolve(response["request_id"], response["info"])
+                elif response.get("type") == "synced":
+                    self._router.resolve(response["request_id"], None)
+                elif response.get("type") == "checkpoint":
+                    checkpoint = response["checkpoint"]
+                    self._router.push(response["request_id"], checkpoint, last=checkpoint["done"])
+                else:
+                    self.logger.warning(f"Unexpected response: {response}")
 
-        # Keep references for usage
-        self.parent_conn = parent_conn
-        self.stop_event = stop_event
+    def predict_async(self, x_dict: dict):
+        """
+        Send a prediction request without waiting for the result (it may wait up to
+        max_delay_us in the current batch). Returns a concurrent.futures.Future.
+        """
+        request_id, future = self._router.register()
+        msg = {
+            "command": "predict",
+            "x_dict": x_dict,
+            "request_id": request_id
+        }
+        self._batcher.add_soon(msg)
+        return future
 
     def predict_one(self, x_dict: dict):
         """
         Send a prediction request and wait for the result.
         """
-        request_id = str(uuid.uuid4())
+        request_id, future = self._router.register()
 
-        # Send message to the child
+        # Send message to the server
         msg = {
             "command": "predict",
             "x_dict": x_dict,
             "request_id": request_id
         }
-        self.parent_conn.send(msg)
+        # The prediction is needed now: send it along with any pending commands
+        self._batcher.add(msg, flush=True)
+        return future.result()
 
-        # Wait for the matching response
-        while True:
-            response = self.parent_conn.recv()
-            if response.get("type") == "prediction":
-                if response["request_id"] == request_id:
-                    return response["y_pred"]
-            else:
-                self.logger.warning(f"Unexpected response: {response}")
+    def predict_learn_async(self, x_dict: dict, y_label):
+        """
+        Send a predict-then-learn request without waiting for the result: the process
+        predicts x_dict, then learns (x_dict, y_label), in a single command. Returns a
+        concurrent.futures.Future resolved with the prediction made before learning.
+        """
+        request_id, future = self._router.register()
+        self._batcher.add_soon(self._predict_learn_message(x_dict, y_label, request_id))
+        return future
+
+    def predict_learn_one(self, x_dict: dict, y_label):
+        """
+        Predict x_dict, then learn (x_dict, y_label), in one round trip (test-then-train).
+        Returns the prediction made before learning.
+        """
+        request_id, future = self._router.register()
+        self._batcher.add(self._predict_learn_message(x_dict, y_label, request_id), flush=True)
+        return future.result()
+
+    def predict_learn_many(self, x_dicts, y_labels):
+        """
+        predict_learn_one over a sequence of samples, sent together (in frames of up to
+        batch_size commands) and applied in order. Returns the list of predictions.
+        """
+        futures = []
+        for x_dict, y_label in zip(x_dicts, y_labels):
+            request_id, future = self._router.register()
+            self._batcher.add(self._predict_learn_message(x_dict, y_label, request_id))
+            futures.append(future)
+        self._batcher.flush()
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _predict_learn_message(x_dict, y_label, request_id):
+        return {
+            "command": "predict_learn",
+            "x_dict": x_dict,
+            "y_label": y_label,
+            "request_id": request_id
+        }
+
+    @property
+    def in_flight(self):
+        """Number of requests waiting for an answer."""
+        return len(self._router)
+
+    def call(self, command: str):
+        """
+        Send a command that the process answers with an "info" response, and wait for it.
+        """
+        request_id, future = self._router.register()
+        self._batcher.add({"command": command, "request_id": request_id}, flush=True)
+        return future.result()
+
+    def info(self):
+        """
+        Returns the version and age (in seconds) of the model snapshot served by the process.
+        """
+        return self.call("info")
+
+    def stats(self):
+        """
+        Returns the telemetry of the process (see telemetry.Telemetry.stats), or None
+        if it runs without telemetry.
+        """
+        return self.call("stats")
 
     def learn_one(self, x_dict: dict, y_label):
         """
-        Send a train request (non-blocking).
+        Send a train request (non-blocking, it may wait in the current batch), unless a
+        "block" backpressure policy makes it wait for the process to catch up.
+        """
+        self._learns.learn(x_dict, y_label)
+
+    def flush(self, timeout: float = None):
+        """
+        Waits until the process has applied every learn sent before.
         """
+        self._learns.flush(timeout)
+
+    def learn_metrics(self):
+        """
+        Returns the {"sent", "applied", "in_flight", "backlog", "shed"} counts of the learns.
+        """
+        return self._learns.metrics()
+
+    def _send_learn(self, x_dict, y_label):
         msg = {
             "command": "train",
             "x_dict": x_dict,
             "y_label": y_label
         }
-        self.parent_conn.send(msg)
+        self._batcher.add(msg)
+
+    def _send_sync(self, flush):
+        request_id, future = self._router.register()
+        self._batcher.add({"command": "sync", "request_id": request_id}, flush=flush)
+        return future
+
+    def evaluate(self, spec: GeneratorSpec, metric, checkpoint_every: int = 1000, learn: bool = True):
+        """
+        Runs a prequential evaluation inside the model process: it builds the stream
+        from spec, and predicts, scores and learns (if learn) every sample itself.
+        Returns an iterator over the checkpoints streamed back every checkpoint_every
+        samples (see evaluation.PrequentialRun); the last one has "done" set and holds
+        the metric. The model keeps what it learnt.
+        """
+        request_id, stream = self._router.register_stream()
+        self._batcher.add({
+            "command": "evaluate",
+            "request_id": request_id,
+            "spec": spec,
+            "metric": metric,
+            "checkpoint_every": checkpoint_every,
+            "learn": learn
+        }, flush=True)
+        return iter_checkpoints(stream)
+
+    def close(self):
+        """
+        Sends the pending commands and closes the connection (the server keeps running).
+        """
+        self._learns.close()
+        self._batcher.close()
+        self._close_client()
+        self.parent_conn.close()
+
+    def _close_client(self):
+        self._wake_conn.send(None)
+        self._demultiplexer.join()
+        self._router.fail_all(RuntimeError("The connection to the model process is closed."))
+
+
+class RiverModelManagerPipe(RiverModelClientPipe):
+    """
+    Demonstrates a manager class that spawns a RiverModelProcess using a Pipe.
+    """
+
+    def __init__(
+        self,
+        model: 'base.Estimator',
+        model_path: str = None,
+        batch_size: int = 1,
+        max_delay_us: int = 0,
+        codec: str = "pickle",
+        snapshot_policy: SnapshotPolicy = None,
+        compression: str = None,
+        backpressure: BackpressurePolicy = None,
+        telemetry: Telemetry = None
+    ):
+        """
+        batch_size commands at most are coalesced into a single pipe message, and a
+        command waits at most max_delay_us for its batch to fill up (0 = no limit).
+        codec is "pickle", or "compact" to send schema-encoded frames, smaller but slower to encode (see codec.Codec).
+        snapshot_policy enables periodic checkpoints of the model to model_path, and
+        compression (None, "zlib" or "lzma") compresses the saved model. backpressure
+        bounds the learns in flight (see backpressure.BackpressurePolicy). telemetry
+        instruments the process (see telemetry.Telemetry, and stats()).
+        """
+        # Create a Pipe (two connection objects, one for parent, one for child)
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=True)
+        if codec == "compact":
+            parent_conn, child_conn = CodecConnection(parent_conn), CodecConnection(child_conn)
+        elif codec != "pickle":
+            raise ValueError(f"Unknown codec: {codec}")
+
+        # Event for stopping the child process
+        stop_event = multiprocessing.Event()
+
+        # Create and start the child process
+        self.proc = RiverModelProcess(
+            model=model,
+            pipe_conn=child_conn,
+            stop_event=stop_event,
+            model_path=model_path,
+            snapshot_policy=snapshot_policy,
+            compression=compression,
+            telemetry=telemetry
+        )
+        self.proc.start()
+
+        # Keep references for usage
+        self.stop_event = stop_event
+        super().__init__(
+            self._open_client(parent_conn),
+            batch_size=batch_size,
+            max_delay_us=max_delay_us,
+            backpressure=backpressure,
+            stamp_frames=telemetry is not None
+        )
+
+    def _open_client(self, parent_conn):
+        """Returns the connection the manager talks through (subclasses may swap the transport)."""
+        return parent_conn
+
+    def connect(self):
+        """
+        Opens a new connection to the model process, for another producer. Pass it to
+        the other process (e.g. as a multiprocessing.Process argument) and wrap it there
+        in a RiverModelClientPipe.
+        """
+        conn, server_conn = multiprocessing.Pipe(duplex=True)
+        self.proc.add_client(server_conn)
+        # The control channel holds its own duplicate until the server picks it up
+        server_conn.close()
+        return conn
 
     def stop(self):
         """
         Signal the process to stop and wait for it to exit.
         """
         self.logger.info("Stopping the model process...")
+        self._learns.close()
+        self._batcher.close()
         self.stop_event.set()
+        self.proc.request_stop()
         self.proc.join()
+        self._close_client()
         self.logger.info("Process stopped.")
 
 # -------------------------------------------------------------------
@@ -1,12 +1,24 @@
+import itertools
 import os
-import pickle
-import uuid
 import queue
+import threading
 import time
 import multiprocessing
+import multiprocessing.connection
 import logging
 from river import base  # used for type annotation, optional
 
+from rivermultiproccesing.backpressure import BackpressurePolicy, LearnFlow
+from rivermultiproccesing.batching import CommandBatcher
+from rivermultiproccesing.codec import TupleCodec
+from rivermultiproccesing.control import ControlChannel, queue_reader
+from rivermultiproccesing.evaluation import GeneratorSpec, PrequentialRun, iter_checkpoints
+from rivermultiproccesing.futures import ResponseRouter
+from rivermultiproccesing.persistence import load_model
+from rivermultiproccesing.snapshots import SnapshotPolicy, Snapshotter, write_model
+from rivermultiproccesing.sockets import ServerFramedConnection, listen_unix
+from rivermultiproccesing.telemetry import Telemetry
+
 # -----------------------------
 # Configure the root logger here or in main.py:
 # Logging levels: DEBUG, INFO, WARNING, ERROR, CRITICAL
@@ -17,19 +29,42 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 # -----------------------------
 
+
+def _command_of(msg):
+    return msg[0] if isinstance(msg, tuple) else None
+
+
 class RiverModelServer(multiprocessing.Process):
     """
     A background process that holds a single River model, listens for commands
     to predict or train, and optionally saves/loads the model to disk.
+
+    Besides the request queue, the server answers clients attached with add_client()
+    (Pipe connections speaking the same tuple protocol, e.g. from other producer
+    processes). With a socket_path, it also accepts clients connecting to that Unix
+    domain socket from any process of the host (see river_socket.RiverSocketClient).
+    It sleeps in multiprocessing.connection.wait() until one of them or the control
+    channel has something to read, so there is no polling interval.
+    Stop it with request_stop() (setting stop_event alone does not wake it up).
+    A wake-up runs at most max_queue_messages messages of the request queue, so a busy
+    queue producer does not starve the other clients and the control channel.
     """
 
+    # Messages read from the request queue per wake-up
+    max_queue_messages = 64
+
     def __init__(
         self,
         model: 'base.Estimator',
         request_queue: multiprocessing.Queue,
         response_queue: multiprocessing.Queue,
         stop_event: multiprocessing.Event,
-        model_path: str = None
+        model_path: str = None,
+        snapshot_policy: SnapshotPolicy = None,
+        compression: str = None,
+        telemetry: Telemetry = None,
+        socket_path: str = None,
+        socket_mode: int = 0o600
     ):
         """
         :param model:         A River model or pipeline (e.g. compose.Pipeline(...))
@@ -37,77 +72,536 @@ class RiverModelServer(multiprocessing.Process):
         :param response_queue: Queue for responses ("prediction", id, y_pred)
         :param stop_event:     Event to signal shutdown
         :param model_path:     Path to load/save the model (if not None)
+        :param snapshot_policy: Periodic checkpoints of the model to model_path while running (see snapshots.Snapshotter)
+        :param compression:    Compression of the saved model: None, "zlib" or "lzma" (see persistence)
+        :param telemetry:      Counts, latencies and time spent per part, for the "stats" command (see telemetry)
+        :param socket_path:    Unix domain socket to accept clients on (None = no socket)
+        :param socket_mode:    Permissions of the socket file, i.e. who may connect (see sockets.listen_unix)
         """
         super().__init__(daemon=True)
         self.request_queue = request_queue
         self.response_queue = response_queue
         self.stop_event = stop_event
         self.model_path = model_path
+        self.compression = compression
+        self.control = ControlChannel()
+        # Decodes the compact frames (bytes) of the request queue, and encodes their answers
+        self.codec = TupleCodec()
+        self.snapshots = None if snapshot_policy is None else Snapshotter(model_path, snapshot_policy, compression)
+        self.telemetry = telemetry
+        self.socket_path = socket_path
+        # Bound now, so that clients can connect as soon as the constructor returns
+        self.listener = None if socket_path is None else listen_unix(socket_path, socket_mode)
+        # (PrequentialRun, request id, reply) of the evaluations in progress
+        self._runs = []
+        # Sends a response to where the message being handled came from
+        self._reply = None
 
         if model_path is not None and os.path.exists(model_path):
             logger.info(f"Loading existing model from {model_path}")
-            with open(model_path, "rb") as f:
-                self.model = pickle.load(f)
+            self.model = load_model(model_path)
             logger.debug("Model successfully loaded from disk.")
         else:
             logger.info("No existing model found, using provided model instance.")
             self.model = model
 
+    def add_client(self, conn):
+        """Attaches a client connection (called from the parent process)."""
+        self.control.add_client(conn)
+
+    def request_stop(self):
+        """Asks the server to stop (called from the parent process)."""
+        self.control.request_stop()
+
     def run(self):
         logger.info("Starting model server process.")
-        while not self.stop_event.is_set():
+        requests = queue_reader(self.request_queue)
+        if self.telemetry is not None:
+            self._handle = self.telemetry.timed(self._handle, _command_of)
+        clients = []
+        sources = [self.control.reader, requests] + ([] if self.listener is None else [self.listener])
+        stopping = False
+        while not stopping:
+            ready = multiprocessing.connection.wait([*sources, *clients], self._wait_timeout())
+            if self.telemetry is not None:
+                self.telemetry.sample_backlog(queue=self.request_queue, conns=clients)
+            for conn in ready:
+                if conn is self.control.reader:
+                    msg = conn.recv()
+                    if msg[0] == "connect":
+                        clients.append(msg[1])
+                    elif msg[0] == "stop":
+                        stopping = True
+                elif conn is requests:
+                    self._serve_queue(self.max_queue_messages)
+                elif conn is self.listener:
+                    self._accept(clients)
+                else:
+                    self._serve(conn, clients)
+            self._tick()
+            stopping = stopping or self.stop_event.is_set()
+
+        # No new socket clients; answer what the clients sent before the stop request
+        if self.listener is not None:
+            self.listener.close()
             try:
-                msg = self.request_queue.get(timeout=0.1)
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+        self._serve_queue()
+        for conn in list(clients):
+            while conn in clients and conn.poll():
+                self._serve(conn, clients)
+
+        # Save the model on shutdown if a path was provided
+        if self.telemetry is not None:
+            self.telemetry.dump()
+        if self.snapshots is not None:
+            self.snapshots.close()
+        if self.model_path is not None:
+            logger.info(f"Saving model to {self.model_path}")
+            write_model(self.model, self.model_path, self.compression)
+            logger.debug("Model saved successfully.")
+
+        logger.info("Model server process stopped.")
+
+    def _accept(self, clients):
+        try:
+            sock, _ = self.listener.accept()
+        except OSError as e:
+            # e.g. the client gave up, or out of file descriptors
+            logger.warning(f"Could not accept a socket client: {e}")
+            return
+        clients.append(ServerFramedConnection(sock))
+
+    def _wait_timeout(self):
+        """Longest time to sleep without messages, in seconds (None = until the next message)."""
+        timeouts = [
+            timeout for timeout in (
+                None if self.snapshots is None else self.snapshots.timeout(),
+                None if self.telemetry is None else self.telemetry.timeout()
+            ) if timeout is not None
+        ]
+        # Evaluations run between reads, when their next sample is due
+        timeouts += [entry[0].timeout() for entry in self._runs]
+        return min(timeouts) if timeouts else None
+
+    def _tick(self):
+        """Called after every wake-up, for time-based work."""
+        for entry in list(self._runs):
+            run, request_id, reply = entry
+            for checkpoint in run.step(self.model.predict_one, self._learn):
+                try:
+                    reply(("checkpoint", request_id, checkpoint))
+                except OSError:
+                    # The client went away
+                    run.done = True
+            if run.done:
+                run.close()
+                self._runs.remove(entry)
+        if self.snapshots is not None:
+            self.snapshots.tick(self.model)
+        if self.telemetry is not None:
+            self.telemetry.tick()
+
+    def _serve_queue(self, limit: int = None):
+        """Runs the commands waiting in the request queue, limit messages at most (None = all of them)."""
+        if self.telemetry is not None:
+            return self._serve_queue_timed(limit)
+        self._reply = self.response_queue.put
+        for _ in itertools.repeat(None) if limit is None else range(limit):
+            try:
+                msg = self.request_queue.get_nowait()
             except queue.Empty:
+                return
+            if isinstance(msg, bytes):
+                responses = [response for response in map(self._handle, self.codec.decode(msg)) if response is not None]
+                if responses:
+                    self.response_queue.put(self.codec.encode(responses))
                 continue
+            response = self._handle(msg)
+            if response is not None:
+                self.response_queue.put(response)
 
-            if not isinstance(msg, tuple):
-                logger.warning(f"Received an unexpected message format: {msg}")
+    def _serve_queue_timed(self, limit):
+        """_serve_queue, recording where the time goes (a separate loop keeps the other one lean)."""
+        telemetry = self.telemetry
+        self._reply = self.response_queue.put
+        for _ in itertools.repeat(None) if limit is None else range(limit):
+            start = time.perf_counter_ns()
+            try:
+                msg = self.request_queue.get_nowait()
+            except queue.Empty:
+                return
+            telemetry.add_time("recv", start)
+            if isinstance(msg, bytes):
+                start = time.perf_counter_ns()
+                commands, sent_at = self.codec.decode_frame(msg)
+                telemetry.add_time("decode", start)
+                if sent_at is not None:
+                    telemetry.frame_sent_at(sent_at)
+                responses = [response for response in map(self._handle, commands) if response is not None]
+                if responses:
+                    start = time.perf_counter_ns()
+                    frame = self.codec.encode(responses)
+                    telemetry.add_time("encode", start)
+                    start = time.perf_counter_ns()
+                    self.response_queue.put(frame)
+                    telemetry.add_time("send", start)
                 continue
+            self._record_stamp(msg)
+            response = self._handle(msg)
+            if response is not None:
+                start = time.perf_counter_ns()
+                self.response_queue.put(response)
+                telemetry.add_time("send", start)
 
-            command = msg[0]
+    def _record_stamp(self, msg):
+        # ("batch", [command, ...], sent_at) from a client stamping its frames
+        if isinstance(msg, tuple) and len(msg) == 3 and msg[0] == "batch":
+            self.telemetry.frame_sent_at(msg[2])
 
-            if command == "predict":
-                # ("predict", x_dict, request_id)
-                _, x_dict, request_id = msg
-                logger.debug(f"Received predict request for id={request_id} with x={x_dict}")
-                y_pred = self.model.predict_one(x_dict)
-                logger.debug(f"Prediction for id={request_id}: {y_pred}")
-                self.response_queue.put(("prediction", request_id, y_pred))
+    def _serve(self, conn, clients):
+        """Reads one message from a client connection and answers it."""
+        telemetry = self.telemetry
+        try:
+            msg = conn.recv() if telemetry is None else telemetry.recv(conn)
+        except BlockingIOError:
+            # Only part of a socket frame has arrived: the rest wakes us up again
+            return
+        except EOFError:
+            # The client went away
+            clients.remove(conn)
+            return
+        if telemetry is not None:
+            self._record_stamp(msg)
+        self._reply = conn.send
+        response = self._handle(msg)
+        if response is not None:
+            try:
+                if telemetry is None:
+                    conn.send(response)
+                else:
+                    telemetry.send(conn, response)
+            except OSError:
+                clients.remove(conn)
 
-            elif command == "train":
-                # ("train", x_dict, y_label)
-                _, x_dict, y_label = msg
-                logger.debug(f"Received train request with x={x_dict}, y={y_label}")
-                self.model.learn_one(x_dict, y_label)
-                logger.debug("Model updated with one training example.")
+    def _handle(self, msg):
+        """
+        Runs one command (or a batch of commands) on the model.
+        :return: the response to send back, or None
+        """
+        if not isinstance(msg, tuple):
+            logger.warning(f"Received an unexpected message format: {msg}")
+            return None
 
-            else:
-                logger.warning(f"Unknown command: {command}")
+        command = msg[0]
 
-        # Save the model on shutdown if a path was provided
-        if self.model_path is not None:
-            logger.info(f"Saving model to {self.model_path}")
-            with open(self.model_path, "wb") as f:
-                pickle.dump(self.model, f)
-            logger.debug("Model saved successfully.")
+        if command == "predict":
+            # ("predict", x_dict, request_id)
+            _, x_dict, request_id = msg
+            y_pred = self.model.predict_one(x_dict)
+            return ("prediction", request_id, y_pred)
 
-        logger.info("Model server process stopped.")
+        elif command == "train":
+            # ("train", x_dict, y_label)
+            _, x_dict, y_label = msg
+            self._learn(x_dict, y_label)
 
+        elif command == "predict_learn":
+            # ("predict_learn", x_dict, y_label, request_id): test-then-train in one round trip
+            _, x_dict, y_label, request_id = msg
+            y_pred = self.model.predict_one(x_dict)
+            self._learn(x_dict, y_label)
+            return ("prediction", request_id, y_pred)
 
-class RiverModelManager:
+        elif command == "evaluate":
+            # ("evaluate", request_id, spec, metric, checkpoint_every, learn): advanced by _tick()
+            _, request_id, spec, metric, checkpoint_every, learn = msg
+            self._runs.append((PrequentialRun(spec, metric, checkpoint_every, learn), request_id, self._reply))
+
+        elif command == "sync":
+            # ("sync", request_id): answered once every command sent before has run
+            return ("synced", msg[1])
+
+        elif command == "info":
+            # ("info", request_id)
+            info = {"snapshots": None if self.snapshots is None else self.snapshots.metrics()}
+            return ("info", msg[1], info)
+
+        elif command == "stats":
+            # ("stats", request_id): the telemetry, None without
+            return ("info", msg[1], None if self.telemetry is None else self.telemetry.stats())
+
+        elif command == "batch":
+            # ("batch", [command, ...][, sent_at]): run in order, answer with one ("batch", [response, ...])
+            responses = [response for response in map(self._handle, msg[1]) if response is not None]
+            if responses:
+                return ("batch", responses)
+
+        else:
+            logger.warning(f"Unknown command: {command}")
+        return None
+
+    def _learn(self, x_dict, y_label):
+        self.model.learn_one(x_dict, y_label)
+        if self.snapshots is not None:
+            self.snapshots.on_learn(self.model)
+
+
+class RiverModelClient:
+    """
+    Client of a RiverModelServer over a Pipe connection obtained from
+    RiverModelManager.connect(), e.g. in another producer process.
+
+    The client is thread-safe: predictions are matched to their callers by request id
+    in a background thread, so many threads (and many requests) can be in flight at once.
+    """
+
+    def __init__(
+        self,
+        conn,
+        batch_size: int = 1,
+        max_delay_us: int = 0,
+        backpressure: BackpressurePolicy = None,
+        stamp_frames: bool = False
+    ):
+        """
+        :param conn:         Connection returned by RiverModelManager.connect()
+        :param batch_size:   Maximum number of commands coalesced into one message
+        :param max_delay_us: Maximum time a command waits for its batch to fill up (0 = no limit)
+        :param backpressure: Bound on the learns in flight and what to do beyond it (None = unbounded)
+        :param stamp_frames: Add its send time to every frame, for the queue wait measured by the server's telemetry
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.conn = conn
+        self.stamp_frames = stamp_frames
+        self._batcher = CommandBatcher(self._send_frame, max_batch=batch_size, max_delay_us=max_delay_us)
+        self._router = ResponseRouter()
+        self._learns = LearnFlow(
+            lambda x_dict, y_label: self._batcher.add(("train", x_dict, y_label)),
+            self._send_sync,
+            self._batcher.flush,
+            backpressure
+        )
+        # close() wakes the demultiplexer up through this pipe
+        self._wake_listener, self._wake_conn = multiprocessing.Pipe(duplex=False)
+        self._demultiplexer = threading.Thread(target=self._demultiplex, daemon=True)
+        self._demultiplexer.start()
+
+    def _send_frame(self, commands):
+        if self.stamp_frames:
+            self.conn.send(("batch", commands, time.monotonic()))
+        elif len(commands) == 1:
+            self.conn.send(commands[0])
+        else:
+            self.conn.send(("batch", commands))
+
+    def _receive(self):
+        """Returns the next message from the server, or None once the client is closed."""
+        ready = multiprocessing.connection.wait([self.conn, self._wake_listener])
+        if self._wake_listener in ready:
+            return None
+        try:
+            return self.conn.recv()
+        except EOFError:
+            return None
+
+    def _wake(self):
+        self._wake_conn.send(None)
+
+    def _demultiplex(self):
+        """Routes every response coming from the server to the Future waiting for it."""
+        while True:
+            msg = self._receive()
+            if msg is None:
+                break
+            for response in (msg[1] if msg[0] == "batch" else [msg]):
+                if response[0] == "prediction":
+                    _, request_id, y_pred = response
+                    if not self._router.resolve(request_id, y_pred):
+                        self.logger.warning(f"Prediction for an unknown request: {response}")
+                elif response[0] == "info":
+                    self._router.resolve(response[1], response[2])
+                elif response[0] == "synced":
+                    self._router.resolve(response[1], None)
+                elif response[0] == "checkpoint":
+                    _, request_id, checkpoint = response
+                    self._router.push(request_id, checkpoint, last=checkpoint["done"])
+                else:
+                    self.logger.warning(f"Unexpected message in response queue: {response}")
+
+    def predict_async(self, x_dict: dict):
+        """
+        Send a predict request without waiting for the answer.
+        The request may wait up to max_delay_us in the current batch.
+        :param x_dict: features dict
+        :return: a concurrent.futures.Future resolved with the prediction
+        """
+        request_id, future = self._router.register()
+        self._batcher.add_soon(("predict", x_dict, request_id))
+        return future
+
+    def predict_one(self, x_dict: dict):
+        """
+        Send a predict request and wait for the server's response.
+        :param x_dict: features dict
+        :return: prediction from the model
+        """
+        request_id, future = self._router.register()
+        # The prediction is needed now: send it along with any pending commands
+        self._batcher.add(("predict", x_dict, request_id), flush=True)
+        return future.result()
+
+    def predict_learn_async(self, x_dict: dict, y_label):
+        """
+        Send a predict-then-learn request without waiting for the answer: the server
+        predicts x_dict, then learns (x_dict, y_label), in a single command.
+        :return: a concurrent.futures.Future resolved with the prediction made before learning
+        """
+        request_id, future = self._router.register()
+        self._batcher.add_soon(("predict_learn", x_dict, y_label, request_id))
+        return future
+
+    def predict_learn_one(self, x_dict: dict, y_label):
+        """
+        Predict x_dict, then learn (x_dict, y_label), in one round trip (test-then-train).
+        :return: the prediction made before learning
+        """
+        request_id, future = self._router.register()
+        self._batcher.add(("predict_learn", x_dict, y_label, request_id), flush=True)
+        return future.result()
+
+    def predict_learn_many(self, x_dicts, y_labels):
+        """
+        predict_learn_one over a sequence of samples, sent together (in frames of up to
+        batch_size commands) and applied in order.
+        :return: the list of predictions
+        """
+        futures = []
+        for x_dict, y_label in zip(x_dicts, y_labels):
+            request_id, future = self._router.register()
+            self._batcher.add(("predict_learn", x_dict, y_label, request_id))
+            futures.append(future)
+        self._batcher.flush()
+        return [future.result() for future in futures]
+
+    def info(self):
+        """
+        Ask the server for its state (e.g. snapshot metrics) and wait for the answer.
+        :return: a dict
+        """
+        request_id, future = self._router.register()
+        self._batcher.add(("info", request_id), flush=True)
+        return future.result()
+
+    def stats(self):
+        """
+        Ask the server for its telemetry (see telemetry.Telemetry.stats) and wait for the answer.
+        :return: a dict, or None if the server runs without telemetry
+        """
+        request_id, future = self._router.register()
+        self._batcher.add(("stats", request_id), flush=True)
+        return future.result()
+
+    def learn_one(self, x_dict: dict, y_label):
+        """
+        Send a train request to the server.
+        Note: This is non-blocking; it just sends the request (or queues it in the current batch),
+        unless a "block" backpressure policy makes it wait for the server to catch up.
+        """
+        self._learns.learn(x_dict, y_label)
+
+    def flush(self, timeout: float = None):
+        """
+        Wait until the server has applied every learn sent before.
+        """
+        self._learns.flush(timeout)
+
+    def learn_metrics(self):
+        """
+        :return: {"sent", "applied", "in_flight", "backlog", "shed"} counts of the learns
+        """
+        return self._learns.metrics()
+
+    def _send_sync(self, flush):
+        request_id, future = self._router.register()
+        self._batcher.add(("sync", request_id), flush=flush)
+        return future
+
+    def evaluate(self, spec: GeneratorSpec, metric, checkpoint_every: int = 1000, learn: bool = True):
+        """
+        Run a prequential evaluation inside the server: it builds the stream from spec,
+        and predicts, scores and learns (if learn) every sample itself.
+        :param spec:             Description of the stream (dataset, n_instances, pacing, windows)
+        :param metric:           A river metric, updated in the server
+        :param checkpoint_every: Number of samples between two checkpoints
+        :return: an iterator over the checkpoints streamed back (see evaluation.PrequentialRun);
+                 the last one has "done" set and holds the metric. The model keeps what it learnt.
+        """
+        request_id, stream = self._router.register_stream()
+        self._batcher.add(("evaluate", request_id, spec, metric, checkpoint_every, learn), flush=True)
+        return iter_checkpoints(stream)
+
+    def close(self):
+        """
+        Send the pending commands and close the connection (the server keeps running).
+        """
+        self._learns.close()
+        self._batcher.close()
+        self._close_client(RuntimeError("The connection to the model server is closed."))
+        self.conn.close()
+
+    def _close_client(self, exception):
+        self._wake()
+        self._demultiplexer.join()
+        self._router.fail_all(exception)
+
+
+class RiverModelManager(RiverModelClient):
     """
     Spawns the RiverModelServer in a separate process and provides methods to train/predict.
     Optionally persists the model to disk on stop, or loads it if it exists.
+
+    The manager is thread-safe: predictions are matched to their callers by request id
+    in a background thread, so many threads (and many requests) can be in flight at once.
+    Other processes can share the server through connect().
     """
 
-    def __init__(self, model: 'base.Estimator', model_path: str = None):
+    def __init__(
+        self,
+        model: 'base.Estimator',
+        model_path: str = None,
+        batch_size: int = 1,
+        max_delay_us: int = 0,
+        codec: str = "pickle",
+        snapshot_policy: SnapshotPolicy = None,
+        compression: str = None,
+        backpressure: BackpressurePolicy = None,
+        telemetry: Telemetry = None,
+        socket_path: str = None
+    ):
         """
-        :param model:      A River model or pipeline
-        :param model_path: File path for saving/loading the model
+        :param model:           A River model or pipeline
+        :param model_path:      File path for saving/loading the model
+        :param batch_size:      Maximum number of commands coalesced into one queue message
+        :param max_delay_us:    Maximum time a command waits for its batch to fill up (0 = no limit)
+        :param codec:           "pickle", or "compact" to send schema-encoded frames, smaller but slower to encode (see codec.Codec)
+        :param snapshot_policy: Periodic checkpoints of the model to model_path while the server runs
+        :param compression:     Compression of the saved model: None, "zlib" or "lzma"
+        :param backpressure:    Bound on the learns in flight and what to do beyond it (see backpressure)
+        :param telemetry:       Instruments the server, read back with stats() (see telemetry.Telemetry)
+        :param socket_path:     Unix domain socket on which the server also accepts clients from other
+                                processes of the host (see river_socket.RiverSocketClient)
         """
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.info("Initializing RiverModelManager.")
+        if codec == "compact":
+            self._codec = TupleCodec()
+        elif codec == "pickle":
+            self._codec = None
+        else:
+            raise ValueError(f"Unknown codec: {codec}")
 
         self.request_queue = multiprocessing.Queue()
         self.response_queue = multiprocessing.Queue()
@@ -118,38 +612,57 @@ class RiverModelManager:
             request_queue=self.request_queue,
             response_queue=self.response_queue,
             stop_event=self.stop_event,
-            model_path=model_path
+            model_path=model_path,
+            snapshot_policy=snapshot_policy,
+            compression=compression,
+            telemetry=telemetry,
+            socket_path=socket_path
         )
         self.server.start()
+        if self.server.listener is not None:
+            # The server process has its own copy
+            self.server.listener.close()
         self.logger.info("RiverModelServer process started.")
 
-    def predict_one(self, x_dict: dict):
-        """
-        Send a predict request and wait for the server's response.
-        :param x_dict: features dict
-        :return: prediction from the model
-        """
-        request_id = str(uuid.uuid4())
-        self.logger.debug(f"Sending predict request {request_id} with x={x_dict}")
-        self.request_queue.put(("predict", x_dict, request_id))
+        super().__init__(
+            None,
+            batch_size=batch_size,
+            max_delay_us=max_delay_us,
+            backpressure=backpressure,
+            stamp_frames=telemetry is not None
+        )
 
-        while True:
-            msg = self.response_queue.get()
-            if msg[0] == "prediction":
-                _, resp_id, y_pred = msg
-                if resp_id == request_id:
-                    self.logger.debug(f"Received prediction for request {request_id}: {y_pred}")
-                    return y_pred
-            else:
-                self.logger.warning(f"Unexpected message in response queue: {msg}")
+    def _send_frame(self, commands):
+        if self._codec is not None:
+            self.request_queue.put(self._codec.encode(commands, time.monotonic() if self.stamp_frames else None))
+        elif self.stamp_frames:
+            self.request_queue.put(("batch", commands, time.monotonic()))
+        elif len(commands) == 1:
+            self.request_queue.put(commands[0])
+        else:
+            self.request_queue.put(("batch", commands))
 
-    def learn_one(self, x_dict: dict, y_label):
+    def _receive(self):
+        # None is the sentinel put by stop()
+        msg = self.response_queue.get()
+        if isinstance(msg, bytes):
+            return ("batch", self._codec.decode(msg))
+        return msg
+
+    def _wake(self):
+        self.response_queue.put(None)
+
+    def connect(self):
         """
-        Send a train request to the server.
-        Note: This is non-blocking; it just sends the request.
+        Open a new connection to the server, for another producer.
+        Pass it to the other process (e.g. as a multiprocessing.Process argument)
+        and wrap it there in a RiverModelClient.
         """
-        self.logger.debug(f"Sending train request with x={x_dict}, y={y_label}")
-        self.request_queue.put(("train", x_dict, y_label))
+        conn, server_conn = multiprocessing.Pipe(duplex=True)
+        self.server.add_client(server_conn)
+        # The control channel holds its own duplicate until the server picks it up
+        server_conn.close()
+        return conn
 
     def stop(self):
         """
@@ -157,6 +670,13 @@ class RiverModelManager:
         If model_path was provided, it saves the model to disk.
         """
         self.logger.info("Stopping the model server...")
+        self._learns.close()
+        self._batcher.close()
+        # Make sure every command is in the pipe before the stop request overtakes them
+        self.request_queue.close()
+        self.request_queue.join_thread()
         self.stop_event.set()
+        self.server.request_stop()
         self.server.join()
-        self.logger.info("Model server has stopped.")
\ No newline at end of file
+        self._close_client(RuntimeError("The model server has stopped."))
+        self.logger.info("Model server has stopped.")
@@ -0,0 +1,242 @@
+import itertools
+import logging
+import multiprocessing
+import pickle
+import time
+
+from river import base  # For type annotation
+
+from rivermultiproccesing.river_pipe import RiverModelClientPipe, RiverModelProcess
+
+logger = logging.getLogger(__name__)
+
+
+class RiverTrainerProcess(RiverModelProcess):
+    """
+    A RiverModelProcess that publishes snapshots of its model to predictor replicas,
+    every snapshot_every learns and/or snapshot_interval seconds after the first
+    learn not published yet.
+
+    A snapshot is pickled once and sent to every replica as a "load_snapshot"
+    command; a replica swaps it in between two commands, so each prediction sees
+    one whole model.
+    """
+
+    def __init__(
+        self,
+        model: 'base.Estimator',
+        pipe_conn,
+        stop_event: multiprocessing.Event,
+        replica_conns,
+        snapshot_every: int = 1000,
+        snapshot_interval: float = None,
+        model_path: str = None
+    ):
+        """
+        :param replica_conns:     Connections to the replicas (write ends)
+        :param snapshot_every:    Publish after this many learns (None = only on time)
+        :param snapshot_interval: Publish at most this many seconds after a learn (None = only on count)
+        """
+        super().__init__(model=model, pipe_conn=pipe_conn, stop_event=stop_event, model_path=model_path)
+        self.replica_conns = replica_conns
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self._unpublished = 0
+        self._deadline = None
+
+    def _handle(self, msg):
+        command = msg.get("command") if isinstance(msg, dict) else None
+        if command == "publish":
+            self.publish()
+            return {"type": "info", "request_id": msg["request_id"], "info": {"version": self.snapshot_version, "age": 0.0}}
+
+        response = super()._handle(msg)
+        if command in ("train", "predict_learn"):
+            self._unpublished += 1
+            if self.snapshot_every is not None and self._unpublished >= self.snapshot_every:
+                self.publish()
+            elif self._deadline is None and self.snapshot_interval is not None:
+                self._deadline = time.monotonic() + self.snapshot_interval
+        return response
+
+    def _wait_timeout(self):
+        timeout = super()._wait_timeout()
+        if self._deadline is None:
+            return timeout
+        remaining = max(0.0, self._deadline - time.monotonic())
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def _tick(self):
+        super()._tick()
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            self.publish()
+
+    def publish(self):
+        """Sends the current model to every replica."""
+        self.snapshot_version += 1
+        self.snapshot_created = time.time()
+        snapshot = {
+            "command": "load_snapshot",
+            "model": pickle.dumps(self.model, protocol=pickle.HIGHEST_PROTOCOL),
+            "version": self.snapshot_version,
+            "created": self.snapshot_created
+        }
+        for conn in list(self.replica_conns):
+            try:
+                conn.send(snapshot)
+            except OSError:
+                # The replica has stopped
+                self.replica_conns.remove(conn)
+        self._unpublished = 0
+        self._deadline = None
+        logger.debug(f"Published snapshot {self.snapshot_version}.")
+
+
+class RiverReplicaManager:
+    """
+    Runs one trainer process and n_replicas read-only predictor processes, so that
+    predictions scale across cores while the model keeps learning.
+
+    learn_one goes to the trainer, which publishes snapshots of the model to the
+    replicas (see RiverTrainerProcess). predict_one goes to a replica, chosen in
+    round-robin or as the one with the fewest predictions in flight, and is answered
+    by the last snapshot that replica loaded: up to snapshot_every learns or
+    snapshot_interval seconds behind the trainer. snapshot_info() reports the version
+    and age of what each replica serves.
+    """
+
+    def __init__(
+        self,
+        model: 'base.Estimator',
+        n_replicas: int = 2,
+        snapshot_every: int = 1000,
+        snapshot_interval: float = None,
+        dispatch: str = "round_robin",
+        model_path: str = None,
+        batch_size: int = 1,
+        max_delay_us: int = 0
+    ):
+        """
+        :param model:             A River model or pipeline
+        :param n_replicas:        Number of predictor processes
+        :param snapshot_every:    Publish a snapshot every this many learns (None = only on time)
+        :param snapshot_interval: Publish a snapshot at most this many seconds after a learn (None = only on count)
+        :param dispatch:          "round_robin" or "least_loaded"
+        :param model_path:        File path for saving/loading the trainer's model
+        :param batch_size:        Maximum number of commands coalesced into one pipe message
+        :param max_delay_us:      Maximum time a command waits for its batch to fill up (0 = no limit)
+        """
+        if dispatch not in ("round_robin", "least_loaded"):
+            raise ValueError(f"Unknown dispatch: {dispatch}")
+        if n_replicas < 1:
+            raise ValueError("n_replicas must be a positive integer")
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.dispatch = dispatch
+        self.stop_event = multiprocessing.Event()
+
+        trainer_conn, trainer_child_conn = multiprocessing.Pipe(duplex=True)
+        self.trainer = RiverTrainerProcess(
+            model=model,
+            pipe_conn=trainer_child_conn,
+            stop_event=self.stop_event,
+            replica_conns=[],
+            snapshot_every=snapshot_every,
+            snapshot_interval=snapshot_interval,
+            model_path=model_path
+        )
+
+        # Replicas start from the trainer's model (loaded from model_path if it exists), as version 0
+        self.replicas = []
+        replica_conns = []
+        for _ in range(n_replicas):
+            conn, child_conn = multiprocessing.Pipe(duplex=True)
+            replica = RiverModelProcess(model=self.trainer.model, pipe_conn=child_conn, stop_event=self.stop_event)
+            replica.start()
+            snapshot_reader, snapshot_writer = multiprocessing.Pipe(duplex=False)
+            replica.add_client(snapshot_reader)
+            snapshot_reader.close()
+            self.replicas.append(replica)
+            self.trainer.replica_conns.append(snapshot_writer)
+            replica_conns.append(conn)
+
+        self.trainer.start()
+        # The trainer has its own copies of the snapshot connections
+        for conn in self.trainer.replica_conns:
+            conn.close()
+
+        self._trainer_client = RiverModelClientPipe(trainer_conn, batch_size=batch_size, max_delay_us=max_delay_us)
+        self._replica_clients = [
+            RiverModelClientPipe(conn, batch_size=batch_size, max_delay_us=max_delay_us) for conn in replica_conns
+        ]
+        self._round_robin = itertools.cycle(self._replica_clients)
+
+    def _pick(self):
+        if self.dispatch == "least_loaded":
+            return min(self._replica_clients, key=lambda client: client.in_flight)
+        return next(self._round_robin)
+
+    def predict_async(self, x_dict: dict):
+        """
+        Send a prediction request to a replica without waiting for the result.
+        Returns a concurrent.futures.Future.
+        """
+        return self._pick().predict_async(x_dict)
+
+    def predict_one(self, x_dict: dict):
+        """
+        Send a prediction request to a replica and wait for the result.
+        """
+        return self._pick().predict_one(x_dict)
+
+    def learn_one(self, x_dict: dict, y_label):
+        """
+        Send a train request to the trainer (non-blocking).
+        """
+        self._trainer_client.learn_one(x_dict, y_label)
+
+    def flush(self, timeout: float = None):
+        """
+        Wait until the trainer has applied the learns sent before (they reach the
+        replicas with the next snapshot).
+        """
+        self._trainer_client.flush(timeout)
+
+    def publish(self, timeout: float = 10.0):
+        """
+        Make the trainer publish a snapshot now (after every learn sent before) and wait
+        until all replicas serve it.
+        :return: the version of the snapshot
+        """
+        version = self._trainer_client.call("publish")["version"]
+        deadline = time.monotonic() + timeout
+        for client in self._replica_clients:
+            while client.info()["version"] < version:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Snapshot {version} not loaded after {timeout}s")
+                time.sleep(0.001)
+        return version
+
+    def snapshot_info(self):
+        """
+        :return: {"version", "age"} of the snapshot served by each replica (age in seconds)
+        """
+        return [client.info() for client in self._replica_clients]
+
+    def stop(self):
+        """
+        Stop the trainer (saving the model if model_path was given) and the replicas.
+        """
+        self.logger.info("Stopping the trainer and the replicas...")
+        # The trainer first, as it may still publish to the replicas: its client sends the
+        # pending learns, and the replicas keep running until it has exited
+        self._trainer_client.close()
+        self.trainer.request_stop()
+        self.trainer.join()
+        for client in self._replica_clients:
+            client.close()
+        self.stop_event.set()
+        for replica in self.replicas:
+            replica.request_stop()
+        for replica in self.replicas:
+            replica.join()
+        self.logger.info("Trainer and replicas stopped.")
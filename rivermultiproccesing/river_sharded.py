@@ -0,0 +1,128 @@
+import logging
+import os
+import zlib
+
+from river import base  # For type annotation
+
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+
+
+def shard_model_path(model_path: str, shard: int, n_shards: int):
+    """
+    Persistence file of one shard: "models/bikes.pkl" -> "models/bikes.shard0-of-4.pkl".
+    """
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.shard{shard}-of-{n_shards}{ext}"
+
+
+class ShardedModelManager:
+    """
+    Partitions a keyed workload over n_shards model servers, each with its own copy
+    of the model: every learn_one/predict_one goes to the shard picked by a hash of
+    the key fields of x (e.g. ["station", "hour"] for per-station state such as
+    TargetAgg(by=["station", "hour"])), so all the messages of a key reach the same
+    model and shards learn in parallel.
+
+    The hash is stable across runs (CRC32 of the key's repr), so the per-shard files
+    derived from model_path are found again as long as n_shards does not change.
+    """
+
+    def __init__(
+        self,
+        model: 'base.Estimator',
+        keys,
+        n_shards: int = 2,
+        model_path: str = None,
+        manager_cls=RiverModelManagerPipe,
+        **manager_kwargs
+    ):
+        """
+        :param model:          A River model or pipeline, copied in every shard
+        :param keys:           Names of the key fields of x, or a function x -> key
+        :param n_shards:       Number of server processes
+        :param model_path:     File path for saving/loading the models, one file per shard (see shard_model_path)
+        :param manager_cls:    Manager of each shard (RiverModelManagerPipe, RiverModelManager, ...)
+        :param manager_kwargs: Other arguments of the shard managers (batch_size, max_delay_us, codec, ...)
+        """
+        if n_shards < 1:
+            raise ValueError("n_shards must be a positive integer")
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.n_shards = n_shards
+        if callable(keys):
+            self._get_key = keys
+        else:
+            fields = tuple(keys)
+            self._get_key = lambda x: tuple(x.get(field) for field in fields)
+        self.keys = keys
+
+        # Each process gets its own copy of the model when it starts
+        self.shards = [
+            manager_cls(
+                model=model,
+                model_path=None if model_path is None else shard_model_path(model_path, shard, n_shards),
+                **manager_kwargs
+            )
+            for shard in range(n_shards)
+        ]
+
+    def shard_of(self, x_dict: dict):
+        """Index of the shard serving the key of x_dict."""
+        return zlib.crc32(repr(self._get_key(x_dict)).encode()) % self.n_shards
+
+    def predict_async(self, x_dict: dict):
+        """
+        Send a prediction request to the shard of x_dict without waiting for the result.
+        Returns a concurrent.futures.Future.
+        """
+        return self.shards[self.shard_of(x_dict)].predict_async(x_dict)
+
+    def predict_one(self, x_dict: dict):
+        """
+        Send a prediction request to the shard of x_dict and wait for the result.
+        """
+        return self.shards[self.shard_of(x_dict)].predict_one(x_dict)
+
+    def learn_one(self, x_dict: dict, y_label):
+        """
+        Send a train request to the shard of x_dict (non-blocking).
+        """
+        self.shards[self.shard_of(x_dict)].learn_one(x_dict, y_label)
+
+    def flush(self, timeout: float = None):
+        """
+        Wait until every shard has applied the learns sent before.
+        """
+        for shard in self.shards:
+            shard.flush(timeout)
+
+    def predict_learn_async(self, x_dict: dict, y_label):
+        """
+        Send a predict-then-learn request to the shard of x_dict without waiting for the result.
+        Returns a concurrent.futures.Future resolved with the prediction made before learning.
+        """
+        return self.shards[self.shard_of(x_dict)].predict_learn_async(x_dict, y_label)
+
+    def predict_learn_one(self, x_dict: dict, y_label):
+        """
+        Predict x_dict, then learn (x_dict, y_label), on the shard of x_dict in one round trip.
+        """
+        return self.shards[self.shard_of(x_dict)].predict_learn_one(x_dict, y_label)
+
+    def predict_all(self, x_dict: dict, combine=None):
+        """
+        Fan a prediction out to every shard (in parallel).
+        :param combine: Optional function reducing the list of predictions (e.g. statistics.mean)
+        :return: the list of predictions, in shard order, or combine(predictions)
+        """
+        futures = [shard.predict_async(x_dict) for shard in self.shards]
+        y_preds = [future.result() for future in futures]
+        return y_preds if combine is None else combine(y_preds)
+
+    def stop(self):
+        """
+        Stop every shard (each saves its model if model_path was given).
+        """
+        self.logger.info("Stopping the shards...")
+        for shard in self.shards:
+            shard.stop()
+        self.logger.info("Shards stopped.")
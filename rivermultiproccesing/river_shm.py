@@ -0,0 +1,398 @@
+import ctypes
+import os
+import sys
+import time
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from river import base  # For type annotation
+
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+
+# Slot opcodes (slot[0])
+_LEARN = 0.0
+_PREDICT = 1.0
+_PREDICTION = 2.0
+# The message did not fit the schema: it was pickled on the side connection
+_PICKLED = 3.0
+_PREDICT_LEARN = 4.0
+
+# Counters of a ring, each on its own cache line
+_HEAD = 0
+_TAIL = 8
+_WAITING = 16
+_LOCK = 24
+_HEADER_SIZE = 256
+
+_NUMBERS = {int, float}
+
+if sys.platform.startswith("linux"):
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _spin_init, _spin_lock, _spin_unlock = _libc.pthread_spin_init, _libc.pthread_spin_lock, _libc.pthread_spin_unlock
+    for _function in (_spin_init, _spin_lock, _spin_unlock):
+        _function.argtypes = [ctypes.c_void_p] + [ctypes.c_int] * (_function is _spin_init)
+else:
+    _spin_init = _spin_lock = _spin_unlock = None
+_PTHREAD_PROCESS_SHARED = 1
+
+
+class ShmRing:
+    """
+    Single-producer/single-consumer ring of fixed-size float64 slots in shared memory.
+
+    The producer owns the head counter and the consumer the tail counter, so reading
+    and writing slots takes no lock. The consumer raises the waiting flag before it goes
+    to sleep, and the producer only rings the consumer's bell when it finds the flag up.
+    Every access to a counter by the other side goes through a process-shared spin lock
+    in the header, whose acquire and release order it with the slot accesses around it:
+    the consumer reads the head before the slots it covers and frees them (stores the
+    tail) only after it has copied them, the producer reads the tail before it reuses
+    slots. That holds on weakly ordered CPUs (e.g. ARM) as well. Without pthread spin
+    locks (outside Linux) the counters are plain loads and stores, which is only correct
+    on a strongly ordered (x86/TSO) CPU, and the producer rings the bell every time.
+    """
+
+    def __init__(self, slot_size: int, n_slots: int = 1024, name: str = None):
+        """
+        :param slot_size: Number of float64 values per slot
+        :param n_slots:   Capacity of the ring, in slots
+        :param name:      Name of an existing ring to attach to (None creates a new one)
+        """
+        self.slot_size = slot_size
+        self.n_slots = n_slots
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE + n_slots * slot_size * 8)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.counters = np.ndarray((_HEADER_SIZE // 8,), dtype=np.int64, buffer=self.shm.buf)
+        self.slots = np.ndarray((n_slots, slot_size), dtype=np.float64, buffer=self.shm.buf, offset=_HEADER_SIZE)
+        # The lock lives in the block itself, so every attached process shares it
+        self._lock = None if _spin_lock is None else self.counters.ctypes.data + _LOCK * 8
+        if name is None:
+            self.counters[:] = 0
+            # Nothing has been read yet: the consumer starts asleep
+            self.counters[_WAITING] = 1
+            if self._lock is not None and _spin_init(self._lock, _PTHREAD_PROCESS_SHARED):
+                raise OSError(ctypes.get_errno(), "pthread_spin_init failed")
+
+    def __reduce__(self):
+        # Another process attaches to the same block
+        return ShmRing, (self.slot_size, self.n_slots, self.shm.name)
+
+    def __len__(self):
+        return int(self.counters[_HEAD] - self.counters[_TAIL])
+
+    def counter(self, index: int) -> int:
+        """Reads a counter (_HEAD or _TAIL) written by the other side, before any slot access that depends on it."""
+        if self._lock is None:
+            return int(self.counters[index])
+        _spin_lock(self._lock)
+        try:
+            return int(self.counters[index])
+        finally:
+            _spin_unlock(self._lock)
+
+    def release(self, tail: int):
+        """Frees the slots up to tail for the producer, once they have been copied."""
+        if self._lock is None:
+            self.counters[_TAIL] = tail
+            return
+        _spin_lock(self._lock)
+        try:
+            self.counters[_TAIL] = tail
+        finally:
+            _spin_unlock(self._lock)
+
+    def publish(self, head: int) -> bool:
+        """Makes the slots up to head visible and returns whether the consumer must be woken up."""
+        if self._lock is None:
+            self.counters[_HEAD] = head
+            return True
+        _spin_lock(self._lock)
+        try:
+            self.counters[_HEAD] = head
+            waiting = bool(self.counters[_WAITING])
+            self.counters[_WAITING] = 0
+        finally:
+            _spin_unlock(self._lock)
+        return waiting
+
+    def sleep(self, tail: int) -> bool:
+        """Raises the waiting flag, unless slots past tail were published; returns whether it did."""
+        if self._lock is None:
+            self.counters[_WAITING] = 1
+            return self.counters[_HEAD] == tail
+        _spin_lock(self._lock)
+        try:
+            if self.counters[_HEAD] != tail:
+                return False
+            self.counters[_WAITING] = 1
+            return True
+        finally:
+            _spin_unlock(self._lock)
+
+    def close(self, unlink: bool = False):
+        # The numpy views must go before the block can be unmapped
+        self.counters = self.slots = self._lock = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class ShmEndpoint:
+    """
+    One side of a shared-memory channel: it writes messages to one ring and reads them
+    from the other, and looks like a multiprocessing.Connection speaking the Pipe
+    protocol (dict messages), so RiverModelProcess and RiverModelClientPipe use it as is.
+
+    Messages matching the schema (numeric values for exactly the schema's features) take
+    a slot each. Any other message is pickled on the side connection and its slot only
+    holds a marker, which keeps the order of the messages. The marker is published before
+    the message is sent, so the reader always knows to drain the side connection while a
+    large message (or many of them) does not fit in its buffer.
+    """
+
+    # Back-off while the ring is full, in seconds
+    min_backoff = 20e-6
+    max_backoff = 1e-3
+
+    def __init__(self, features, tx: ShmRing, rx: ShmRing, bell_tx, bell_rx, side):
+        self.features = features
+        self.tx = tx
+        self.rx = rx
+        # Connections used as plain fds: one byte in bell_tx wakes the other side up
+        self.bell_tx = bell_tx
+        self.bell_rx = bell_rx
+        self.side = side
+        self._head = 0
+        self._tail = 0
+        # Tail of tx last read: slots below it + n_slots are known to be free
+        self._free_until = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_head"] = state["_tail"] = state["_free_until"] = 0
+        return state
+
+    def fileno(self):
+        # multiprocessing.connection.wait() waits on the bell
+        return self.bell_rx.fileno()
+
+    def send(self, msg):
+        """Writes a message (or all the messages of a batch) and wakes the reader up if it sleeps."""
+        for message in self._unbatch(msg):
+            row = self._encode(message)
+            self._push(row)
+            if row is None:
+                self._publish()
+                self.side.send(message)
+        self._publish()
+
+    def poll(self):
+        return len(self.rx) > 0 or self.bell_rx.poll()
+
+    def recv(self):
+        """
+        Returns what the other side has written so far (a batch message when there is
+        more than one), without blocking. Raises EOFError once the other side is closed.
+        """
+        self._clear_bell()
+        messages = [self.side.recv() if row[0] == _PICKLED else self._decode(row) for row in self._take()]
+        if len(messages) == 1:
+            return messages[0]
+        return self._batch(messages)
+
+    def close(self, unlink: bool = False):
+        for conn in (self.bell_tx, self.bell_rx, self.side):
+            conn.close()
+        self.tx.close(unlink)
+        self.rx.close(unlink)
+
+    def _push(self, row):
+        tx = self.tx
+        if self._head - self._free_until >= tx.n_slots:
+            # Full as far as we know: read the reader's tail again (only then, it takes the lock)
+            self._free_until = tx.counter(_TAIL)
+        if self._head - self._free_until >= tx.n_slots:
+            # The ring is full: let the reader see what is already there and back off
+            # (sleeping rather than spinning leaves the CPU to the reader)
+            self._publish()
+            delay = self.min_backoff
+            while self._head - self._free_until >= tx.n_slots:
+                time.sleep(delay)
+                delay = min(2 * delay, self.max_backoff)
+                self._free_until = tx.counter(_TAIL)
+        if row is None:
+            tx.slots[self._head % tx.n_slots, 0] = _PICKLED
+        else:
+            tx.slots[self._head % tx.n_slots] = row
+        self._head += 1
+
+    def _publish(self):
+        if self.tx.publish(self._head):
+            os.write(self.bell_tx.fileno(), b"\0")
+
+    def _take(self):
+        """Reads every available slot and raises the waiting flag once the ring is empty."""
+        rx = self.rx
+        rows = []
+        while True:
+            head = rx.counter(_HEAD)
+            if head == self._tail:
+                if rx.sleep(self._tail):
+                    return rows
+                continue
+            start, stop = self._tail % rx.n_slots, head % rx.n_slots
+            if start < stop:
+                rows += rx.slots[start:stop].tolist()
+            else:
+                rows += rx.slots[start:].tolist()
+                rows += rx.slots[:stop].tolist()
+            self._tail = head
+            rx.release(head)
+
+    def _clear_bell(self):
+        fd = self.bell_rx.fileno()
+        os.set_blocking(fd, False)
+        while True:
+            try:
+                data = os.read(fd, 4096)
+            except BlockingIOError:
+                return
+            if not data:
+                raise EOFError
+
+    def _unbatch(self, msg):
+        raise NotImplementedError("Abstract method")
+
+    def _batch(self, messages):
+        raise NotImplementedError("Abstract method")
+
+    def _encode(self, msg):
+        raise NotImplementedError("Abstract method")
+
+    def _decode(self, row):
+        raise NotImplementedError("Abstract method")
+
+
+class _ClientEndpoint(ShmEndpoint):
+    """Writes requests ([opcode, request_id, y, *features]) and reads predictions ([opcode, request_id, y_pred])."""
+
+    def _unbatch(self, msg):
+        return msg["messages"] if msg.get("command") == "batch" else [msg]
+
+    def _batch(self, messages):
+        return {"type": "batch", "responses": messages}
+
+    def _encode(self, msg):
+        command = msg.get("command")
+        if command == "train":
+            opcode, request_id, y = _LEARN, 0, msg["y_label"]
+        elif command == "predict":
+            opcode, request_id, y = _PREDICT, msg["request_id"], 0.0
+        elif command == "predict_learn":
+            opcode, request_id, y = _PREDICT_LEARN, msg["request_id"], msg["y_label"]
+        else:
+            return None
+        x = msg["x_dict"]
+        if len(x) != len(self.features) or type(y) not in _NUMBERS:
+            return None
+        try:
+            values = [x[feature] for feature in self.features]
+        except KeyError:
+            return None
+        for value in values:
+            if type(value) not in _NUMBERS:
+                return None
+        return [opcode, request_id, y, *values]
+
+    def _decode(self, row):
+        return {"type": "prediction", "request_id": int(row[1]), "y_pred": row[2]}
+
+
+class _ServerEndpoint(ShmEndpoint):
+    """The model process side of a channel."""
+
+    def _unbatch(self, msg):
+        return msg["responses"] if msg.get("type") == "batch" else [msg]
+
+    def _batch(self, messages):
+        return {"command": "batch", "messages": messages}
+
+    def _encode(self, msg):
+        # Only float predictions go through the ring, so every other type comes back unchanged
+        if msg.get("type") == "prediction" and type(msg["y_pred"]) is float:
+            return [_PREDICTION, msg["request_id"], msg["y_pred"]]
+        return None
+
+    def _decode(self, row):
+        x_dict = dict(zip(self.features, row[3:]))
+        if row[0] == _LEARN:
+            return {"command": "train", "x_dict": x_dict, "y_label": row[2]}
+        if row[0] == _PREDICT_LEARN:
+            return {"command": "predict_learn", "x_dict": x_dict, "y_label": row[2], "request_id": int(row[1])}
+        return {"command": "predict", "x_dict": x_dict, "request_id": int(row[1])}
+
+
+def shm_channel(features, n_slots: int = 1024):
+    """
+    Creates a shared-memory channel for a fixed feature schema.
+    :return: (client endpoint, server endpoint)
+    """
+    features = list(features)
+    requests = ShmRing(3 + len(features), n_slots)
+    responses = ShmRing(3, n_slots)
+    request_bell_rx, request_bell_tx = multiprocessing.Pipe(duplex=False)
+    response_bell_rx, response_bell_tx = multiprocessing.Pipe(duplex=False)
+    client_side, server_side = multiprocessing.Pipe(duplex=True)
+    client = _ClientEndpoint(features, requests, responses, request_bell_tx, response_bell_rx, client_side)
+    server = _ServerEndpoint(features, responses, requests, response_bell_tx, request_bell_rx, server_side)
+    return client, server
+
+
+class RiverModelManagerShm(RiverModelManagerPipe):
+    """
+    RiverModelManagerPipe whose commands go through shared-memory rings instead of
+    being pickled through the pipe, for models fed a fixed schema of numeric features.
+
+    Feature values (ints or floats) and learn targets reach the model as floats. Any
+    message that does not fit the schema (other keys, non-numeric values) and any
+    non-float prediction fall back to pickle, in order with the other commands.
+    """
+
+    def __init__(
+        self,
+        model: 'base.Estimator',
+        features,
+        model_path: str = None,
+        batch_size: int = 1,
+        max_delay_us: int = 0,
+        n_slots: int = 1024
+    ):
+        """
+        :param model:        A River model or pipeline
+        :param features:     Feature names of the schema, e.g. ["clouds", "humidity", "pressure"]
+        :param model_path:   File path for saving/loading the model
+        :param batch_size:   Maximum number of commands written before the reader is woken up
+        :param max_delay_us: Maximum time a command waits for its batch to fill up (0 = no limit)
+        :param n_slots:      Capacity of each ring, in messages
+        """
+        self.features = list(features)
+        self.n_slots = n_slots
+        # The model process must share our resource tracker, or its own one would
+        # unlink the rings it attached to when it exits
+        resource_tracker.ensure_running()
+        super().__init__(model, model_path=model_path, batch_size=batch_size, max_delay_us=max_delay_us)
+
+    def _open_client(self, parent_conn):
+        client, server = shm_channel(self.features, self.n_slots)
+        self.proc.add_client(server)
+        # The control channel holds its own duplicates until the process picks them up
+        for conn in (server.bell_tx, server.bell_rx, server.side, parent_conn):
+            conn.close()
+        return client
+
+    def stop(self):
+        super().stop()
+        self.parent_conn.close(unlink=True)
@@ -0,0 +1,153 @@
+import itertools
+import logging
+import threading
+
+from rivermultiproccesing.backpressure import BackpressurePolicy
+from rivermultiproccesing.evaluation import GeneratorSpec
+from rivermultiproccesing.river_queue import RiverModelClient
+from rivermultiproccesing.sockets import connect_unix
+
+
+class RiverSocketClient:
+    """
+    Client of a RiverModelServer listening on a Unix domain socket (started with
+    RiverModelManager(..., socket_path=path)), from any process of the host: separate
+    ingestion and scoring processes share one model instead of each holding a copy.
+
+    The client holds a pool of pool_size connections, each a RiverModelClient speaking
+    the server's tuple protocol in length-prefixed frames. A thread keeps the connection
+    it was given on its first call, so its commands are applied in the order it sent
+    them (a predict sees the learns sent before it by the same thread), while threads
+    on different connections are served concurrently.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        pool_size: int = 1,
+        batch_size: int = 1,
+        max_delay_us: int = 0,
+        backpressure: BackpressurePolicy = None,
+        connect_timeout: float = 0.0
+    ):
+        """
+        :param socket_path:     Path of the server's socket
+        :param pool_size:       Number of connections to the server
+        :param batch_size:      Maximum number of commands coalesced into one frame, per connection
+        :param max_delay_us:    Maximum time a command waits for its batch to fill up (0 = no limit)
+        :param backpressure:    Bound on the learns in flight, per connection (see backpressure)
+        :param connect_timeout: Seconds to keep retrying while the server is not listening yet
+        """
+        if pool_size < 1:
+            raise ValueError("pool_size must be a positive integer")
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.socket_path = socket_path
+        self._clients = []
+        try:
+            for _ in range(pool_size):
+                self._clients.append(RiverModelClient(
+                    connect_unix(socket_path, connect_timeout),
+                    batch_size=batch_size,
+                    max_delay_us=max_delay_us,
+                    backpressure=backpressure
+                ))
+        except OSError:
+            self.close()
+            raise
+        self._local = threading.local()
+        self._assign = itertools.count()
+
+    def _client(self):
+        """The connection of the calling thread."""
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._clients[next(self._assign) % len(self._clients)]
+        return client
+
+    def predict_async(self, x_dict: dict):
+        """
+        Send a predict request without waiting for the answer.
+        :return: a concurrent.futures.Future resolved with the prediction
+        """
+        return self._client().predict_async(x_dict)
+
+    def predict_one(self, x_dict: dict):
+        """
+        Send a predict request and wait for the server's response.
+        """
+        return self._client().predict_one(x_dict)
+
+    def predict_learn_async(self, x_dict: dict, y_label):
+        """
+        Send a predict-then-learn request without waiting for the answer.
+        :return: a concurrent.futures.Future resolved with the prediction made before learning
+        """
+        return self._client().predict_learn_async(x_dict, y_label)
+
+    def predict_learn_one(self, x_dict: dict, y_label):
+        """
+        Predict x_dict, then learn (x_dict, y_label), in one round trip (test-then-train).
+        """
+        return self._client().predict_learn_one(x_dict, y_label)
+
+    def predict_learn_many(self, x_dicts, y_labels):
+        """
+        predict_learn_one over a sequence of samples, sent together and applied in order.
+        :return: the list of predictions
+        """
+        return self._client().predict_learn_many(x_dicts, y_labels)
+
+    def learn_one(self, x_dict: dict, y_label):
+        """
+        Send a train request (non-blocking, unless a "block" backpressure policy makes it wait).
+        """
+        self._client().learn_one(x_dict, y_label)
+
+    def flush(self, timeout: float = None):
+        """
+        Wait until the server has applied every learn sent before, on every connection.
+        """
+        for client in self._clients:
+            client.flush(timeout)
+
+    def learn_metrics(self):
+        """
+        :return: {"sent", "applied", "in_flight", "backlog", "shed"} counts of the learns, over the pool
+        """
+        totals = {}
+        for client in self._clients:
+            for name, count in client.learn_metrics().items():
+                totals[name] = totals.get(name, 0) + count
+        return totals
+
+    @property
+    def in_flight(self):
+        """Number of requests waiting for an answer, over the pool."""
+        return sum(len(client._router) for client in self._clients)
+
+    def info(self):
+        """
+        Ask the server for its state (e.g. snapshot metrics).
+        """
+        return self._client().info()
+
+    def stats(self):
+        """
+        Ask the server for its telemetry (None if it runs without).
+        """
+        return self._client().stats()
+
+    def evaluate(self, spec: GeneratorSpec, metric, checkpoint_every: int = 1000, learn: bool = True):
+        """
+        Run a prequential evaluation inside the server (see RiverModelClient.evaluate).
+        :return: an iterator over the checkpoints
+        """
+        return self._client().evaluate(spec, metric, checkpoint_every, learn)
+
+    def close(self):
+        """
+        Send the pending commands and close every connection (the server keeps running).
+        """
+        for client in self._clients:
+            client.close()
+        self._clients = []
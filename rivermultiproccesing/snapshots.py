@@ -0,0 +1,209 @@
+import glob
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+
+from rivermultiproccesing import persistence
+
+logger = logging.getLogger(__name__)
+
+
+def write_model(model, path: str, compression: str = None):
+    """
+    Saves a model to path atomically, in the persistence format: the data goes to a
+    temporary file, which replaces path only once it is complete and on disk.
+    """
+    persistence.save_model(model, path, compression)
+
+
+def write_bytes(data: bytes, path: str):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _snapshot_version(path):
+    return int(re.search(r"\.snapshot-(\d+)", os.path.basename(path)).group(1))
+
+
+class SnapshotPolicy:
+    """
+    When and how a model server checkpoints its model while it runs (on top of the
+    save at shutdown).
+
+    :param every:    Take a snapshot every this many learns (None = only on time)
+    :param interval: Take a snapshot at most this many seconds after a learn (None = only on count)
+    :param keep:     Number of snapshot files kept next to model_path
+    :param mode:     "fork": a copy-on-write child process pickles and writes the model,
+                     so the serve loop only pauses for the fork. "thread": the model is
+                     pickled in the loop and written by a background thread. Platforms
+                     without fork use "thread".
+    """
+
+    def __init__(self, every: int = None, interval: float = None, keep: int = 3, mode: str = "fork"):
+        if every is None and interval is None:
+            raise ValueError("Give every and/or interval")
+        if mode not in ("fork", "thread"):
+            raise ValueError(f"Unknown mode: {mode}")
+        if keep < 1:
+            raise ValueError("keep must be a positive integer")
+        self.every = every
+        self.interval = interval
+        self.keep = keep
+        self.mode = mode if hasattr(os, "fork") else "thread"
+
+
+class Snapshotter:
+    """
+    Takes the snapshots of a server's model following a SnapshotPolicy.
+
+    Snapshot k is written to "<root>.snapshot-<k><ext>" next to model_path (e.g.
+    bikes.snapshot-000012.pkl), then model_path is atomically pointed to it, so a
+    restart loads the last complete snapshot. Older files beyond policy.keep are removed.
+    The server calls on_learn() after each learn and tick() after each wake-up, and
+    sleeps at most timeout() seconds. Files are written in the persistence format,
+    compressed with compression (None, "zlib" or "lzma").
+    """
+
+    # How often a running fork child is checked for completion, in seconds
+    poll_interval = 0.01
+
+    def __init__(self, model_path: str, policy: SnapshotPolicy, compression: str = None):
+        if model_path is None:
+            raise ValueError("Snapshots need a model_path")
+        self.model_path = model_path
+        self.policy = policy
+        self.compression = compression
+        root, ext = os.path.splitext(model_path)
+        self._pattern = f"{root}.snapshot-{{:06d}}{ext}"
+        existing = self._snapshot_files()
+        self.version = _snapshot_version(existing[-1]) if existing else 0
+        self.count = 0
+        self.failures = 0
+        self.last_duration = None
+        self.last_size = None
+        self._unsaved = 0
+        self._deadline = None
+        # (pid or thread, version, start time) of the snapshot being written
+        self._running = None
+        self._thread_error = None
+
+    def _snapshot_files(self):
+        root, ext = os.path.splitext(self.model_path)
+        return sorted(glob.glob(f"{glob.escape(root)}.snapshot-[0-9]*{glob.escape(ext)}"), key=_snapshot_version)
+
+    def metrics(self):
+        return {
+            "count": self.count,
+            "version": self.version,
+            "failures": self.failures,
+            "in_progress": self._running is not None,
+            "last_duration_s": self.last_duration,
+            "last_size_bytes": self.last_size,
+        }
+
+    def on_learn(self, model):
+        self._unsaved += 1
+        if self.policy.every is not None and self._unsaved >= self.policy.every:
+            self.snapshot(model)
+        elif self._deadline is None and self.policy.interval is not None:
+            self._deadline = time.monotonic() + self.policy.interval
+
+    def timeout(self):
+        timeouts = []
+        if self._running is not None:
+            timeouts.append(self.poll_interval)
+        if self._deadline is not None:
+            timeouts.append(max(0.0, self._deadline - time.monotonic()))
+        return min(timeouts) if timeouts else None
+
+    def tick(self, model):
+        self._poll()
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            self.snapshot(model)
+
+    def snapshot(self, model):
+        """Starts writing a snapshot of the model (skipped while the previous one is still being written)."""
+        self._poll()
+        if self._running is not None:
+            return
+        self._unsaved = 0
+        self._deadline = None
+        self.version += 1
+        path = self._pattern.format(self.version)
+        start = time.perf_counter()
+        if self.policy.mode == "fork":
+            pid = os.fork()
+            if pid == 0:
+                # Child: the model is a copy-on-write view of the parent's at fork time
+                status = 1
+                try:
+                    write_model(model, path, self.compression)
+                    status = 0
+                finally:
+                    os._exit(status)
+            self._running = (pid, self.version, start)
+        else:
+            data = persistence.dumps(model, self.compression)
+            thread = threading.Thread(target=self._write_in_background, args=(data, path), daemon=True)
+            thread.start()
+            self._running = (thread, self.version, start)
+
+    def _write_in_background(self, data, path):
+        try:
+            write_bytes(data, path)
+        except Exception as e:
+            self._thread_error = e
+
+    def _poll(self, block: bool = False):
+        """Finishes the snapshot being written if it is done (or waits for it if block)."""
+        if self._running is None:
+            return
+        worker, version, start = self._running
+        if isinstance(worker, threading.Thread):
+            if block:
+                worker.join()
+            if worker.is_alive():
+                return
+            ok, self._thread_error = self._thread_error is None, None
+        else:
+            pid, status = os.waitpid(worker, 0 if block else os.WNOHANG)
+            if pid == 0:
+                return
+            ok = os.waitstatus_to_exitcode(status) == 0
+        self._running = None
+        if ok:
+            self._finish(version, time.perf_counter() - start)
+        else:
+            self.failures += 1
+            logger.error(f"Snapshot {version} of {self.model_path} failed.")
+
+    def _finish(self, version, duration):
+        path = self._pattern.format(version)
+        self.count += 1
+        self.last_duration = duration
+        self.last_size = os.path.getsize(path)
+        # Point model_path to the new snapshot in one step
+        tmp_path = f"{self.model_path}.{os.getpid()}.tmp"
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, self.model_path)
+        for old in self._snapshot_files()[:-self.policy.keep]:
+            os.remove(old)
+
+    def close(self):
+        """Waits for the snapshot being written, if any."""
+        self._poll(block=True)
@@ -0,0 +1,183 @@
+import os
+import pickle
+import select
+import socket
+import stat
+import struct
+import time
+import multiprocessing.connection
+
+# Length of the payload that follows, in bytes
+_HEADER = struct.Struct("!I")
+# Below this size the header and the payload go out in a single write
+_COALESCE = 64 * 1024
+
+
+class FramedConnection:
+    """
+    Connection over a stream socket, with the interface of a multiprocessing Connection
+    (send/recv of picklable objects, send_bytes/recv_bytes, poll, fileno), so the
+    servers and clients use it as they use a Pipe.
+
+    Every message is a frame: a 4-byte big-endian payload length, then the payload.
+    Nothing is read ahead of the current frame, so the socket is readable exactly when
+    a frame (or the end of the stream) is waiting, and it can be passed to
+    multiprocessing.connection.wait().
+    """
+
+    def __init__(self, sock: socket.socket):
+        sock.setblocking(True)
+        self.sock = sock
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def poll(self, timeout=0.0):
+        return bool(multiprocessing.connection.wait([self], timeout))
+
+    def send(self, obj):
+        self.send_bytes(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def recv(self):
+        return pickle.loads(self.recv_bytes())
+
+    def send_bytes(self, payload):
+        if len(payload) >= 1 << 32:
+            raise ValueError(f"Frame too large: {len(payload)} bytes")
+        header = _HEADER.pack(len(payload))
+        if len(payload) < _COALESCE:
+            self.sock.sendall(header + payload)
+        else:
+            self.sock.sendall(header)
+            self.sock.sendall(payload)
+
+    def recv_bytes(self):
+        """Reads the next frame; raises EOFError once the peer has closed the connection."""
+        (size,) = _HEADER.unpack(self._recv_exactly(_HEADER.size))
+        return self._recv_exactly(size)
+
+    def _recv_exactly(self, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            try:
+                n = self.sock.recv_into(view[received:])
+            except ConnectionResetError:
+                n = 0
+            if n == 0:
+                raise EOFError("The connection was closed")
+            received += n
+        return buffer
+
+    def close(self):
+        self.sock.close()
+
+
+class ServerFramedConnection(FramedConnection):
+    """
+    FramedConnection for the server side of a socket, whose peer may be any process:
+    reads never block, so a peer that stops in the middle of a frame only delays itself.
+
+    recv()/recv_bytes() read whatever has arrived of the current frame (still never
+    past its end) and raise BlockingIOError until the frame is complete; the part read
+    so far is kept for the next call. A send waits at most send_timeout seconds for the
+    peer to make room, then raises TimeoutError, so a peer that stops reading is dropped.
+    """
+
+    def __init__(self, sock: socket.socket, send_timeout: float = 5.0):
+        sock.setblocking(False)
+        self.sock = sock
+        self.send_timeout = send_timeout
+        # The frame being read: its header until the size is known, then its payload
+        self._buffer = bytearray(_HEADER.size)
+        self._received = 0
+        self._in_header = True
+
+    def recv_bytes(self):
+        """Reads the next frame; raises BlockingIOError while it has not fully arrived, EOFError once the peer has closed."""
+        while True:
+            while self._received < len(self._buffer):
+                try:
+                    n = self.sock.recv_into(memoryview(self._buffer)[self._received:])
+                except ConnectionResetError:
+                    n = 0
+                if n == 0:
+                    raise EOFError("The connection was closed")
+                self._received += n
+            frame = self._buffer
+            self._received = 0
+            if self._in_header:
+                (size,) = _HEADER.unpack(frame)
+                self._buffer, self._in_header = bytearray(size), False
+            else:
+                self._buffer, self._in_header = bytearray(_HEADER.size), True
+                return frame
+
+    def send_bytes(self, payload):
+        if len(payload) >= 1 << 32:
+            raise ValueError(f"Frame too large: {len(payload)} bytes")
+        view = memoryview(_HEADER.pack(len(payload)) + payload)
+        deadline = time.monotonic() + self.send_timeout
+        while view:
+            try:
+                view = view[self.sock.send(view):]
+            except BlockingIOError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([], [self.sock], [], remaining)[1]:
+                    raise TimeoutError("The peer does not read its responses")
+
+
+def listen_unix(path: str, mode: int = 0o600, backlog: int = 128) -> socket.socket:
+    """
+    Returns a socket listening on the Unix domain socket path. A stale socket file left
+    by a server that died is replaced, but a path where a server still answers raises
+    OSError.
+
+    Frames carry pickles, which run code when loaded: mode (0o600 = the owner only)
+    decides who may connect and so who is trusted. The socket file is created with that
+    mode (through the umask, which is process-wide, for the duration of bind), so it is
+    never exposed with wider permissions.
+    """
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise OSError(f"{path} exists and is not a socket")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+        else:
+            raise OSError(f"A server is already listening on {path}")
+        finally:
+            probe.close()
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        umask = os.umask(~mode & 0o777)
+        try:
+            listener.bind(path)
+        finally:
+            os.umask(umask)
+        listener.listen(backlog)
+    except OSError:
+        listener.close()
+        raise
+    return listener
+
+
+def connect_unix(path: str, timeout: float = 0.0) -> FramedConnection:
+    """
+    Connects to the server listening on path, retrying for up to timeout seconds while
+    it is not listening yet (e.g. both processes are starting).
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            return FramedConnection(sock)
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
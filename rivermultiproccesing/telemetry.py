@@ -0,0 +1,260 @@
+import logging
+import multiprocessing.connection
+import time
+from multiprocessing.reduction import ForkingPickler
+
+from rivermultiproccesing.snapshots import write_bytes
+from rivermultiproccesing.sockets import FramedConnection
+
+try:
+    import fcntl
+    import termios
+except ImportError:  # Windows: no unread byte counts
+    fcntl = termios = None
+
+logger = logging.getLogger(__name__)
+
+# Commands whose service time is the model's time
+_MODEL_COMMANDS = ("predict", "train", "predict_learn")
+
+_QUANTILES = {"p50": 0.5, "p99": 0.99, "p999": 0.999}
+
+# Connections of pickles read and written as bytes
+_FRAMED = (multiprocessing.connection.Connection, FramedConnection)
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of durations in nanoseconds: every power of two is split into
+    2 ** (sub_bucket_bits - 1) linear buckets, so a recorded value is known within
+    about 1 / 2 ** (sub_bucket_bits - 1) of its magnitude (3% by default), from 1 ns
+    to hours, in a few hundred buckets. Recording is a dict increment.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 6):
+        self._bits = sub_bucket_bits
+        self._half = 1 << (sub_bucket_bits - 1)
+        self._counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int):
+        if value < 0:
+            value = 0
+        shift = value.bit_length() - self._bits
+        index = value if shift <= 0 else (shift + 1) * self._half + (value >> shift) - self._half
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def _value(self, index):
+        """Middle of the range of a bucket."""
+        if index < 2 * self._half:
+            return index
+        shift = index // self._half - 1
+        return ((index % self._half + self._half) << shift) + (1 << shift) // 2
+
+    def quantile(self, q: float) -> int:
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def summary(self):
+        """{"count", "mean", "p50", "p99", "p999", "max"}, in seconds."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count / 1e9 if self.count else 0.0,
+            **{name: self.quantile(q) / 1e9 for name, q in _QUANTILES.items()},
+            "max": self.max / 1e9,
+        }
+
+
+class Telemetry:
+    """
+    Low-overhead instrumentation of a model server, enabled by passing one to the
+    server (or telemetry=Telemetry() to a manager). Nothing is logged in the loop:
+
+    - the count and the service time histogram of every command ("batch" frames
+      included, whose time covers their commands);
+    - the queue wait of every frame, from the client's send to the server's read,
+      for clients stamping their frames (the managers do when telemetry is on, with
+      either codec; messages of shared-memory rings carry no stamp);
+    - the backlog found at each wake-up: messages in the request queue, unread bytes
+      in the client pipes;
+    - where the loop's time goes: the model (predict/train/predict_learn commands),
+      reading and writing (IPC) and (de)serializing. Pipe connections are read as
+      bytes then unpickled, so both are told apart; a multiprocessing.Queue unpickles
+      inside get(), so its "recv" time includes the unpickling, and it pickles in a
+      feeder thread, off the loop.
+
+    stats() returns all of it as a dict (the servers' "stats" command), and if
+    prometheus_path is given the server rewrites it in Prometheus text format every
+    interval seconds.
+    """
+
+    def __init__(self, prometheus_path: str = None, interval: float = 10.0, prefix: str = "river_server"):
+        """
+        :param prometheus_path: File rewritten with the metrics (None = no file)
+        :param interval:        Seconds between two writes of the file
+        :param prefix:          Prefix of the Prometheus metric names
+        """
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self.prefix = prefix
+        self.started = time.monotonic()
+        self.service = {}
+        self.queue_wait = LatencyHistogram()
+        self.backlog_messages = 0
+        self.backlog_bytes = 0
+        self.max_backlog_messages = 0
+        self.max_backlog_bytes = 0
+        self.times = {"model": 0, "recv": 0, "decode": 0, "encode": 0, "send": 0}
+        self._next_dump = None if prometheus_path is None else time.monotonic() + interval
+
+    def timed(self, handle, command_of):
+        """Wraps a server's _handle so that it records every command it runs."""
+        def timed_handle(msg):
+            start = time.perf_counter_ns()
+            response = handle(msg)
+            duration = time.perf_counter_ns() - start
+            command = command_of(msg)
+            histogram = self.service.get(command)
+            if histogram is None:
+                histogram = self.service[command] = LatencyHistogram()
+            histogram.record(duration)
+            if command in _MODEL_COMMANDS:
+                self.times["model"] += duration
+            return response
+        return timed_handle
+
+    def recv(self, conn):
+        """conn.recv(), timed (read and unpickling apart for a Connection or a socket)."""
+        start = time.perf_counter_ns()
+        if isinstance(conn, _FRAMED):
+            frame = conn.recv_bytes()
+            read = time.perf_counter_ns()
+            msg = ForkingPickler.loads(frame)
+            self.times["recv"] += read - start
+            self.times["decode"] += time.perf_counter_ns() - read
+        else:
+            msg = conn.recv()
+            self.times["recv"] += time.perf_counter_ns() - start
+        return msg
+
+    def send(self, conn, msg):
+        """conn.send(msg), timed (pickling and write apart for a Connection or a socket)."""
+        start = time.perf_counter_ns()
+        if isinstance(conn, _FRAMED):
+            frame = ForkingPickler.dumps(msg)
+            encoded = time.perf_counter_ns()
+            conn.send_bytes(frame)
+            self.times["encode"] += encoded - start
+            self.times["send"] += time.perf_counter_ns() - encoded
+        else:
+            conn.send(msg)
+            self.times["send"] += time.perf_counter_ns() - start
+
+    def add_time(self, part: str, start_ns: int):
+        """Adds the time since start_ns (a time.perf_counter_ns()) to part."""
+        self.times[part] += time.perf_counter_ns() - start_ns
+
+    def frame_sent_at(self, sent_at: float):
+        """Records the queue wait of a frame stamped with time.monotonic() by its client."""
+        self.queue_wait.record(int((time.monotonic() - sent_at) * 1e9))
+
+    def sample_backlog(self, queue=None, conns=()):
+        """Records the backlog of a wake-up: queue size and unread bytes of the connections."""
+        if queue is not None:
+            try:
+                self.backlog_messages = queue.qsize()
+            except NotImplementedError:  # macOS
+                self.backlog_messages = 0
+            self.max_backlog_messages = max(self.max_backlog_messages, self.backlog_messages)
+        if fcntl is not None and conns:
+            unread = 0
+            buffer = bytearray(4)
+            for conn in conns:
+                try:
+                    fcntl.ioctl(conn.fileno(), termios.FIONREAD, buffer)
+                except OSError:
+                    continue
+                unread += int.from_bytes(buffer, "little")
+            self.backlog_bytes = unread
+            self.max_backlog_bytes = max(self.max_backlog_bytes, unread)
+
+    def stats(self):
+        return {
+            "uptime_s": time.monotonic() - self.started,
+            "commands": {command: histogram.count for command, histogram in self.service.items()},
+            "service_s": {command: histogram.summary() for command, histogram in self.service.items()},
+            "queue_wait_s": self.queue_wait.summary(),
+            "backlog": {
+                "messages": self.backlog_messages,
+                "max_messages": self.max_backlog_messages,
+                "bytes": self.backlog_bytes,
+                "max_bytes": self.max_backlog_bytes,
+            },
+            "time_s": {part: total / 1e9 for part, total in self.times.items()},
+        }
+
+    def prometheus(self) -> str:
+        """The stats in Prometheus text exposition format."""
+        p = self.prefix
+        lines = [f"# TYPE {p}_commands_total counter"]
+        for command, histogram in self.service.items():
+            lines.append(f'{p}_commands_total{{command="{command}"}} {histogram.count}')
+        lines.append(f"# TYPE {p}_service_seconds summary")
+        for command, histogram in self.service.items():
+            lines += _summary_lines(f"{p}_service_seconds", histogram, f'command="{command}"')
+        lines.append(f"# TYPE {p}_queue_wait_seconds summary")
+        lines += _summary_lines(f"{p}_queue_wait_seconds", self.queue_wait, "")
+        lines.append(f"# TYPE {p}_backlog gauge")
+        lines.append(f'{p}_backlog{{unit="messages"}} {self.backlog_messages}')
+        lines.append(f'{p}_backlog{{unit="bytes"}} {self.backlog_bytes}')
+        lines.append(f"# TYPE {p}_time_seconds_total counter")
+        for part, total in self.times.items():
+            lines.append(f'{p}_time_seconds_total{{part="{part}"}} {total / 1e9}')
+        lines.append(f"# TYPE {p}_uptime_seconds gauge")
+        lines.append(f"{p}_uptime_seconds {time.monotonic() - self.started}")
+        return "\n".join(lines) + "\n"
+
+    def timeout(self):
+        """Seconds until the next write of the Prometheus file (None if there is no file)."""
+        if self._next_dump is None:
+            return None
+        return max(0.0, self._next_dump - time.monotonic())
+
+    def tick(self):
+        """Writes the Prometheus file if it is due."""
+        if self._next_dump is not None and time.monotonic() >= self._next_dump:
+            self.dump()
+
+    def dump(self):
+        """Writes the Prometheus file now (atomically)."""
+        if self.prometheus_path is None:
+            return
+        self._next_dump = time.monotonic() + self.interval
+        try:
+            write_bytes(self.prometheus().encode(), self.prometheus_path)
+        except OSError as e:
+            logger.error(f"Could not write {self.prometheus_path}: {e}")
+
+
+def _summary_lines(name, histogram, labels):
+    separator = "," if labels else ""
+    lines = [
+        f'{name}{{{labels}{separator}quantile="{q}"}} {histogram.quantile(q) / 1e9}' for q in _QUANTILES.values()
+    ]
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.total / 1e9}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
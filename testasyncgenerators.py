@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from generator.list_generator import ListDatasetGenerator
+from generator.movingwindow_list_generator import MovingWindowListGenerator
+from generator.movingwindow_river_generator import MovingWindowRiverGenerator
+from generator.river_dataset_generator import RiverDatasetGenerator
+
+from testsupport import ListDataset
+
+
+async def _drain(generator):
+    return [message async for message in generator]
+
+
+def test_async_matches_sync():
+    items = [({"x": i}, i) for i in range(20)]
+    assert asyncio.run(_drain(ListDatasetGenerator(dataset=items))) == items
+    assert asyncio.run(_drain(RiverDatasetGenerator(dataset=ListDataset(items), n_instances=10))) == items[:10]
+
+    data = list(range(1, 10))
+    sync_windows = list(MovingWindowListGenerator(data=data, past_history=4, forecasting_horizon=2))
+    async_windows = asyncio.run(_drain(MovingWindowListGenerator(data=data, past_history=4, forecasting_horizon=2)))
+    assert async_windows == sync_windows
+
+    series = [([i], [i]) for i in range(10)]
+    sync_windows = list(MovingWindowRiverGenerator(dataset=ListDataset(series), past_history=3, forecasting_horizon=2))
+    async_windows = asyncio.run(
+        _drain(MovingWindowRiverGenerator(dataset=ListDataset(series), past_history=3, forecasting_horizon=2))
+    )
+    assert async_windows == sync_windows
+
+
+def test_paced_streams_run_concurrently():
+    async def main():
+        # 10 streams of 20 messages, 5 ms apart: ~0.1 s each
+        generators = [ListDatasetGenerator(dataset=range(20), stream_period=5) for _ in range(10)]
+        return await asyncio.gather(*(_drain(generator) for generator in generators))
+
+    start_time = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed_time = time.perf_counter() - start_time
+    assert all(len(result) == 20 for result in results)
+    assert elapsed_time < 0.5, elapsed_time
+
+
+if __name__ == "__main__":
+    test_async_matches_sync()
+    print("test_async_matches_sync passed!")
+
+    test_paced_streams_run_concurrently()
+    print("test_paced_streams_run_concurrently passed!")
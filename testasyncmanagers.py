@@ -0,0 +1,108 @@
+import asyncio
+import itertools
+
+import pytest
+from river import linear_model, optim, preprocessing
+from river.datasets import synth
+
+from rivermultiproccesing.river_asyncio import AsyncRiverModelManager, AsyncRiverModelManagerPipe, _AsyncManager
+
+
+def get_model():
+    return preprocessing.StandardScaler() | linear_model.LinearRegression(optimizer=optim.SGD(0.01))
+
+
+MANAGERS = {
+    "queue": AsyncRiverModelManager,
+    "pipe": AsyncRiverModelManagerPipe,
+}
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_prequential(transport):
+    samples = list(itertools.islice(synth.Friedman(seed=42), 300))
+    model = get_model()
+    expected = []
+    for x, y in samples:
+        expected.append(model.predict_one(x))
+        model.learn_one(x, y)
+
+    async def main():
+        async with MANAGERS[transport](model=get_model()) as manager:
+            y_preds = []
+            for x, y in samples:
+                y_preds.append(await manager.predict_one(x))
+                await manager.learn_one(x, y)
+            return y_preds
+
+    assert asyncio.run(main()) == expected
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_predict_learn(transport):
+    samples = list(itertools.islice(synth.Friedman(seed=42), 300))
+    model = get_model()
+    expected = []
+    for x, y in samples:
+        expected.append(model.predict_one(x))
+        model.learn_one(x, y)
+
+    async def main():
+        async with MANAGERS[transport](model=get_model()) as manager:
+            return [await manager.predict_learn_one(x, y) for x, y in samples]
+
+    assert asyncio.run(main()) == expected
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_many_concurrent_awaiters(transport):
+    samples = list(itertools.islice(synth.Friedman(seed=42), 3000))
+    model = get_model()
+    for x, y in samples[:500]:
+        model.learn_one(x, y)
+
+    async def main():
+        async with MANAGERS[transport](model=model, max_in_flight=256) as manager:
+            return await asyncio.gather(*(manager.predict_one(x) for x, _ in samples))
+
+    assert asyncio.run(main()) == [model.predict_one(x) for x, _ in samples]
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_large_learns_do_not_block_the_loop(transport):
+    # Far more than a pipe buffer of learns, while another coroutine keeps running
+    x = {f"x{i}": float(i) for i in range(200)}
+    ticks = []
+
+    async def ticker(done):
+        while not done.is_set():
+            ticks.append(None)
+            await asyncio.sleep(0)
+
+    async def main():
+        done = asyncio.Event()
+        async with MANAGERS[transport](model=get_model()) as manager:
+            task = asyncio.create_task(ticker(done))
+            for _ in range(2000):
+                await manager.learn_one(x, 1.0)
+            y_pred = await manager.predict_one(x)
+            done.set()
+            await task
+            return y_pred
+
+    assert isinstance(asyncio.run(main()), float)
+    assert ticks
+
+
+def test_manager_is_abstract():
+    with pytest.raises(TypeError):
+        _AsyncManager()
+
+
+if __name__ == "__main__":
+    for transport in MANAGERS:
+        test_prequential(transport)
+        print(f"test_prequential[{transport}] passed!")
+
+        test_many_concurrent_awaiters(transport)
+        print(f"test_many_concurrent_awaiters[{transport}] passed!")
@@ -0,0 +1,130 @@
+import time
+
+import pytest
+
+from rivermultiproccesing.backpressure import BackpressurePolicy
+from rivermultiproccesing.river_pipe import RiverModelClientPipe, RiverModelManagerPipe
+from rivermultiproccesing.river_queue import RiverModelClient, RiverModelManager
+
+MANAGERS = {"queue": RiverModelManager, "pipe": RiverModelManagerPipe}
+CLIENTS = {"queue": RiverModelClient, "pipe": RiverModelClientPipe}
+
+
+class SlowCounter:
+    """A model slower than its producer, which counts what it learns."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.n = 0
+
+    def learn_one(self, x, y):
+        time.sleep(self.delay)
+        self.n += 1
+
+    def predict_one(self, x):
+        return self.n
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_flush_waits_for_the_learns(transport):
+    manager = MANAGERS[transport](model=SlowCounter(0.001), batch_size=16)
+    client = CLIENTS[transport](manager.connect())
+    try:
+        for i in range(50):
+            client.learn_one({"i": i}, 0)
+        client.flush()
+        # The other connection's learns are applied even though nothing orders the two connections
+        assert manager.predict_one({}) == 50
+        assert client.learn_metrics() == {"sent": 50, "applied": 50, "in_flight": 0, "backlog": 0, "shed": 0}
+    finally:
+        client.close()
+        manager.stop()
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_block_bounds_the_learns_in_flight(transport):
+    policy = BackpressurePolicy(max_in_flight=8, overload="block")
+    manager = MANAGERS[transport](model=SlowCounter(0.001), batch_size=4, backpressure=policy)
+    try:
+        for i in range(100):
+            manager.learn_one({"i": i}, 0)
+            assert manager.learn_metrics()["in_flight"] <= 8
+        manager.flush()
+        assert manager.predict_one({}) == 100
+        assert manager.learn_metrics()["shed"] == 0
+    finally:
+        manager.stop()
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_drop_oldest_sheds_beyond_the_backlog(transport):
+    policy = BackpressurePolicy(max_in_flight=4, overload="drop_oldest", max_backlog=8)
+    manager = MANAGERS[transport](model=SlowCounter(0.002), backpressure=policy)
+    try:
+        start = time.perf_counter()
+        for i in range(200):
+            manager.learn_one({"i": i}, 0)
+            assert manager.learn_metrics()["backlog"] <= 8
+        # Never waits for the model
+        assert time.perf_counter() - start < 200 * 0.002
+        manager.flush()
+        metrics = manager.learn_metrics()
+        assert metrics["shed"] > 0
+        assert metrics["sent"] + metrics["shed"] == 200
+        assert manager.predict_one({}) == metrics["sent"]
+    finally:
+        manager.stop()
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_sample_sheds_above_the_watermark(transport):
+    policy = BackpressurePolicy(max_in_flight=16, overload="sample", watermark=0.5, seed=42)
+    manager = MANAGERS[transport](model=SlowCounter(0.002), backpressure=policy)
+    try:
+        for i in range(200):
+            manager.learn_one({"i": i}, 0)
+            assert manager.learn_metrics()["in_flight"] <= 16
+        manager.flush()
+        metrics = manager.learn_metrics()
+        assert metrics["shed"] > 0
+        assert metrics["sent"] + metrics["shed"] == 200
+        assert manager.predict_one({}) == metrics["sent"]
+    finally:
+        manager.stop()
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+@pytest.mark.parametrize("overload", ["block", "drop_oldest", "sample"])
+def test_learns_within_the_bound_keep_their_order(transport, overload):
+    policy = BackpressurePolicy(max_in_flight=1000, overload=overload)
+    manager = MANAGERS[transport](model=SlowCounter(0), backpressure=policy)
+    try:
+        # A predict sent right after a learn sees it
+        for i in range(200):
+            manager.learn_one({"i": i}, 0)
+            assert manager.predict_one({}) == i + 1
+    finally:
+        manager.stop()
+
+
+def test_backlog_is_sent_on_stop(tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    policy = BackpressurePolicy(max_in_flight=2, overload="drop_oldest", max_backlog=1000)
+    manager = RiverModelManagerPipe(model=SlowCounter(0.001), model_path=model_path, backpressure=policy)
+    for i in range(100):
+        manager.learn_one({"i": i}, 0)
+    manager.stop()
+    assert manager.learn_metrics()["shed"] == 0
+
+    manager = RiverModelManagerPipe(model=SlowCounter(0.001), model_path=model_path)
+    try:
+        assert manager.predict_one({}) == 100
+    finally:
+        manager.stop()
+
+
+if __name__ == "__main__":
+    for transport in MANAGERS:
+        test_flush_waits_for_the_learns(transport)
+        test_block_bounds_the_learns_in_flight(transport)
+    print("All backpressure tests passed!")
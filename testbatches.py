@@ -0,0 +1,46 @@
+import pandas as pd
+
+from generator.list_generator import ListDatasetGenerator
+from generator.movingwindow_list_generator import MovingWindowListGenerator
+
+
+def _items(n):
+    return [({"a": i, "b": i / 2}, i % 2) for i in range(n)]
+
+
+def test_pandas_batches():
+    batches = list(ListDatasetGenerator(dataset=_items(25)).batches(10))
+    assert [len(X) for X, _ in batches] == [10, 10, 5]
+    X, y = batches[1]
+    assert isinstance(X, pd.DataFrame) and isinstance(y, pd.Series)
+    assert X["a"].tolist() == list(range(10, 20))
+    assert y.tolist() == [i % 2 for i in range(10, 20)]
+
+
+def test_numpy_window_batches():
+    generator = MovingWindowListGenerator(data=[[x, x] for x in range(1, 10)], past_history=4, forecasting_horizon=2)
+    X, y = next(generator.batches(4, output="numpy"))
+    assert X.shape == (4, 4, 2)
+    assert X[0].tolist() == [[1, 1], [2, 2], [3, 3], [4, 4]]
+    # The y windows of the first messages are not complete yet
+    assert y[0] is None and y[1] is None
+    assert y[2] == [[5, 5], [6, 6]] and y[3] == [[6, 6], [7, 7]]
+
+
+def test_partial_batches_are_flushed_on_timeout():
+    # A message every 10 ms: a 35 ms wait budget can not fill batches of 100
+    generator = ListDatasetGenerator(dataset=_items(12), stream_period=10)
+    sizes = [len(X) for X, _ in generator.batches(100, max_wait_ms=35, output="list")]
+    assert sum(sizes) == 12
+    assert max(sizes) <= 4
+
+
+if __name__ == "__main__":
+    test_pandas_batches()
+    print("test_pandas_batches passed!")
+
+    test_numpy_window_batches()
+    print("test_numpy_window_batches passed!")
+
+    test_partial_batches_are_flushed_on_timeout()
+    print("test_partial_batches_are_flushed_on_timeout passed!")
@@ -0,0 +1,72 @@
+import pytest
+
+import benchmarksuite
+from benchmarksuite import compare, run_case, run_suite
+
+
+class Broken:
+    """A model whose predictions fail."""
+
+    def predict_one(self, x):
+        raise ValueError("broken")
+
+    def learn_one(self, x, y):
+        pass
+
+
+class BrokenClient:
+    """A client that cannot connect."""
+
+    def __init__(self, conn, **kwargs):
+        raise ValueError("broken")
+
+
+def result(transport, msgs_per_s, p99):
+    return {
+        "transport": transport,
+        "model": "trivial",
+        "n_features": 10,
+        "batch_size": 1,
+        "n_clients": 1,
+        "msgs_per_s": msgs_per_s,
+        "latency_s": {"mean": p99 / 2, "p50": p99 / 2, "p99": p99, "max": p99},
+    }
+
+
+def test_compare():
+    baseline = [result("queue", 1000, 0.001), result("pipe", 1000, 0.001), result("shm", 1000, 0.001)]
+    results = [result("queue", 950, 0.00105), result("pipe", 800, 0.001), result("shm", 1000, 0.002)]
+    comparison = {entry["transport"]: entry for entry in compare(results, baseline, tolerance=0.1)}
+    assert not comparison["queue"]["regression"]
+    # Slower
+    assert comparison["pipe"]["regression"] and comparison["pipe"]["msgs_per_s_ratio"] == 0.8
+    # Same throughput, worse tail latency
+    assert comparison["shm"]["regression"] and comparison["shm"]["p99_ratio"] == 2.0
+    # Cases only on one side are not compared
+    assert compare([result("replicas", 10, 1.0)], baseline) == []
+
+
+def test_run_suite():
+    results = run_suite(["inprocess", "pipe"], ["trivial", "pipeline"], [3], [1, 8], [1, 2], n_messages=50)
+    assert len(results) == 2 * 2 * 2 * 2
+    for entry in results:
+        assert entry["msgs_per_s"] > 0
+        assert 0 < entry["latency_s"]["p50"] <= entry["latency_s"]["p99"] <= entry["latency_s"]["max"]
+    assert not any(entry["regression"] for entry in compare(results, results))
+
+
+def test_failing_clients_fail_the_case(monkeypatch):
+    monkeypatch.setitem(benchmarksuite.MODELS, "broken", lambda n_features: Broken())
+    with pytest.raises(ValueError):
+        run_case("inprocess", "broken", 3, 1, 2, n_messages=10, seed=0, timeout=10)
+    # A client process
+    start_server = benchmarksuite.TRANSPORTS["pipe"][0]
+    monkeypatch.setitem(benchmarksuite.TRANSPORTS, "pipe", (start_server, BrokenClient))
+    with pytest.raises(ValueError):
+        run_case("pipe", "trivial", 3, 1, 2, n_messages=10, seed=0, timeout=10)
+
+
+if __name__ == "__main__":
+    test_compare()
+    test_run_suite()
+    print("All benchmark suite tests passed!")
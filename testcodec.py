@@ -0,0 +1,128 @@
+import multiprocessing
+import pickle
+
+import pytest
+
+from rivermultiproccesing.codec import CodecConnection, DictCodec, TupleCodec
+
+
+def roundtrip(sender, receiver, messages):
+    frame = sender.encode(messages)
+    return frame, receiver.decode(frame)
+
+
+def test_dict_messages_roundtrip():
+    sender, receiver = DictCodec(), DictCodec()
+    messages = [
+        {"command": "train", "x_dict": {"clouds": 3, "humidity": 0.5, "holiday": False}, "y_label": 7},
+        {"command": "predict", "x_dict": {"clouds": 4, "humidity": 0.25, "holiday": True}, "request_id": 12},
+        {"type": "prediction", "request_id": 12, "y_pred": 6.5},
+        {"command": "predict_learn", "x_dict": {"clouds": 4, "humidity": 0.25, "holiday": True}, "y_label": 5, "request_id": 13},
+    ]
+    _, decoded = roundtrip(sender, receiver, messages)
+    assert decoded == messages
+    # Types come back unchanged
+    assert [type(v) for v in decoded[0]["x_dict"].values()] == [int, float, bool]
+
+
+def test_tuple_messages_roundtrip():
+    sender, receiver = TupleCodec(), TupleCodec()
+    messages = [
+        ("train", {0: 1.5, 1: 2.5}, 3.0),
+        ("predict", {0: 1.5, 1: 2.5}, 0),
+        ("prediction", 0, 2.75),
+        ("predict_learn", {0: 1.5, 1: 2.5}, 3.0, 1),
+    ]
+    assert roundtrip(sender, receiver, messages)[1] == messages
+
+
+def test_schema_is_sent_once():
+    sender, receiver = TupleCodec(), TupleCodec()
+    x = {f"feature_{i}": float(i) for i in range(10)}
+    first, _ = roundtrip(sender, receiver, [("train", x, 1.0)])
+    second, decoded = roundtrip(sender, receiver, [("train", x, 1.0)])
+    assert decoded == [("train", x, 1.0)]
+    assert len(second) < len(first)
+    assert len(second) < len(pickle.dumps(("train", x, 1.0), protocol=pickle.HIGHEST_PROTOCOL)) / 2
+
+
+def test_new_schemas_are_registered_on_the_fly():
+    sender, receiver = DictCodec(), DictCodec()
+    messages = [
+        {"command": "train", "x_dict": {"a": 1.0}, "y_label": 1.0},
+        {"command": "train", "x_dict": {"a": 1.0, "b": 2.0}, "y_label": 1.0},
+        # Same keys, another value type
+        {"command": "train", "x_dict": {"a": 1, "b": 2.0}, "y_label": 1.0},
+        {"command": "train", "x_dict": {"a": 1.0}, "y_label": 2.0},
+    ]
+    for message in messages:
+        assert roundtrip(sender, receiver, [message])[1] == [message]
+    assert len(receiver._received) == 3
+
+
+def test_other_values_are_pickled():
+    sender, receiver = DictCodec(), DictCodec()
+    messages = [
+        {"command": "train", "x_dict": {"city": "Toulouse", "clouds": 3}, "y_label": 7},
+        {"command": "train", "x_dict": {"clouds": 2 ** 70}, "y_label": 7},
+        {"type": "prediction", "request_id": 3, "y_pred": None},
+        {"type": "prediction", "request_id": 4, "y_pred": {"a": 0.25, "b": 0.75}},
+        {"command": "unknown"},
+    ]
+    assert roundtrip(sender, receiver, messages)[1] == messages
+
+
+def test_batch_of_mixed_commands():
+    sender, receiver = TupleCodec(), TupleCodec()
+    messages = []
+    for i in range(50):
+        messages += [
+            ("predict", {"a": float(i), "b": float(-i)}, 2 * i),
+            ("train", {"a": float(i), "b": float(-i)}, float(i)),
+            ("predict_learn", {"a": float(i), "b": 0.5}, 1.0, 2 * i + 1),
+        ]
+    # An int among the floats: its own schema, in the middle of the others
+    messages.insert(10, ("train", {"a": 1, "b": 2.0}, 0.5))
+    frame, decoded = roundtrip(sender, receiver, messages)
+    assert decoded == messages
+    assert [type(v) for v in decoded[10][1].values()] == [int, float]
+    assert len(frame) < len(pickle.dumps(messages, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def test_send_time_is_kept():
+    sender, receiver = TupleCodec(), TupleCodec()
+    messages = [("train", {"a": 1.0}, 2.0)]
+    assert receiver.decode_frame(sender.encode(messages, sent_at=12.5)) == (messages, 12.5)
+    assert receiver.decode_frame(sender.encode(messages)) == (messages, None)
+
+    a, b = multiprocessing.Pipe()
+    sender, receiver = CodecConnection(a), CodecConnection(b)
+    batch = {"command": "batch", "messages": [{"command": "train", "x_dict": {"a": 1.0}, "y_label": 2.0}], "sent_at": 3.25}
+    sender.send(batch)
+    assert receiver.recv() == batch
+    sender.close()
+    receiver.close()
+
+
+def test_invalid_frames():
+    sender, receiver = TupleCodec(), TupleCodec()
+    sender.encode([("train", {"a": 1.0}, 2.0)])
+    # The definition of schema 0 was in the frame the receiver did not see
+    with pytest.raises(ValueError):
+        receiver.decode(sender.encode([("train", {"a": 1.0, "b": 2.0}, 2.0)]))
+    with pytest.raises(ValueError):
+        receiver.decode(sender.encode([("train", {"a": 1.0}, 2.0)]))
+    with pytest.raises(ValueError):
+        receiver.decode(bytes([9]) + bytes(8))
+
+
+if __name__ == "__main__":
+    test_dict_messages_roundtrip()
+    test_tuple_messages_roundtrip()
+    test_schema_is_sent_once()
+    test_new_schemas_are_registered_on_the_fly()
+    test_other_values_are_pickled()
+    test_batch_of_mixed_commands()
+    test_send_time_is_kept()
+    test_invalid_frames()
+    print("All codec tests passed!")
@@ -0,0 +1,110 @@
+import datetime
+
+import numpy as np
+
+from generator.columnar_cache import ColumnarCache
+from generator.river_dataset_generator import RiverDatasetGenerator
+
+from testsupport import ListDataset
+
+
+def _items(n):
+    start = datetime.datetime(2016, 4, 1)
+    items = []
+    for i in range(n):
+        x = {
+            "station": f"station_{i % 3}",
+            "moment": start + datetime.timedelta(minutes=5 * i, microseconds=i),
+            "clouds": i % 100,
+            "temperature": i / 10,
+            "holiday": i % 7 == 0,
+            "tags": (i, "t"),
+        }
+        if i % 4 == 0:
+            del x["clouds"]
+        items.append((x, i * 2))
+    return items
+
+
+def test_cache_roundtrip(tmp_path):
+    items = _items(10000)
+    dataset = ListDataset(items)
+    stream = ColumnarCache(tmp_path).get(dataset, n_instances=len(items))
+    assert list(stream) == items
+    assert list(stream.take(5)) == items[:5]
+    assert list(stream.iter_from(9000)) == items[9000:]
+
+    # Raw slices: ints/floats as typed arrays, strings as dictionary codes
+    assert stream.column_slice(("x", "temperature"), 0, 3).tolist() == [0.0, 0.1, 0.2]
+    codes = stream.column_slice(("x", "station"), 0, 4)
+    assert codes.dtype == np.int32
+    assert stream.vocabulary(("x", "station"))[codes].tolist() == [x["station"] for x, _ in items[:4]]
+
+
+def test_cache_is_reused(tmp_path):
+    items = _items(100)
+    cache = ColumnarCache(tmp_path)
+    path = cache.get(ListDataset(items), n_instances=100).path
+    # A second run maps the existing files, the dataset is not read again
+    assert ColumnarCache(tmp_path).get(ListDataset([]), n_instances=100).path == path
+    assert cache.key(ListDataset(items), 50) != cache.key(ListDataset(items), 100)
+
+
+class DownloadedDataset(ListDataset):
+    """Like a river remote dataset: its repr changes once it has been read."""
+
+    def __init__(self, items):
+        super().__init__(items)
+        self.downloaded = False
+
+    def take(self, k):
+        self.downloaded = True
+        return super().take(k)
+
+    def __repr__(self):
+        return f"DownloadedDataset(downloaded={self.downloaded})"
+
+
+class SeededDataset(ListDataset):
+
+    def __init__(self, items, seed):
+        super().__init__(items)
+        self.seed = seed
+
+    def _get_params(self):
+        return {"seed": self.seed}
+
+
+def test_key_does_not_depend_on_the_repr(tmp_path):
+    items = _items(100)
+    cache = ColumnarCache(tmp_path)
+    assert list(cache.get(DownloadedDataset(items), n_instances=100)) == items
+    # A later run, with the dataset already downloaded, finds the same entry
+    dataset = DownloadedDataset([])
+    dataset.downloaded = True
+    assert list(cache.get(dataset, n_instances=100)) == items
+    # The parameters are part of the key
+    assert cache.key(SeededDataset(items, 1), 100) != cache.key(SeededDataset(items, 2), 100)
+    assert cache.key(SeededDataset(items, 1), 100) == cache.key(SeededDataset([], 1), 100)
+
+
+def test_generator_with_cache(tmp_path):
+    items = _items(200)
+    for _ in range(2):
+        generator = RiverDatasetGenerator(dataset=ListDataset(items), n_instances=150, cache_dir=tmp_path)
+        assert list(generator) == items[:150]
+        assert generator.get_count() == 150
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_cache_roundtrip(tmp + "/a")
+        print("test_cache_roundtrip passed!")
+
+        test_cache_is_reused(tmp + "/b")
+        print("test_cache_is_reused passed!")
+
+        test_generator_with_cache(tmp + "/c")
+        print("test_generator_with_cache passed!")
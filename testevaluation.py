@@ -0,0 +1,127 @@
+import functools
+import itertools
+import time
+
+import pytest
+from river import linear_model, metrics, optim, preprocessing
+from river.datasets import synth
+
+from rivermultiproccesing.evaluation import GeneratorSpec
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+from rivermultiproccesing.river_queue import RiverModelManager
+
+MANAGERS = {"queue": RiverModelManager, "pipe": RiverModelManagerPipe}
+
+
+def get_model():
+    return preprocessing.StandardScaler() | linear_model.LinearRegression(optimizer=optim.SGD(0.01))
+
+
+def friedman():
+    return GeneratorSpec(functools.partial(synth.Friedman, seed=42), n_instances=2000)
+
+
+class LastValue:
+    """Predicts the last value of its input window."""
+
+    def predict_one(self, x):
+        return x[-1][0]
+
+    def learn_one(self, x, y):
+        pass
+
+
+class WindowMAE(metrics.MAE):
+    """MAE on the last value of the target window."""
+
+    def update(self, y_true, y_pred):
+        super().update(y_true[-1], y_pred)
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_same_score_as_in_process(transport):
+    model = get_model()
+    metric = metrics.MAE()
+    for x, y in itertools.islice(synth.Friedman(seed=42), 2000):
+        metric.update(y, model.predict_one(x))
+        model.learn_one(x, y)
+
+    manager = MANAGERS[transport](model=get_model())
+    try:
+        checkpoints = list(manager.evaluate(friedman(), metrics.MAE(), checkpoint_every=500))
+        assert [checkpoint["n"] for checkpoint in checkpoints] == [500, 1000, 1500, 2000]
+        assert [checkpoint["done"] for checkpoint in checkpoints] == [False] * 3 + [True]
+        assert checkpoints[-1]["score"] == metric.get()
+        assert checkpoints[-1]["metric"].get() == metric.get()
+        assert all(checkpoint["throughput"] > 0 for checkpoint in checkpoints)
+        # The served model has learnt the stream
+        assert manager.predict_one(x) == model.predict_one(x)
+    finally:
+        manager.stop()
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_other_commands_are_served_during_an_evaluation(transport):
+    spec = GeneratorSpec(functools.partial(synth.Friedman, seed=42), n_instances=100, stream_period=2)
+    manager = MANAGERS[transport](model=get_model())
+    try:
+        checkpoints = manager.evaluate(spec, metrics.MAE(), checkpoint_every=10, learn=False)
+        first = next(checkpoints)
+        assert manager.predict_one({i: 0.0 for i in range(10)}) == 0.0
+        assert not first["done"] and first["lag_ms"] >= 0
+        assert list(checkpoints)[-1]["n"] == 100
+    finally:
+        manager.stop()
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_paced_evaluation_does_not_hold_the_server(transport):
+    spec = GeneratorSpec(functools.partial(synth.Friedman, seed=42), n_instances=3, stream_period=500)
+    manager = MANAGERS[transport](model=get_model())
+    try:
+        checkpoints = manager.evaluate(spec, metrics.MAE(), checkpoint_every=1)
+        next(checkpoints)
+        # Served between two samples due half a second apart, not after the next one
+        for _ in range(5):
+            start = time.perf_counter()
+            manager.predict_one({i: 0.0 for i in range(10)})
+            assert time.perf_counter() - start < 0.2
+            time.sleep(0.1)
+        assert list(checkpoints)[-1]["n"] == 3
+    finally:
+        manager.stop()
+
+
+def test_moving_windows():
+    spec = GeneratorSpec(
+        functools.partial(synth.Friedman, seed=42),
+        n_instances=200,
+        past_history=5,
+        forecasting_horizon=1,
+        input_idx=[0]
+    )
+    manager = RiverModelManagerPipe(model=LastValue())
+    try:
+        last = list(manager.evaluate(spec, WindowMAE(), checkpoint_every=1000))[-1]
+        # Samples before the windows are full are skipped
+        assert 0 < last["n"] < 200
+        assert last["score"] > 0
+    finally:
+        manager.stop()
+
+
+def test_errors_are_raised_in_the_client():
+    manager = RiverModelManagerPipe(model=get_model())
+    try:
+        with pytest.raises(RuntimeError):
+            list(manager.evaluate(GeneratorSpec("NoSuchDataset"), metrics.MAE()))
+        # The server keeps serving
+        manager.predict_one({i: 0.0 for i in range(10)})
+    finally:
+        manager.stop()
+
+
+if __name__ == "__main__":
+    for transport in MANAGERS:
+        test_same_score_as_in_process(transport)
+    print("All evaluation tests passed!")
@@ -47,8 +47,8 @@ if __name__ == "__main__":
     manager = RiverModelManagerPipe(model=anothermodel)
     start_time = time.time()
     for x,y in RiverDatasetGenerator(stream_period=0,dataset=dataset,n_instances=100000000000000000):
-        y_pred = manager.predict_one(x)
-        manager.learn_one(x, y)
+        # Predict then learn in a single round trip
+        y_pred = manager.predict_learn_one(x, y)
         metric.update(y_pred, y)
     end_time = time.time()
     elapsed_time = end_time - start_time
@@ -0,0 +1,45 @@
+import datetime
+import random
+
+from generator.list_generator import ListDatasetGenerator
+from generator.merge_generator import MergeGenerator
+
+from testsupport import ListDataset
+
+
+def _station(name, n, seed):
+    rng = random.Random(seed)
+    moment = datetime.datetime(2016, 4, 1)
+    items = []
+    for _ in range(n):
+        moment += datetime.timedelta(minutes=rng.randint(0, 10))
+        items.append(({"station": name, "moment": moment}, rng.random()))
+    return items
+
+
+def test_merge_is_time_ordered():
+    feeds = [_station(f"station_{i}", 200, seed=i) for i in range(50)]
+    sources = [ListDatasetGenerator(dataset=feed) for feed in feeds[:25]] + [ListDataset(feed) for feed in feeds[25:]]
+    generator = MergeGenerator(sources, timestamp_key="moment", n_instances=200)
+    merged = list(generator)
+    assert len(merged) == generator.get_count() == 50 * 200
+    moments = [x["moment"] for x, _ in merged]
+    assert moments == sorted(moments)
+    # Every feed keeps its own order
+    for feed in feeds:
+        assert [m for m in merged if m[0]["station"] == feed[0][0]["station"]] == feed
+
+
+def test_ties_and_callable_key():
+    a = [({"t": t}, "a") for t in [1, 2, 2, 5]]
+    b = [({"t": t}, "b") for t in [0, 2, 6]]
+    generator = MergeGenerator([ListDatasetGenerator(dataset=a), ListDatasetGenerator(dataset=b)], timestamp_key=lambda x, y: x["t"])
+    assert [(x["t"], y) for x, y in generator] == [(0, "b"), (1, "a"), (2, "a"), (2, "a"), (2, "b"), (5, "a"), (6, "b")]
+
+
+if __name__ == "__main__":
+    test_merge_is_time_ordered()
+    print("test_merge_is_time_ordered passed!")
+
+    test_ties_and_callable_key()
+    print("test_ties_and_callable_key passed!")
@@ -0,0 +1,187 @@
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from river import linear_model, optim, preprocessing
+from river.datasets import synth
+
+from rivermultiproccesing.persistence import load_model
+from rivermultiproccesing.river_pipe import RiverModelClientPipe, RiverModelManagerPipe
+from rivermultiproccesing.river_queue import RiverModelClient, RiverModelManager
+
+
+def get_model():
+    return preprocessing.StandardScaler() | linear_model.LinearRegression(optimizer=optim.SGD(0.01))
+
+
+def pipelined(manager, n=300):
+    """Same loop as prequential, without waiting for each prediction."""
+    futures = []
+    for x, y in itertools.islice(synth.Friedman(seed=42), n):
+        futures.append(manager.predict_async(x))
+        manager.learn_one(x, y)
+    return [future.result() for future in futures]
+
+
+def prequential(model, n=300):
+    """Predicts then learns on every sample, like testgenerator.py."""
+    y_preds = []
+    for x, y in itertools.islice(synth.Friedman(seed=42), n):
+        y_preds.append(model.predict_one(x))
+        model.learn_one(x, y)
+    return y_preds
+
+
+MANAGERS = {
+    "queue": RiverModelManager,
+    "pipe": RiverModelManagerPipe,
+}
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+@pytest.mark.parametrize("batch_size, max_delay_us", [(1, 0), (64, 0), (64, 200)])
+@pytest.mark.parametrize("codec", ["pickle", "compact"])
+def test_same_predictions_as_in_process(transport, batch_size, max_delay_us, codec):
+    expected = prequential(get_model())
+    manager = MANAGERS[transport](model=get_model(), batch_size=batch_size, max_delay_us=max_delay_us, codec=codec)
+    try:
+        assert prequential(manager) == expected
+    finally:
+        manager.stop()
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+@pytest.mark.parametrize("batch_size, max_delay_us", [(1, 0), (64, 200)])
+def test_pipelined_predictions(transport, batch_size, max_delay_us):
+    expected = prequential(get_model())
+    manager = MANAGERS[transport](model=get_model(), batch_size=batch_size, max_delay_us=max_delay_us)
+    try:
+        assert pipelined(manager) == expected
+    finally:
+        manager.stop()
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+@pytest.mark.parametrize("batch_size, max_delay_us", [(1, 0), (64, 200)])
+@pytest.mark.parametrize("codec", ["pickle", "compact"])
+def test_predict_learn(transport, batch_size, max_delay_us, codec):
+    expected = prequential(get_model(), n=900)
+    samples = list(itertools.islice(synth.Friedman(seed=42), 900))
+    manager = MANAGERS[transport](model=get_model(), batch_size=batch_size, max_delay_us=max_delay_us, codec=codec)
+    try:
+        y_preds = [manager.predict_learn_one(x, y) for x, y in samples[:300]]
+        futures = [manager.predict_learn_async(x, y) for x, y in samples[300:600]]
+        y_preds += [future.result() for future in futures]
+        y_preds += manager.predict_learn_many([x for x, _ in samples[600:]], [y for _, y in samples[600:]])
+        assert y_preds == expected
+    finally:
+        manager.stop()
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_concurrent_callers(transport):
+    samples = list(itertools.islice(synth.Friedman(seed=42), 200))
+    model = get_model()
+    for x, y in samples:
+        model.learn_one(x, y)
+    manager = MANAGERS[transport](model=model)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            y_preds = list(pool.map(manager.predict_one, [x for x, _ in samples]))
+        assert y_preds == [model.predict_one(x) for x, _ in samples]
+    finally:
+        manager.stop()
+
+
+def produce(client_cls, conn, n):
+    """Learns the first n samples through its own connection, in another process."""
+    client = client_cls(conn, batch_size=16)
+    for x, y in itertools.islice(synth.Friedman(seed=42), n):
+        client.learn_one(x, y)
+    # Answered only once every learn before it has been applied
+    client.predict_one(x)
+    client.close()
+
+
+CLIENTS = {
+    "queue": RiverModelClient,
+    "pipe": RiverModelClientPipe,
+}
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_client_in_another_process(transport):
+    model = get_model()
+    for x, y in itertools.islice(synth.Friedman(seed=42), 200):
+        model.learn_one(x, y)
+    x_test = [x for x, _ in itertools.islice(synth.Friedman(seed=7), 20)]
+
+    manager = MANAGERS[transport](model=get_model())
+    try:
+        producer = multiprocessing.Process(target=produce, args=(CLIENTS[transport], manager.connect(), 200))
+        producer.start()
+        producer.join()
+        assert producer.exitcode == 0
+        assert [manager.predict_one(x) for x in x_test] == [model.predict_one(x) for x in x_test]
+    finally:
+        manager.stop()
+
+
+class SlowCounter:
+    """Counts what it learns, taking its time, and predicts the count."""
+
+    def __init__(self):
+        self.n = 0
+
+    def learn_one(self, x, y):
+        time.sleep(0.0005)
+        self.n += 1
+
+    def predict_one(self, x):
+        return self.n
+
+
+def test_busy_queue_does_not_starve_other_clients():
+    manager = RiverModelManager(model=SlowCounter())
+    client = RiverModelClient(manager.connect())
+    try:
+        for i in range(2000):
+            manager.learn_one({"i": i}, 0)
+        # Answered between two slices of the queue, not once it is empty
+        assert client.predict_one({}) < 2000
+        manager.flush()
+        assert client.predict_one({}) == 2000
+    finally:
+        client.close()
+        manager.stop()
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_commands_sent_before_stop_are_applied(transport, tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    model = get_model()
+    manager = MANAGERS[transport](model=get_model(), model_path=model_path, batch_size=8)
+    for x, y in itertools.islice(synth.Friedman(seed=42), 100):
+        model.learn_one(x, y)
+        manager.learn_one(x, y)
+    manager.stop()
+
+    saved = load_model(model_path)
+    assert saved.predict_one(x) == model.predict_one(x)
+
+
+if __name__ == "__main__":
+    for transport in MANAGERS:
+        for batch_size, max_delay_us in [(1, 0), (64, 0), (64, 200)]:
+            for codec in ["pickle", "compact"]:
+                test_same_predictions_as_in_process(transport, batch_size, max_delay_us, codec)
+                print(f"test_same_predictions_as_in_process[{transport}-{batch_size}-{max_delay_us}-{codec}] passed!")
+        for batch_size, max_delay_us in [(1, 0), (64, 200)]:
+            test_pipelined_predictions(transport, batch_size, max_delay_us)
+            print(f"test_pipelined_predictions[{transport}-{batch_size}-{max_delay_us}] passed!")
+        test_concurrent_callers(transport)
+        print(f"test_concurrent_callers[{transport}] passed!")
+        test_client_in_another_process(transport)
+        print(f"test_client_in_another_process[{transport}] passed!")
@@ -0,0 +1,59 @@
+import time
+
+from generator.list_generator import ListDatasetGenerator
+from generator.pacer import Pacer
+
+
+def _achieved_rate(generator, n_messages):
+    start_time = time.perf_counter()
+    for _ in range(n_messages):
+        next(generator)
+    return (n_messages - 1) / (time.perf_counter() - start_time)
+
+
+def test_sub_millisecond_rate():
+    # 0.1 ms => 10k msg/s, far beyond what whole-millisecond periods could express
+    generator = ListDatasetGenerator(dataset=range(5000), stream_period=0.1)
+    rate = _achieved_rate(generator, 5000)
+    assert abs(rate - 10000) / 10000 < 0.05, rate
+
+
+def test_burst_rate():
+    # 100 messages every 2 ms => 50k msg/s
+    generator = ListDatasetGenerator(dataset=range(10001), stream_period=2, burst=100)
+    rate = _achieved_rate(generator, 10001)
+    assert abs(rate - 50000) / 50000 < 0.05, rate
+
+
+def test_lag_is_reported():
+    pacer = Pacer(period_ms=1)
+    pacer.wait()
+    time.sleep(0.02)
+    pacer.wait()
+    assert pacer.lag_ms > 15
+    # The schedule is absolute: the late messages are released without waiting
+    start_time = time.perf_counter()
+    for _ in range(10):
+        pacer.wait()
+    assert time.perf_counter() - start_time < 0.005
+
+
+def test_no_pacing():
+    pacer = Pacer()
+    pacer.wait()
+    assert pacer.next_release_ns() is None
+    assert pacer.lag_ms == 0
+
+
+if __name__ == "__main__":
+    test_sub_millisecond_rate()
+    print("test_sub_millisecond_rate passed!")
+
+    test_burst_rate()
+    print("test_burst_rate passed!")
+
+    test_lag_is_reported()
+    print("test_lag_is_reported passed!")
+
+    test_no_pacing()
+    print("test_no_pacing passed!")
@@ -0,0 +1,118 @@
+import itertools
+import pickle
+
+import numpy as np
+import pytest
+from river import linear_model, optim, preprocessing
+from river.datasets import synth
+
+from rivermultiproccesing.persistence import CorruptModelFile, dumps, load_model, loads, save_model
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+
+
+def get_model():
+    model = preprocessing.StandardScaler() | linear_model.LinearRegression(optimizer=optim.SGD(0.01))
+    for x, y in itertools.islice(synth.Friedman(seed=42), 100):
+        model.learn_one(x, y)
+    return model
+
+
+class ArrayModel:
+    """Stands for a model holding its state in arrays (e.g. a neural network's weights)."""
+
+    def __init__(self, n):
+        self.weights = np.arange(n, dtype=np.float64)
+        self.bias = np.ones((3, 4), dtype=np.float32)
+        self.name = "array model"
+
+
+@pytest.mark.parametrize("compression", [None, "zlib", "lzma"])
+def test_roundtrip(compression, tmp_path):
+    path = str(tmp_path / "model.pkl")
+    model = get_model()
+    save_model(model, path, compression)
+    x = next(iter(synth.Friedman(seed=7)))[0]
+    assert load_model(path).predict_one(x) == model.predict_one(x)
+    assert loads(dumps(model, compression)).predict_one(x) == model.predict_one(x)
+
+
+@pytest.mark.parametrize("compression", [None, "zlib", "lzma"])
+def test_arrays_are_out_of_band(compression, tmp_path):
+    path = str(tmp_path / "model.pkl")
+    model = ArrayModel(100_000)
+    save_model(model, path, compression)
+    loaded = load_model(path)
+    np.testing.assert_array_equal(loaded.weights, model.weights)
+    np.testing.assert_array_equal(loaded.bias, model.bias)
+    assert loaded.name == model.name
+    # The arrays can be updated in place without touching the file
+    loaded.weights += 1
+    np.testing.assert_array_equal(load_model(path).weights, model.weights)
+    if compression is None:
+        # The arrays' data follow the pickle stream instead of being copied into it
+        assert len(pickle.dumps(model, protocol=5, buffer_callback=lambda buffer: None)) < 1000
+
+
+def test_compression_shrinks_files():
+    model = ArrayModel(100_000)
+    model.weights[:] = 0
+    assert len(dumps(model, "zlib")) < len(dumps(model)) / 10
+    assert len(dumps(model, "lzma")) < len(dumps(model)) / 10
+
+
+@pytest.mark.parametrize("position", [10, -100])
+def test_corruption_is_detected(position, tmp_path):
+    path = tmp_path / "model.pkl"
+    save_model(ArrayModel(1000), str(path))
+    data = bytearray(path.read_bytes())
+    data[position] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(CorruptModelFile):
+        load_model(str(path))
+
+
+def test_truncation_is_detected(tmp_path):
+    path = tmp_path / "model.pkl"
+    save_model(ArrayModel(1000), str(path))
+    path.write_bytes(path.read_bytes()[:-100])
+    with pytest.raises(CorruptModelFile):
+        load_model(str(path))
+
+
+def test_plain_pickle_files_still_load(tmp_path):
+    path = tmp_path / "model.pkl"
+    model = get_model()
+    path.write_bytes(pickle.dumps(model))
+    x = next(iter(synth.Friedman(seed=7)))[0]
+    assert load_model(str(path)).predict_one(x) == model.predict_one(x)
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        dumps(ArrayModel(10), "bz2")
+
+
+def test_server_saves_compressed_models(tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    manager = RiverModelManagerPipe(model=get_model(), model_path=model_path, compression="lzma")
+    x = next(iter(synth.Friedman(seed=7)))[0]
+    y_pred = manager.predict_one(x)
+    manager.stop()
+    with open(model_path, "rb") as f:
+        assert f.read(4) == b"RVMP"
+
+    manager = RiverModelManagerPipe(model=get_model(), model_path=model_path)
+    try:
+        assert manager.predict_one(x) == y_pred
+    finally:
+        manager.stop()
+
+
+if __name__ == "__main__":
+    import tempfile
+    import pathlib
+    with tempfile.TemporaryDirectory() as tmp:
+        for compression in [None, "zlib", "lzma"]:
+            test_arrays_are_out_of_band(compression, pathlib.Path(tmp))
+        test_plain_pickle_files_still_load(pathlib.Path(tmp))
+    print("All persistence tests passed!")
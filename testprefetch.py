@@ -0,0 +1,52 @@
+import pytest
+
+from generator.prefetch import PrefetchIterator
+from generator.river_dataset_generator import RiverDatasetGenerator
+
+from testsupport import ListDataset
+
+
+class _BrokenDataset:
+    def take(self, k):
+        yield {"x": 0}, 0
+        raise ValueError("corrupted row")
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_prefetch_keeps_order_and_count(mode):
+    items = [({"x": i}, i) for i in range(1000)]
+    generator = RiverDatasetGenerator(dataset=ListDataset(items), n_instances=500, prefetch=100, prefetch_mode=mode)
+    assert list(generator) == items[:500]
+    assert generator.get_count() == 500
+    with pytest.raises(StopIteration):
+        next(generator)
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_prefetch_passes_exceptions(mode):
+    generator = RiverDatasetGenerator(dataset=_BrokenDataset(), prefetch=10, prefetch_mode=mode)
+    assert next(generator) == ({"x": 0}, 0)
+    with pytest.raises(ValueError, match="corrupted row"):
+        next(generator)
+
+
+def test_close_stops_worker():
+    iterator = PrefetchIterator(lambda: iter(range(10 ** 9)), buffer_size=8, chunk_size=4)
+    assert next(iterator) == 0
+    iterator.close()
+    iterator._worker.join(timeout=1)
+    assert not iterator._worker.is_alive()
+    with pytest.raises(StopIteration):
+        next(iterator)
+
+
+if __name__ == "__main__":
+    for mode in ["thread", "process"]:
+        test_prefetch_keeps_order_and_count(mode)
+        print(f"test_prefetch_keeps_order_and_count[{mode}] passed!")
+
+        test_prefetch_passes_exceptions(mode)
+        print(f"test_prefetch_passes_exceptions[{mode}] passed!")
+
+    test_close_stops_worker()
+    print("test_close_stops_worker passed!")
@@ -0,0 +1,81 @@
+import itertools
+import time
+
+import pytest
+from river import linear_model, optim, preprocessing
+from river.datasets import synth
+
+from rivermultiproccesing.persistence import load_model
+from rivermultiproccesing.river_replicas import RiverReplicaManager
+
+
+def get_model():
+    return preprocessing.StandardScaler() | linear_model.LinearRegression(optimizer=optim.SGD(0.01))
+
+
+def samples(n, seed=42):
+    return list(itertools.islice(synth.Friedman(seed=seed), n))
+
+
+@pytest.mark.parametrize("dispatch", ["round_robin", "least_loaded"])
+def test_replicas_serve_the_published_model(dispatch):
+    model = get_model()
+    manager = RiverReplicaManager(model=get_model(), n_replicas=3, snapshot_every=None, dispatch=dispatch)
+    try:
+        for x, y in samples(200):
+            model.learn_one(x, y)
+            manager.learn_one(x, y)
+        assert manager.publish() == 1
+        x_test = [x for x, _ in samples(30, seed=7)]
+        assert [manager.predict_one(x) for x in x_test] == [model.predict_one(x) for x in x_test]
+        futures = [manager.predict_async(x) for x in x_test]
+        assert [future.result() for future in futures] == [model.predict_one(x) for x in x_test]
+        assert [info["version"] for info in manager.snapshot_info()] == [1, 1, 1]
+    finally:
+        manager.stop()
+
+
+def test_snapshots_every_k_learns():
+    manager = RiverReplicaManager(model=get_model(), n_replicas=2, snapshot_every=50, batch_size=16)
+    try:
+        for x, y in samples(120):
+            manager.learn_one(x, y)
+        # 2 snapshots from the count, then the explicit one
+        assert manager.publish() == 3
+    finally:
+        manager.stop()
+
+
+def test_snapshots_every_t_seconds():
+    manager = RiverReplicaManager(model=get_model(), n_replicas=2, snapshot_every=None, snapshot_interval=0.05)
+    try:
+        before = manager.snapshot_info()
+        assert [info["version"] for info in before] == [0, 0]
+        x, y = samples(1)[0]
+        manager.learn_one(x, y)
+        deadline = time.monotonic() + 5
+        while any(info["version"] < 1 for info in manager.snapshot_info()):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert all(info["age"] < 5 for info in manager.snapshot_info())
+    finally:
+        manager.stop()
+
+
+def test_learns_sent_before_stop_are_saved(tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    model = get_model()
+    manager = RiverReplicaManager(model=get_model(), n_replicas=2, snapshot_every=50, batch_size=16, model_path=model_path)
+    for x, y in samples(120):
+        model.learn_one(x, y)
+        manager.learn_one(x, y)
+    manager.stop()
+    assert all(process.exitcode == 0 for process in [manager.trainer, *manager.replicas])
+    assert load_model(model_path).predict_one(x) == model.predict_one(x)
+
+
+if __name__ == "__main__":
+    test_replicas_serve_the_published_model("round_robin")
+    test_snapshots_every_k_learns()
+    test_snapshots_every_t_seconds()
+    print("All replica tests passed!")
@@ -0,0 +1,56 @@
+from generator.movingwindow_river_generator import MovingWindowRiverGenerator
+from generator.ring_buffer import RingBuffer
+
+from testsupport import ListDataset
+
+
+def test_ring_buffer_slides():
+    buffer = RingBuffer(3)
+    for i in range(10):
+        buffer.append(i)
+    assert buffer.is_full()
+    assert buffer.window() == [7, 8, 9]
+    assert buffer.window()[-1] == 9
+    assert buffer.window()[0:2] == [7, 8]
+
+
+def test_window_views_stay_valid():
+    buffer = RingBuffer(3)
+    views = []
+    for i in range(20):
+        buffer.append(i)
+        if buffer.is_full():
+            views.append(buffer.window())
+    assert views == [[i, i + 1, i + 2] for i in range(18)]
+
+
+def test_moving_window_river_generator():
+    items = [([x, x + 1], [x, x + 1]) for x in range(1, 10)]
+    generator = MovingWindowRiverGenerator(
+        dataset=ListDataset(items),
+        past_history=4,
+        forecasting_horizon=2,
+        target_idx=0,
+        n_instances=len(items),
+    )
+    collected_X = []
+    collected_y = []
+    for x_window, y_window in generator:
+        if x_window is not None:
+            collected_X.append(x_window)
+        if y_window is not None:
+            collected_y.append(y_window)
+    assert collected_X == [[[x, x + 1], [x + 1, x + 2], [x + 2, x + 3], [x + 3, x + 4]] for x in range(1, 7)]
+    assert collected_y == [[[x], [x + 1]] for x in range(5, 9)]
+    assert generator.get_count() == len(items)
+
+
+if __name__ == "__main__":
+    test_ring_buffer_slides()
+    print("test_ring_buffer_slides passed!")
+
+    test_window_views_stay_valid()
+    print("test_window_views_stay_valid passed!")
+
+    test_moving_window_river_generator()
+    print("test_moving_window_river_generator passed!")
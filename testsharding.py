@@ -0,0 +1,78 @@
+import itertools
+import statistics
+
+import pytest
+from river import compose, feature_extraction, linear_model, optim, preprocessing, stats
+
+from rivermultiproccesing.river_queue import RiverModelManager
+from rivermultiproccesing.river_sharded import ShardedModelManager, shard_model_path
+
+
+def get_model():
+    # Per-key state, like the TargetAgg(by=['station', 'hour']) of test.py
+    model = compose.Select("temperature")
+    model += feature_extraction.TargetAgg(by=["station"], how=stats.Mean())
+    model |= preprocessing.StandardScaler()
+    model |= linear_model.LinearRegression(optimizer=optim.SGD(0.01))
+    return model
+
+
+def samples(n=400):
+    for i in range(n):
+        station = f"station_{i % 7}"
+        temperature = float(i % 13)
+        yield {"station": station, "temperature": temperature}, temperature * 2 + i % 7
+
+
+@pytest.mark.parametrize("manager_cls", [None, RiverModelManager])
+def test_each_shard_learns_its_keys(manager_cls):
+    kwargs = {} if manager_cls is None else {"manager_cls": manager_cls}
+    manager = ShardedModelManager(model=get_model(), keys=["station"], n_shards=3, batch_size=16, **kwargs)
+    models = [get_model() for _ in range(3)]
+    try:
+        for x, y in samples():
+            models[manager.shard_of(x)].learn_one(x, y)
+            manager.learn_one(x, y)
+        for x, _ in itertools.islice(samples(), 20):
+            assert manager.predict_one(x) == models[manager.shard_of(x)].predict_one(x)
+        x = {"station": "station_0", "temperature": 3.0}
+        assert manager.predict_all(x) == [model.predict_one(x) for model in models]
+        assert manager.predict_all(x, combine=statistics.mean) == statistics.mean(model.predict_one(x) for model in models)
+    finally:
+        manager.stop()
+
+
+def test_routing_is_stable():
+    manager = ShardedModelManager(model=get_model(), keys=lambda x: x["station"], n_shards=4)
+    try:
+        shards = {x["station"]: manager.shard_of(x) for x, _ in samples(50)}
+        # Same key, same shard, whatever the other fields
+        assert all(manager.shard_of({"station": s, "temperature": -1.0}) == shard for s, shard in shards.items())
+        # 7 keys over 4 shards: more than one shard is used
+        assert len(set(shards.values())) > 1
+    finally:
+        manager.stop()
+
+
+def test_per_shard_persistence(tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    manager = ShardedModelManager(model=get_model(), keys=["station"], n_shards=2, model_path=model_path)
+    for x, y in samples():
+        manager.learn_one(x, y)
+    x = {"station": "station_3", "temperature": 5.0}
+    y_pred = manager.predict_one(x)
+    manager.stop()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["model.shard0-of-2.pkl", "model.shard1-of-2.pkl"]
+    assert shard_model_path(model_path, 1, 2) == str(tmp_path / "model.shard1-of-2.pkl")
+
+    manager = ShardedModelManager(model=get_model(), keys=["station"], n_shards=2, model_path=model_path)
+    try:
+        assert manager.predict_one(x) == y_pred
+    finally:
+        manager.stop()
+
+
+if __name__ == "__main__":
+    test_each_shard_learns_its_keys(None)
+    test_routing_is_stable()
+    print("All sharding tests passed!")
@@ -0,0 +1,127 @@
+import itertools
+
+import pytest
+from river import compose, dummy, linear_model, optim, preprocessing
+from river.datasets import synth
+
+from rivermultiproccesing.river_shm import RiverModelManagerShm, ShmRing, shm_channel
+
+
+def get_model():
+    return preprocessing.StandardScaler() | linear_model.LinearRegression(optimizer=optim.SGD(0.01))
+
+
+def samples(n=300):
+    return list(itertools.islice(synth.Friedman(seed=42), n))
+
+
+def prequential(model, data):
+    y_preds = []
+    for x, y in data:
+        y_preds.append(model.predict_one(x))
+        model.learn_one(x, y)
+    return y_preds
+
+
+@pytest.mark.parametrize("batch_size, max_delay_us, n_slots", [(1, 0, 1024), (64, 200, 1024), (64, 200, 8)])
+def test_same_predictions_as_in_process(batch_size, max_delay_us, n_slots):
+    data = samples()
+    expected = prequential(get_model(), data)
+    manager = RiverModelManagerShm(
+        model=get_model(), features=range(10), batch_size=batch_size, max_delay_us=max_delay_us, n_slots=n_slots
+    )
+    try:
+        futures = []
+        for x, y in data:
+            futures.append(manager.predict_async(x))
+            manager.learn_one(x, y)
+        assert [future.result() for future in futures] == expected
+    finally:
+        manager.stop()
+
+
+def test_predict_learn():
+    data = samples()
+    expected = prequential(get_model(), data)
+    manager = RiverModelManagerShm(model=get_model(), features=range(10), batch_size=16)
+    try:
+        assert manager.predict_learn_many([x for x, _ in data], [y for _, y in data]) == expected
+    finally:
+        manager.stop()
+
+
+def test_messages_outside_the_schema_keep_their_order():
+    # Two samples out of three miss a feature or have a value of another type: they go through pickle
+    data = []
+    for i, (x, y) in enumerate(samples()):
+        if i % 3 == 1:
+            del x[9]
+        elif i % 3 == 2:
+            x[0] = x[0] > 0.5
+        data.append((x, y))
+    expected = prequential(get_model(), data)
+
+    manager = RiverModelManagerShm(model=get_model(), features=range(10), batch_size=16)
+    try:
+        assert prequential(manager, data) == expected
+    finally:
+        manager.stop()
+
+
+def test_non_float_predictions_come_back_unchanged():
+    manager = RiverModelManagerShm(model=linear_model.LogisticRegression(), features=["a", "b"])
+    try:
+        for i in range(50):
+            manager.learn_one({"a": float(i % 2), "b": 1.0}, i % 2 == 1)
+        assert manager.predict_one({"a": 1.0, "b": 1.0}) is True
+        assert manager.predict_one({"a": 0.0, "b": 1.0}) is False
+    finally:
+        manager.stop()
+
+
+def test_batches_of_large_messages_outside_the_schema():
+    # Each batch holds more pickled data than the side connection buffers, in both directions
+    labels = ["a" * 2048, "b" * 2048]
+    model = compose.Select("a", "b") | dummy.NoChangeClassifier()
+    manager = RiverModelManagerShm(model=model, features=["a", "b"], batch_size=500)
+    try:
+        for i in range(500):
+            manager.learn_one({"a": float(i), "b": 1.0, "note": "x" * 2048}, labels[i % 2])
+        futures = [manager.predict_async({"a": float(i), "b": 1.0}) for i in range(500)]
+        assert [future.result(timeout=30) for future in futures] == [labels[1]] * 500
+    finally:
+        manager.stop()
+
+
+def test_ring_wraps_around():
+    client, server = shm_channel(["x"], n_slots=4)
+    try:
+        for i in range(10):
+            client.send({"command": "batch", "messages": [{"command": "train", "x_dict": {"x": i}, "y_label": i}] * 3})
+            assert server.recv()["messages"] == [{"command": "train", "x_dict": {"x": float(i)}, "y_label": float(i)}] * 3
+        assert len(server.rx) == 0
+    finally:
+        client.close(unlink=True)
+        server.bell_tx.close()
+        server.bell_rx.close()
+        server.side.close()
+
+
+def test_ring_attaches_by_name():
+    ring = ShmRing(3, n_slots=2)
+    try:
+        ring.slots[1] = [1.0, 2.0, 3.0]
+        other = ShmRing(3, n_slots=2, name=ring.shm.name)
+        assert other.slots[1].tolist() == [1.0, 2.0, 3.0]
+        other.close()
+    finally:
+        ring.close(unlink=True)
+
+
+if __name__ == "__main__":
+    test_same_predictions_as_in_process(64, 200, 8)
+    print("test_same_predictions_as_in_process passed!")
+    test_messages_outside_the_schema_keep_their_order()
+    print("test_messages_outside_the_schema_keep_their_order passed!")
+    test_non_float_predictions_come_back_unchanged()
+    print("test_non_float_predictions_come_back_unchanged passed!")
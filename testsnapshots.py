@@ -0,0 +1,69 @@
+import itertools
+import os
+import time
+
+import pytest
+from river import linear_model, optim, preprocessing
+from river.datasets import synth
+
+from rivermultiproccesing.persistence import load_model
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+from rivermultiproccesing.river_queue import RiverModelManager
+from rivermultiproccesing.snapshots import SnapshotPolicy, Snapshotter
+
+
+def get_model():
+    return preprocessing.StandardScaler() | linear_model.LinearRegression(optimizer=optim.SGD(0.01))
+
+
+def samples(n):
+    return itertools.islice(synth.Friedman(seed=42), n)
+
+
+@pytest.mark.parametrize("mode", ["fork", "thread"])
+def test_snapshots_every_k_learns(mode, tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    snapshots = Snapshotter(model_path, SnapshotPolicy(every=50, keep=2, mode=mode))
+    model = get_model()
+    for i, (x, y) in enumerate(samples(200)):
+        model.learn_one(x, y)
+        snapshots.on_learn(model)
+        # Let each snapshot finish before the next one is due
+        if i % 50 == 49:
+            snapshots.close()
+            assert load_model(model_path).predict_one(x) == model.predict_one(x)
+
+    assert sorted(os.listdir(tmp_path)) == ["model.pkl", "model.snapshot-000003.pkl", "model.snapshot-000004.pkl"]
+    metrics = snapshots.metrics()
+    assert metrics["count"] == 4 and metrics["version"] == 4 and metrics["failures"] == 0
+    assert metrics["last_size_bytes"] == os.path.getsize(model_path)
+    assert metrics["last_duration_s"] > 0
+
+    # Numbering goes on after a restart
+    assert Snapshotter(model_path, SnapshotPolicy(every=50)).version == 4
+
+
+@pytest.mark.parametrize("manager_cls", [RiverModelManager, RiverModelManagerPipe])
+def test_servers_checkpoint_while_running(manager_cls, tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    manager = manager_cls(model=get_model(), model_path=model_path, snapshot_policy=SnapshotPolicy(interval=0.05))
+    try:
+        for x, y in samples(100):
+            manager.learn_one(x, y)
+        deadline = time.monotonic() + 5
+        while not os.path.exists(model_path):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        # Written while the server is still running (a crash now would not lose everything)
+        assert load_model(model_path).predict_one(x) == manager.predict_one(x)
+        assert manager.info()["snapshots"]["count"] >= 1
+    finally:
+        manager.stop()
+
+
+if __name__ == "__main__":
+    import tempfile
+    import pathlib
+    with tempfile.TemporaryDirectory() as tmp:
+        test_snapshots_every_k_learns("fork", pathlib.Path(tmp))
+    print("test_snapshots_every_k_learns passed!")
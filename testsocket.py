@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+import pickle
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from rivermultiproccesing.river_queue import RiverModelManager
+from rivermultiproccesing.river_socket import RiverSocketClient
+from rivermultiproccesing.sockets import FramedConnection, connect_unix, listen_unix
+
+
+class Counter:
+    """Counts what it learns, and predicts the count."""
+
+    def __init__(self):
+        self.n = 0
+
+    def learn_one(self, x, y):
+        self.n += 1
+
+    def predict_one(self, x):
+        return self.n
+
+
+def ingest(socket_path, n):
+    client = RiverSocketClient(socket_path, connect_timeout=5.0)
+    for i in range(n):
+        client.learn_one({"i": i}, 0)
+    client.flush()
+    client.close()
+
+
+def test_framing():
+    a, b = socket.socketpair()
+    sender, receiver = FramedConnection(a), FramedConnection(b)
+    big = {"x": list(range(200000))}
+    # Written by a thread: the big frame is larger than the socket buffer
+    writer = threading.Thread(target=lambda: [sender.send(message) for message in ("small", big, ("predict", {}, 1))])
+    writer.start()
+    assert receiver.recv() == "small"
+    assert receiver.recv() == big
+    assert receiver.poll(1.0)
+    assert receiver.recv() == ("predict", {}, 1)
+    writer.join()
+    assert not receiver.poll()
+    sender.close()
+    with pytest.raises(EOFError):
+        receiver.recv()
+    receiver.close()
+
+
+def test_unrelated_processes_share_the_model(tmp_path):
+    socket_path = str(tmp_path / "model.sock")
+    manager = RiverModelManager(model=Counter(), socket_path=socket_path)
+    try:
+        # Processes that only know the path (spawned, so nothing is inherited)
+        context = multiprocessing.get_context("spawn")
+        ingesters = [context.Process(target=ingest, args=(socket_path, 100)) for _ in range(2)]
+        for process in ingesters:
+            process.start()
+        for process in ingesters:
+            process.join()
+            assert process.exitcode == 0
+        scorer = RiverSocketClient(socket_path)
+        assert scorer.predict_one({}) == 200
+        scorer.close()
+        assert manager.predict_one({}) == 200
+    finally:
+        manager.stop()
+    assert not os.path.exists(socket_path)
+
+
+def test_many_concurrent_clients(tmp_path):
+    socket_path = str(tmp_path / "model.sock")
+    manager = RiverModelManager(model=Counter(), socket_path=socket_path)
+    pooled = RiverSocketClient(socket_path, pool_size=4, batch_size=8)
+    others = [RiverSocketClient(socket_path) for _ in range(16)]
+    seen = []
+
+    def producer(client):
+        for i in range(50):
+            client.learn_one({"i": i}, 0)
+        # Commands of a thread are applied in order
+        seen.append(client.predict_one({}))
+
+    try:
+        threads = [threading.Thread(target=producer, args=(pooled,)) for _ in range(16)]
+        threads += [threading.Thread(target=producer, args=(client,)) for client in others]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert min(seen) >= 50
+        pooled.flush()
+        assert pooled.predict_one({}) == 32 * 50
+        assert pooled.learn_metrics()["sent"] == 16 * 50
+        # A client going away leaves the others served
+        others[0].close()
+        assert others[1].predict_one({}) == 32 * 50
+    finally:
+        pooled.close()
+        for client in others[1:]:
+            client.close()
+        manager.stop()
+
+
+def test_stalled_peer_does_not_block_the_server(tmp_path):
+    socket_path = str(tmp_path / "model.sock")
+    manager = RiverModelManager(model=Counter(), socket_path=socket_path)
+    stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client = None
+    try:
+        # A header announcing 100 bytes, then a single one of them
+        stalled.connect(socket_path)
+        stalled.sendall(struct.pack("!I", 100) + b"\x80")
+        client = RiverSocketClient(socket_path)
+        client.learn_one({}, 0)
+        assert client.predict_async({}).result(timeout=5) == 1
+        assert manager.predict_async({}).result(timeout=5) == 1
+        # The rest of the frame is read when it arrives
+        stalled.sendall(pickle.dumps(("train", {}, 0))[1:].ljust(99, b"."))
+        deadline = time.monotonic() + 5
+        while client.predict_async({}).result(timeout=5) != 2:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        stalled.close()
+        if client is not None:
+            client.close()
+        manager.stop()
+
+
+def test_socket_path(tmp_path):
+    socket_path = str(tmp_path / "model.sock")
+    # A stale socket file, left by a server that died, is replaced
+    listen_unix(socket_path).close()
+    manager = RiverModelManager(model=Counter(), socket_path=socket_path)
+    try:
+        assert os.stat(socket_path).st_mode & 0o777 == 0o600
+        # But not a socket a server listens on
+        with pytest.raises(OSError):
+            listen_unix(socket_path)
+    finally:
+        manager.stop()
+    with pytest.raises(FileNotFoundError):
+        connect_unix(socket_path, timeout=0.05)
+
+
+if __name__ == "__main__":
+    test_framing()
+    print("All socket tests passed!")
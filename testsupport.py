@@ -0,0 +1,17 @@
+"""Helpers shared by the test modules."""
+
+
+class ListDataset:
+    """Minimal stand-in for a river dataset that counts how many messages it decodes."""
+
+    def __init__(self, items):
+        self.items = items
+        self.decoded = 0
+
+    def take(self, k):
+        for item in self.items[:k]:
+            self.decoded += 1
+            yield item
+
+    def __repr__(self):
+        return "ListDataset()"
@@ -0,0 +1,99 @@
+import random
+
+import pytest
+from river import linear_model, optim, preprocessing
+
+from rivermultiproccesing.river_pipe import RiverModelManagerPipe
+from rivermultiproccesing.river_queue import RiverModelManager
+from rivermultiproccesing.telemetry import LatencyHistogram, Telemetry
+
+MANAGERS = {"queue": RiverModelManager, "pipe": RiverModelManagerPipe}
+
+
+def get_model():
+    return preprocessing.StandardScaler() | linear_model.LinearRegression(optimizer=optim.SGD(0.01))
+
+
+def test_histogram_quantiles():
+    rng = random.Random(42)
+    values = sorted(rng.randrange(1, 10 ** 9) for _ in range(10000))
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    for q in (0.5, 0.99, 0.999):
+        exact = values[int(q * len(values)) - 1]
+        assert abs(histogram.quantile(q) - exact) <= 0.04 * exact
+    assert histogram.max == values[-1]
+    summary = histogram.summary()
+    assert summary["count"] == 10000
+    assert summary["p50"] <= summary["p99"] <= summary["p999"] <= summary["max"] == values[-1] / 1e9
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for value in range(64):
+        histogram.record(value)
+    assert [histogram.quantile((i + 1) / 64) for i in range(64)] == list(range(64))
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_stats(transport, tmp_path):
+    prometheus_path = str(tmp_path / "metrics.prom")
+    manager = MANAGERS[transport](model=get_model(), batch_size=8, telemetry=Telemetry(prometheus_path))
+    try:
+        for i in range(100):
+            manager.learn_one({"x": i}, i)
+        for i in range(20):
+            manager.predict_one({"x": i})
+        manager.flush()
+        stats = manager.stats()
+    finally:
+        manager.stop()
+
+    assert stats["commands"]["train"] == 100
+    assert stats["commands"]["predict"] == 20
+    assert stats["commands"]["batch"] > 0
+    assert stats["service_s"]["train"]["p50"] > 0
+    # The frame of the stats command is read before its batch is counted
+    assert stats["queue_wait_s"]["count"] == stats["commands"]["batch"] + 1
+    assert stats["time_s"]["model"] > 0
+    assert stats["time_s"]["recv"] > 0
+    assert stats["backlog"]["max_messages"] >= 0
+
+    # Written on stop
+    with open(prometheus_path) as f:
+        text = f.read()
+    assert 'river_server_commands_total{command="train"} 100' in text
+    assert 'river_server_service_seconds{command="predict",quantile="0.99"}' in text
+    assert "river_server_queue_wait_seconds_count" in text
+    assert 'river_server_time_seconds_total{part="model"}' in text
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_compact_frames_are_stamped(transport):
+    manager = MANAGERS[transport](model=get_model(), batch_size=8, codec="compact", telemetry=Telemetry())
+    try:
+        for i in range(100):
+            manager.learn_one({"x": float(i)}, float(i))
+        assert manager.predict_one({"x": 1.0}) is not None
+        stats = manager.stats()
+    finally:
+        manager.stop()
+    assert stats["commands"]["train"] == 100
+    assert stats["queue_wait_s"]["count"] > 0
+
+
+@pytest.mark.parametrize("transport", MANAGERS)
+def test_no_telemetry(transport):
+    manager = MANAGERS[transport](model=get_model())
+    try:
+        manager.learn_one({"x": 1}, 1)
+        assert manager.stats() is None
+    finally:
+        manager.stop()
+
+
+if __name__ == "__main__":
+    test_histogram_quantiles()
+    test_small_values_are_exact()
+    print("All telemetry tests passed!")
@@ -1,3 +1,6 @@
+import numpy as np
+import pytest
+
 from generator.movingwindow_list_generator import MovingWindowListGenerator
 
 
@@ -150,6 +153,68 @@ def test_shift_multivariable_one_output():
     _test_moving_window(data, expected_X, expected_y, shift=3, target_idx=0)
 
 
+def _streamed_pairs(generator):
+    """Pairs every streamed y window with the X window it is the target of."""
+    collected_X = []
+    collected_y = []
+    for x_window, y_window in generator:
+        collected_X.append(list(x_window))
+        if y_window is not None:
+            collected_y.append(list(y_window))
+    return collected_X[: len(collected_y)], collected_y
+
+
+@pytest.mark.parametrize(
+    "data, kwargs",
+    [
+        (list(range(1, 10)), {}),
+        ([[i, i * 10] for i in range(1, 10)], {}),
+        ([[i, i * 10] for i in range(1, 10)], {"input_idx": 0}),
+        ([[i, i * 10] for i in range(1, 10)], {"target_idx": 0}),
+        (list(range(1, 20)), {"shift": 3}),
+        ([[i, i * 10] for i in range(1, 20)], {"shift": 3, "target_idx": 0}),
+    ],
+)
+def test_batch_windows_match_stream(data, kwargs):
+    def make():
+        return MovingWindowListGenerator(data=data, past_history=4, forecasting_horizon=2, **kwargs)
+
+    expected_X, expected_y = _streamed_pairs(make())
+    X, y = make().to_arrays()
+    assert X.shape[:2] == (len(expected_y), 4)
+    assert y.shape[:2] == (len(expected_y), 2)
+    if X.shape[2] == 1 and not isinstance(expected_X[0][0], list):
+        X = X[..., 0]
+    if y.shape[2] == 1 and not isinstance(expected_y[0][0], list):
+        y = y[..., 0]
+    assert X.tolist() == expected_X
+    assert y.tolist() == expected_y
+
+
+def test_iter_arrays_chunks_cover_batch():
+    data = np.arange(60, dtype=float).reshape(20, 3)
+    generator = MovingWindowListGenerator(data=data, past_history=4, forecasting_horizon=2, target_idx=2)
+    X, y = generator.to_arrays()
+    chunks = list(generator.iter_arrays(chunk_size=3))
+    assert all(len(chunk_X) <= 3 for chunk_X, _ in chunks)
+    assert np.array_equal(np.concatenate([c[0] for c in chunks]), X)
+    assert np.array_equal(np.concatenate([c[1] for c in chunks]), y)
+
+
+def test_batch_windows_are_views():
+    data = np.arange(30, dtype=float).reshape(10, 3)
+    generator = MovingWindowListGenerator(
+        data=data, past_history=4, forecasting_horizon=2, input_idx=[0, 1], target_idx=2
+    )
+    X, y = generator.to_arrays()
+    assert X.shape == (5, 4, 2)
+    assert y.shape == (5, 2, 1)
+    assert np.shares_memory(X, data)
+    assert np.shares_memory(y, data)
+    assert X[1].tolist() == data[1:5, :2].tolist()
+    assert y[1].tolist() == data[5:7, 2:].tolist()
+
+
 if __name__ == "__main__":
     # Quick manual run of a single test
     test_one_variable()